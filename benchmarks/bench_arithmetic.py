@@ -0,0 +1,35 @@
+# python -m benchmarks.bench_arithmetic
+# integer arithmetic with 16-bit wraparound in every backend
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+from cody_vm import VirtualMachine
+
+PROGRAM = """
+10 FOR I=1 TO 3000
+20 A=A+I*7-B
+30 B=(A-I)/3+C*C
+40 C=-C+A(MOD(I,8))
+50 A(MOD(I,8))=A-B
+60 NEXT
+"""
+
+BACKENDS = {
+    "tree": lambda io: Interpreter(io),
+    "closures": lambda io: Interpreter(io, compile_expressions=True),
+    "unchecked": lambda io: Interpreter(io, elide_checks=True),
+    "vm": lambda io: VirtualMachine(io),
+}
+
+
+def main():
+    rows = []
+    for name, make_interpreter in BACKENDS.items():
+        interp = make_interpreter(TestIO())
+        interp.load(CodyBasicParser().parse_string(PROGRAM))
+        rows.append([name, f"{measure(interp.run) * 1e3:.1f}"])
+    print_table(["backend", "ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# python -m benchmarks.bench_async
+# many interactive programs in one thread with cody_async: each waits for its
+# input, then computes, the slice size decides how often the others get a turn
+import asyncio
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_async import AsyncIO, AsyncInterpreter
+
+PROGRAM = """
+10 INPUT N
+20 FOR I=1 TO N
+30 A=A+I
+40 B=MOD(A,7)
+50 NEXT
+60 PRINT B
+"""
+
+
+async def run_sessions(sessions: int, slice_statements: int):
+    parsed = CodyBasicParser().parse_string(PROGRAM)
+    interps = []
+    for _ in range(sessions):
+        interps.append(AsyncInterpreter(AsyncIO(), slice_statements=slice_statements))
+        interps[-1].load(parsed)
+    tasks = [asyncio.create_task(interp.run_async()) for interp in interps]
+    await asyncio.sleep(0)
+    for interp in interps:
+        interp.io.feed("200")
+    await asyncio.gather(*tasks)
+
+
+def main():
+    rows = []
+    for sessions in (1, 100, 500):
+        row = [str(sessions)]
+        for slice_statements in (10, 100, 1000):
+            seconds = measure(
+                lambda: asyncio.run(run_sessions(sessions, slice_statements))
+            )
+            row.append(f"{seconds * 1e3 / sessions:.2f}")
+        rows.append(row)
+    print_table(["sessions", "ms/session, slice 10", "100", "1000"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# python -m benchmarks.bench_cache
+# startup time of parse_file with and without the on-disk program cache
+import os
+import tempfile
+from benchmarks.bench_parser import make_program
+from benchmarks.common import measure, print_table
+from cody_cache import ProgramCache
+from cody_parser import CodyBasicParser
+
+SIZES = [1_000, 10_000]
+
+
+def main():
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ProgramCache(os.path.join(tmp, "cache"))
+        for lines in SIZES:
+            filename = os.path.join(tmp, f"program{lines}.bas")
+            with open(filename, "w") as f:
+                f.write("\n".join(make_program(lines)))
+            uncached = measure(lambda: CodyBasicParser().parse_file(filename))
+            CodyBasicParser(cache).parse_file(filename)  # fill the cache
+            cached = measure(lambda: CodyBasicParser(cache).parse_file(filename))
+            rows.append(
+                [
+                    lines,
+                    f"{uncached:.3f}",
+                    f"{cached:.3f}",
+                    f"{uncached / cached:.1f}x",
+                ]
+            )
+    print_table(["lines", "parse", "cached", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# python -m benchmarks.bench_compile
+# tree-walking Interpreter.eval vs. compiled closures (cody_compiler)
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+
+EXPRESSIONS = [
+    "H*16+V",
+    "(A+B)*(A-B)/3+MOD(A,7)",
+    "-(A*A)+B*B-4*A*B+AND(A,255)",
+    "A(I)*2+A(I+1)",
+]
+EVALUATIONS = 20_000
+
+
+def main():
+    parser = CodyBasicParser()
+    rows = []
+    for code in EXPRESSIONS:
+        timings = []
+        for compiled in (False, True):
+            interp = Interpreter(TestIO(), compile_expressions=compiled)
+            interp.load(parser.parse_string("10 A=12\n20 B=5\n30 H=3\n40 V=7"))
+            interp.run()
+            node = parser.parse(code)
+
+            def run():
+                for _ in range(EVALUATIONS):
+                    interp.eval(node)
+
+            timings.append(measure(run))
+        tree, closures = timings
+        rows.append(
+            [
+                code,
+                f"{tree * 1e6 / EVALUATIONS:.2f}",
+                f"{closures * 1e6 / EVALUATIONS:.2f}",
+                f"{tree / closures:.1f}x",
+            ]
+        )
+    print_table(["expression", "tree us", "closures us", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# python -m benchmarks.bench_data
+# loading and reading programs with large DATA blocks (e.g. sprite tables)
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+
+VALUES_PER_LINE = 16
+PASSES = 3  # the table is read PASSES times, with a RESTORE before each pass
+
+
+def make_program(lines: int) -> list[str]:
+    count = lines * VALUES_PER_LINE
+    program = [
+        f"1 FOR P=1 TO {PASSES}",
+        "2 RESTORE",
+        f"3 FOR I=1 TO {count}",
+        "4 READ A",
+        "5 NEXT",
+        "6 NEXT",
+        "7 END",
+    ]
+    values = ",".join(str(i * 7 % 256) for i in range(VALUES_PER_LINE))
+    program += [f"{n} DATA {values}" for n in range(10, 10 + lines)]
+    return program
+
+
+def main():
+    parser = CodyBasicParser()
+    rows = []
+    for lines in [100, 500, 2_000]:  # at most 32767 values (FOR limit)
+        parsed = parser.parse_lines(make_program(lines))
+        interp = Interpreter(TestIO())
+        load = measure(lambda: interp.load(parsed))
+        seconds = measure(interp.run)
+        reads = lines * VALUES_PER_LINE * PASSES
+        per_read = seconds / reads * 1e6
+        rows.append(
+            [lines, f"{load * 1e3:.1f}", f"{seconds * 1e3:.1f}", f"{per_read:.2f}"]
+        )
+    print_table(["DATA lines", "load ms", "run ms", "us/READ"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# python -m benchmarks.bench_dispatch
+# cost of every statement type and built-in function in the tree-walking
+# interpreter, measured inside a FOR loop minus the cost of the empty loop
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+
+ITERATIONS = 10_000
+
+# name -> lines of the loop body (line numbers 2 to 9 are free)
+STATEMENTS = {
+    "REM": ["2 REM"],
+    "DATA": ["2 DATA 1"],
+    "assignment": ["2 A=B"],
+    "PRINT": ['2 PRINT "";'],
+    "IF (false)": ["2 IF B=1 THEN A=1"],
+    "IF (true)": ["2 IF B=0 THEN A=1"],
+    "GOTO": ["2 GOTO 3", "3 REM"],
+    "GOSUB+RETURN": ["2 GOSUB 20"],
+    "FOR+NEXT": ["2 FOR J=1 TO 1", "3 NEXT"],
+    "READ+RESTORE": ["2 READ A", "3 RESTORE"],
+    "POKE": ["2 POKE 1,1"],
+}
+
+BUILTINS = {
+    "ABS": "A=ABS(B)",
+    "SQR": "A=SQR(B)",
+    "MOD": "A=MOD(B,3)",
+    "RND": "A=RND()",
+    "NOT": "A=NOT(B)",
+    "AND": "A=AND(B,3)",
+    "OR": "A=OR(B,3)",
+    "XOR": "A=XOR(B,3)",
+    "SUB$": 'A$=SUB$("ABC",1,1)',
+    "CHR$": "A$=CHR$(65)",
+    "STR$": "A$=STR$(B)",
+    "VAL": 'A=VAL("12")',
+    "LEN": 'A=LEN("AB")',
+    "ASC": 'A=ASC("A")',
+}
+
+
+class PokeIO(TestIO):
+    def poke(self, address: int, value: int):
+        pass
+
+
+def loop_time(body: list[str], compile_expressions: bool) -> float:
+    program = [f"1 FOR I=1 TO {ITERATIONS}", *body, "10 NEXT", "11 END"]
+    program += ["20 RETURN", "30 DATA 1"]
+    interp = Interpreter(PokeIO(), compile_expressions=compile_expressions)
+    # no constant folding, so every built-in function is called
+    interp.optimize = False
+    interp.load(CodyBasicParser().parse_lines(program))
+    return measure(interp.run, repeat=5)
+
+
+def main():
+    for title, cases in [
+        ("statement", STATEMENTS),
+        ("built-in", {name: [f"2 {line}"] for name, line in BUILTINS.items()}),
+    ]:
+        rows = []
+        baseline = {mode: loop_time([], mode) for mode in (False, True)}
+        for name, body in cases.items():
+            row = [name]
+            for mode in (False, True):
+                seconds = loop_time(body, mode) - baseline[mode]
+                row.append(f"{seconds / ITERATIONS * 1e6:.2f}")
+            rows.append(row)
+        print_table([title, "tree us", "closures us"], rows)
+        print()
+
+
+if __name__ == "__main__":
+    main()
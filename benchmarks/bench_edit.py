@@ -0,0 +1,45 @@
+# python -m benchmarks.bench_edit
+# REPL edits and LIST ranges in a large program
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+
+SIZE = 30_000  # lines 2, 4, ..., 60000
+EDITS = 200
+
+
+def main():
+    parser = CodyBasicParser()
+    interp = Interpreter(TestIO())
+    interp.load(parser.parse_lines([f"{n} A=A+1" for n in range(2, 2 * SIZE + 1, 2)]))
+    rows = []
+    positions = [("start", 1), ("middle", SIZE + 1), ("end", 2 * SIZE + 1)]
+    for name, line_number in positions:
+        # insert a new line and delete it again
+        insert = parser.parse_command(f"{line_number} PRINT 1")
+        delete = parser.parse_command(f"{line_number}")
+        replace = parser.parse_command(f"{line_number + 1} A=A+1")
+
+        def edit():
+            for _ in range(EDITS):
+                interp.run_command(insert)
+                interp.run_command(delete)
+                interp.run_command(replace)
+
+        rows.append([f"edit at {name}", f"{measure(edit) / EDITS / 3 * 1e6:.1f}"])
+    for name, command in [
+        ("LIST 10 lines", f"LIST {SIZE},{SIZE + 18}"),
+        ("LIST all", "LIST"),
+    ]:
+        parsed = parser.parse_command(command)
+
+        def run_list():
+            interp.io.output_log.clear()
+            interp.run_command(parsed)
+
+        rows.append([name, f"{measure(run_list) * 1e6:.1f}"])
+    print_table(["operation", "us"], rows)
+
+
+if __name__ == "__main__":
+    main()
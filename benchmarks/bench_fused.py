@@ -0,0 +1,45 @@
+# python -m benchmarks.bench_fused
+# statement at a time vs. fused straight-line runs (Interpreter.fuse_statements)
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+
+PROGRAM = """
+10 FOR I=1 TO 2000
+20 A=I
+30 B=A+1
+40 REM UPDATE
+50 C=B*2
+60 D=C-A
+70 E=D/2
+80 F=E+B
+90 PRINT F
+100 NEXT
+"""
+
+
+def main():
+    program = CodyBasicParser().parse_string(PROGRAM)
+    rows = []
+    for compiled in (False, True):
+        timings = []
+        for fused in (False, True):
+            interp = Interpreter(
+                TestIO(), compile_expressions=compiled, fuse_statements=fused
+            )
+            interp.load(program)
+            timings.append(measure(interp.run))
+        plain, fused = timings
+        rows.append(
+            [
+                "closures" if compiled else "tree",
+                f"{plain * 1e3:.1f}",
+                f"{fused * 1e3:.1f}",
+                f"{plain / fused:.2f}x",
+            ]
+        )
+    print_table(["backend", "statements ms", "fused ms", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
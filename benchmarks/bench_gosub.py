@@ -0,0 +1,37 @@
+# python -m benchmarks.bench_gosub
+# cost of GOSUB/RETURN in programs of growing size (subroutines far apart)
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+
+CALLS = 2_000
+SIZES = [100, 10_000, 60_000]
+
+
+def make_program(lines: int) -> list[str]:
+    # main loop at the start, the subroutine at the end, REMs in between
+    program = [
+        f"1 FOR I=1 TO {CALLS}",
+        "2 GOSUB 65000",
+        "3 GOSUB S",  # computed target
+        "4 NEXT",
+        "5 END",
+    ]
+    program += [f"{n} REM PADDING" for n in range(10, 10 + lines)]
+    program += ["65000 S=65001", "65001 RETURN"]
+    return program
+
+
+def main():
+    parser = CodyBasicParser()
+    rows = []
+    for size in SIZES:
+        interp = Interpreter(TestIO())
+        interp.load(parser.parse_lines(make_program(size)))
+        seconds = measure(interp.run)
+        rows.append([size, f"{seconds * 1e3:.1f}", f"{seconds / CALLS * 1e6:.2f}"])
+    print_table(["lines", "ms", "us/iteration"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# python -m benchmarks.bench_line_index
+# step cost of a small GOTO loop at the end of programs of growing size
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+
+SIZES = [100, 1_000, 10_000, 60_000]
+ITERATIONS = 2_000
+
+
+def make_program(size: int) -> list[str]:
+    # padding in front of the loop: every lookup used to scan over it
+    lines = [f"{n} REM PADDING" for n in range(1, size - 3)]
+    lines += [
+        f"{size - 3} I=I+1",
+        f"{size - 2} IF I<{ITERATIONS} THEN GOTO {size - 3}",
+        f"{size - 1} END",
+    ]
+    return lines
+
+
+def main():
+    parser = CodyBasicParser()
+    rows = []
+    for size in SIZES:
+        parsed = parser.parse_lines(make_program(size))
+        interp = Interpreter(TestIO())
+        interp.load(parsed)
+        # the padding is only executed once, the loop ITERATIONS times
+        steps = size + 2 * ITERATIONS
+        seconds = measure(interp.run)
+        rows.append([size, steps, f"{seconds * 1e6 / steps:.2f}"])
+    print_table(["lines", "steps", "us/step"], rows)
+
+
+if __name__ == "__main__":
+    main()
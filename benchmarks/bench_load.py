@@ -0,0 +1,39 @@
+# python -m benchmarks.bench_load
+# Interpreter.load for programs of growing size, lines in order, reversed and
+# shuffled (e.g. a program typed out of order and saved)
+import random
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+
+SIZES = [1_000, 10_000, 60_000]
+
+
+def make_program(size: int) -> list[str]:
+    lines = []
+    for n in range(1, size + 1):
+        lines.append(f"{n} DATA {n % 256}" if n % 10 == 0 else f"{n} A=A+{n % 7}")
+    return lines
+
+
+def main():
+    parser = CodyBasicParser()
+    rows = []
+    for size in SIZES:
+        row = [size]
+        for order in ("sorted", "reversed", "shuffled"):
+            # parsed per interpreter, loading shared lines would copy them
+            code = parser.parse_lines(make_program(size))
+            if order == "reversed":
+                code.reverse()
+            elif order == "shuffled":
+                random.Random(size).shuffle(code)
+            interp = Interpreter(TestIO(), optimize=False)
+            seconds = measure(lambda: interp.load(code), repeat=1)
+            row.append(f"{seconds * 1e3:.1f}")
+        rows.append(row)
+    print_table(["lines", "sorted ms", "reversed ms", "shuffled ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
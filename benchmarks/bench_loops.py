@@ -0,0 +1,47 @@
+# python -m benchmarks.bench_loops
+# run time of tight FOR/NEXT loops per backend
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+from cody_vm import VirtualMachine
+
+PROGRAMS = {
+    "empty": """
+10 FOR I=1 TO 30000
+20 NEXT
+""",
+    "nested": """
+10 FOR I=1 TO 100
+20 FOR J=1 TO 300
+30 NEXT
+40 NEXT
+""",
+    "array": """
+10 FOR A(5)=1 TO 30000
+20 NEXT
+""",
+}
+
+BACKENDS = {
+    "tree": lambda: Interpreter(TestIO()),
+    "closures": lambda: Interpreter(TestIO(), compile_expressions=True),
+    "vm": lambda: VirtualMachine(TestIO()),
+}
+
+
+def main():
+    parser = CodyBasicParser()
+    rows = []
+    for name, code in PROGRAMS.items():
+        program = parser.parse_string(code)
+        row = [name]
+        for make_interpreter in BACKENDS.values():
+            interp = make_interpreter()
+            interp.load(program)
+            row.append(f"{measure(interp.run) * 1e3:.1f}")
+        rows.append(row)
+    print_table(["loop"] + [f"{name} ms" for name in BACKENDS], rows)
+
+
+if __name__ == "__main__":
+    main()
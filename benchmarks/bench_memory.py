@@ -0,0 +1,21 @@
+# python -m benchmarks.bench_memory
+# memory of a parsed 10,000 line program (commands + AST) in bytes per line
+from benchmarks.bench_parser import make_program
+from benchmarks.common import allocated, print_table
+from cody_parser import CodyBasicParser
+
+LINES = 10_000
+
+
+def main():
+    parser = CodyBasicParser()
+    lines = make_program(LINES)
+    size = allocated(lambda: parser.parse_lines(lines))
+    print_table(
+        ["lines", "bytes", "bytes/line"],
+        [[LINES, f"{size:,}", size // LINES]],
+    )
+
+
+if __name__ == "__main__":
+    main()
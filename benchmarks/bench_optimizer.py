@@ -0,0 +1,41 @@
+# python -m benchmarks.bench_optimizer
+# run time with and without constant folding (cody_optimizer)
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+
+PROGRAM = """
+10 FOR I=1 TO 2000
+20 H=MOD(I,16)
+30 V=I/16
+40 P=H*(4*4)+V*1+(53248+4)
+50 C$=CHR$(222)+CHR$(65+1)
+60 X=X+AND(255,15)-(-5)+0
+70 NEXT
+"""
+
+
+def main():
+    rows = []
+    for compiled in (False, True):
+        timings = []
+        for optimize in (False, True):
+            interp = Interpreter(
+                TestIO(), compile_expressions=compiled, optimize=optimize
+            )
+            interp.load(CodyBasicParser().parse_string(PROGRAM))
+            timings.append(measure(interp.run))
+        plain, folded = timings
+        rows.append(
+            [
+                "closures" if compiled else "tree",
+                f"{plain * 1e3:.1f}",
+                f"{folded * 1e3:.1f}",
+                f"{plain / folded:.1f}x",
+            ]
+        )
+    print_table(["backend", "plain ms", "optimized ms", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# python -m benchmarks.bench_parser
+# parse throughput of CodyBasicParser.parse_lines in lines per second
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+
+LINES = 5_000
+STATEMENTS = [
+    "REM A COMMENT WITH SOME WORDS",
+    'PRINT "THE SUM IS ",C,"."',
+    "A(I)=A(I-1)*3+MOD(B,7)-(C+1)/2",
+    "IF H<0 THEN GOTO 100",
+    "FOR I=1 TO 30000",
+    "NEXT",
+    "POKE 53252,H*16+V",
+    'IF S$<>"B" THEN PRINT SUB$(S$,0,3),CHR$(65,66)',
+    "GOSUB 1000",
+    "DATA 3,10,12,7,-6",
+]
+
+
+def make_program(lines: int) -> list[str]:
+    return [f"{n + 1} {STATEMENTS[n % len(STATEMENTS)]}" for n in range(lines)]
+
+
+def main():
+    parser = CodyBasicParser()
+    lines = make_program(LINES)
+    seconds = measure(lambda: parser.parse_lines(lines))
+    print_table(
+        ["lines", "seconds", "lines/s"],
+        [[LINES, f"{seconds:.3f}", f"{LINES / seconds:,.0f}"]],
+    )
+
+
+if __name__ == "__main__":
+    main()
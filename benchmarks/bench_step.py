@@ -0,0 +1,44 @@
+# python -m benchmarks.bench_step
+# cost of running a program in slices with Interpreter.step, e.g. several
+# programs scheduled round robin in one thread
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+
+PROGRAM = """
+10 FOR I=1 TO 2000
+20 A=A+I
+30 B=MOD(A,7)
+40 NEXT
+"""
+PROGRAMS = 4
+
+
+def run_all(interps: list[Interpreter]):
+    for interp in interps:
+        interp.run()
+
+
+def step_all(interps: list[Interpreter], budget: int):
+    for interp in interps:
+        interp.start()
+    active = list(interps)
+    while active:
+        active = [interp for interp in active if interp.step(budget).resumable]
+
+
+def main():
+    parser = CodyBasicParser()
+    interps = []
+    for _ in range(PROGRAMS):
+        interps.append(Interpreter(TestIO()))
+        interps[-1].load(parser.parse_string(PROGRAM))
+    rows = [["run()", f"{measure(lambda: run_all(interps)) * 1e3:.1f}"]]
+    for budget in (1, 10, 100, 1000):
+        seconds = measure(lambda: step_all(interps, budget))
+        rows.append([f"step({budget})", f"{seconds * 1e3:.1f}"])
+    print_table([f"{PROGRAMS} programs", "ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# python -m benchmarks.bench_strings
+# string-heavy text program (concatenation, SUB$, CHR$, PRINT) per backend
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+from cody_transpiler import TranspilingInterpreter
+from cody_vm import VirtualMachine
+
+PROGRAM = """
+10 FOR I=1 TO 1000
+20 A$="THE QUICK BROWN FOX JUMPS OVER THE LAZY DOG "
+30 B$=A$+A$+A$+STR$(I)
+40 C$=SUB$(B$,4,100)+CHR$(65+MOD(I,26),200,90)
+50 PRINT C$
+60 L=L+LEN(B$+C$)
+70 NEXT
+"""
+
+BACKENDS = {
+    "tree": lambda io: Interpreter(io),
+    "closures": lambda io: Interpreter(io, compile_expressions=True),
+    "unchecked": lambda io: Interpreter(io, elide_checks=True),
+    "transpiled": lambda io: TranspilingInterpreter(io),
+    "vm": lambda io: VirtualMachine(io),
+}
+
+
+def main():
+    rows = []
+    for name, make_interpreter in BACKENDS.items():
+        interp = make_interpreter(TestIO())
+        interp.load(CodyBasicParser().parse_string(PROGRAM))
+        rows.append([name, f"{measure(interp.run) * 1e3:.1f}"])
+    print_table(["backend", "ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# python -m benchmarks.bench_transpile
+# interpreter vs. whole-program transpiler (cody_transpiler)
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+from cody_transpiler import TranspilingInterpreter
+
+PROGRAMS = {
+    "arithmetic loop": """
+10 FOR I=1 TO 20000
+20 A=MOD(A*31+I,1000)
+30 B=B+A/7-I
+40 NEXT
+""",
+    "gosub": """
+10 FOR I=1 TO 5000
+20 GOSUB 100
+30 NEXT
+40 END
+100 C=C+AND(I,15)
+110 RETURN
+""",
+    "arrays": """
+10 FOR I=0 TO 99
+20 A(I)=I
+30 NEXT
+40 FOR J=1 TO 50
+50 FOR I=1 TO 99
+60 A(I)=A(I-1)+A(I)
+70 NEXT
+80 NEXT
+""",
+}
+
+
+def main():
+    parser = CodyBasicParser()
+    rows = []
+    for name, code in PROGRAMS.items():
+        parsed = parser.parse_string(code)
+        timings = []
+        for cls in (Interpreter, TranspilingInterpreter):
+            interp = cls(TestIO())
+            interp.load(parsed)
+            timings.append(measure(interp.run))
+        interpreted, transpiled = timings
+        rows.append(
+            [
+                name,
+                f"{interpreted * 1e3:.1f}",
+                f"{transpiled * 1e3:.1f}",
+                f"{interpreted / transpiled:.1f}x",
+            ]
+        )
+    print_table(["program", "interpreter ms", "transpiled ms", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
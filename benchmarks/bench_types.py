@@ -0,0 +1,50 @@
+# python -m benchmarks.bench_types
+# tree-walking interpreter with and without the run time type checks that
+# cody_types proves unnecessary
+from benchmarks.common import measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+
+PROGRAMS = {
+    "arithmetic": """
+10 FOR I=1 TO 2000
+20 H=MOD(I,16)
+30 V=I/16
+40 P=H*16+V-A(H)
+50 A(H)=AND(P+I,255)
+60 IF P>V THEN X=X+1
+70 NEXT
+""",
+    "strings": """
+10 FOR I=1 TO 2000
+20 A$="LINE "+STR$(I)
+30 B$=SUB$(A$,0,4)+CHR$(65+MOD(I,26))
+40 IF B$="LINEA" THEN C=C+1
+50 L=LEN(A$+B$)
+60 NEXT
+""",
+}
+
+
+def main():
+    rows = []
+    for name, program in PROGRAMS.items():
+        timings = []
+        for elide_checks in (False, True):
+            interp = Interpreter(TestIO(), elide_checks=elide_checks)
+            interp.load(CodyBasicParser().parse_string(program))
+            timings.append(measure(interp.run))
+        checked, unchecked = timings
+        rows.append(
+            [
+                name,
+                f"{checked * 1e3:.1f}",
+                f"{unchecked * 1e3:.1f}",
+                f"{checked / unchecked:.1f}x",
+            ]
+        )
+    print_table(["program", "checked ms", "unchecked ms", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# python -m benchmarks.bench_variables
+# array heavy programs: run time and memory of the variables
+from benchmarks.common import allocated, measure, print_table
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+from cody_vm import VirtualMachine
+
+PROGRAMS = {
+    "sieve": """
+10 N=3000
+20 FOR I=2 TO N
+30 P(I)=1
+40 NEXT
+50 FOR I=2 TO N
+60 IF P(I)=0 THEN GOTO 110
+70 C=C+1
+80 J=I+I
+90 IF J>N THEN GOTO 110
+100 P(J)=0
+101 J=J+I
+102 GOTO 90
+110 NEXT
+120 PRINT C
+""",
+    "fill": """
+10 FOR K=1 TO 5
+20 FOR I=0 TO 4000
+30 A(I)=I*K
+40 B(I)=A(I)-K
+50 NEXT
+60 NEXT
+70 PRINT B(4000)
+""",
+}
+
+
+def run(cls, program):
+    interp = cls(TestIO())
+    interp.load(program)
+    interp.run()
+    return interp
+
+
+def main():
+    parser = CodyBasicParser()
+    rows = []
+    for name, code in PROGRAMS.items():
+        program = parser.parse_string(code)
+        for cls in (Interpreter, VirtualMachine):
+            seconds = measure(lambda: run(cls, program))
+            memory = allocated(lambda: run(cls, program))
+            rows.append([name, cls.__name__, f"{seconds * 1e3:.1f}", f"{memory:,}"])
+    print_table(["program", "backend", "ms", "bytes"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# python -m benchmarks.bench_vm
+# interpreter vs. bytecode VM (cody_vm): run time and memory of the program
+from benchmarks.common import allocated, measure, print_table
+from benchmarks.bench_transpile import PROGRAMS
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+from cody_vm import Bytecode, VirtualMachine
+
+MEMORY_LINES = 10_000
+
+
+def main():
+    parser = CodyBasicParser()
+    rows = []
+    for name, code in PROGRAMS.items():
+        parsed = parser.parse_string(code)
+        timings = []
+        for cls in (Interpreter, VirtualMachine):
+            interp = cls(TestIO())
+            interp.load(parsed)
+            timings.append(measure(interp.run))
+        interpreted, vm = timings
+        rows.append(
+            [
+                name,
+                f"{interpreted * 1e3:.1f}",
+                f"{vm * 1e3:.1f}",
+                f"{interpreted / vm:.1f}x",
+            ]
+        )
+    print_table(["program", "interpreter ms", "vm ms", "speedup"], rows)
+    print()
+
+    lines = [f"{n + 1} A(I)=A(I-1)*3+MOD(B,7)-(C+1)/2" for n in range(MEMORY_LINES)]
+    interp = Interpreter(TestIO())
+    interp.load(parser.parse_lines(lines))
+    ast_bytes = allocated(lambda: parser.parse_lines(lines))
+    bytecode_bytes = allocated(lambda: Bytecode(interp.program).compile())
+    print_table(
+        ["representation", "bytes/line"],
+        [
+            ["commands + AST", ast_bytes // MEMORY_LINES],
+            ["bytecode", bytecode_bytes // MEMORY_LINES],
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# helpers shared by the benchmark scripts, run them from the repository root:
+# python -m benchmarks.bench_line_index
+import time
+import tracemalloc
+from typing import Callable
+
+
+def measure(fn: Callable[[], object], repeat: int = 3) -> float:
+    """
+    Return the best wall time of "repeat" calls to fn in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def print_table(header: list[str], rows: list[list[object]]):
+    widths = [
+        max(len(str(x)) for x in [h] + [row[i] for row in rows])
+        for i, h in enumerate(header)
+    ]
+    print("  ".join(str(h).rjust(w) for h, w in zip(header, widths)))
+    for row in rows:
+        print("  ".join(str(x).rjust(w) for x, w in zip(row, widths)))
+
+
+def allocated(fn: Callable[[], object]) -> int:
+    """
+    Return the number of bytes allocated by fn that are still alive when it
+    returns (including its result).
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
@@ -0,0 +1,228 @@
+# asyncio front end: many BASIC sessions in one thread
+# local demo server: python cody_async.py [--port 6502], then telnet localhost 6502
+import argparse
+import asyncio
+import traceback
+from collections import deque
+from cody_parser import CodyBasicParser, Command, CommandTypes, RunCommand
+from cody_interpreter import IO, Interpreter, STOP_BUDGET, STOP_INPUT, STOP_ERROR
+from typing import Iterable, Optional, Protocol
+
+
+class Writer(Protocol):
+    # the part of asyncio.StreamWriter used by AsyncIO
+    def write(self, data: bytes): ...
+
+    async def drain(self): ...
+
+
+class AsyncIO(IO):
+    """
+    IO whose input lines arrive asynchronously through feed(), per UART
+    (None is the keyboard). input() never waits: the interpreter only
+    reads lines that are there (see IO.input_ready), AsyncInterpreter
+    awaits wait_for_input() otherwise.
+
+    Output is collected until flush() sends it to the writer or, without a
+    writer, take_output() returns it. uarts are the UARTs whose lines are
+    fed, waiting for the lines of another UART fails.
+    """
+
+    def __init__(
+        self, writer: Optional[Writer] = None, uarts: Iterable[int] = (1, 2)
+    ):
+        super().__init__()
+        self.writer = writer
+        self.uarts = set(uarts)
+        self.output: list[str] = []
+        self.input_lines: dict[Optional[int], deque[str]] = {
+            None: deque(),
+            1: deque(),
+            2: deque(),
+        }
+        self.input_added = asyncio.Event()
+        self.closed = False  # no more input will be fed
+        self.prompted = False  # the prompt of the next input() was printed
+
+    def feed(self, line: str, uart: Optional[int] = None):
+        self.input_lines[uart].append(line)
+        self.input_added.set()
+
+    def close_input(self):
+        self.closed = True
+        self.input_added.set()
+
+    async def wait_for_input(self, prompt: str = ""):
+        """
+        Print the prompt and wait until a new input line is fed.
+        """
+        if prompt and not self.prompted:
+            self.print(prompt)
+            self.prompted = True
+        if self.uart is not None and self.uart not in self.uarts:
+            raise ValueError(f"no input on UART {self.uart}")
+        if self.closed:
+            await self.flush()
+            raise EOFError("no more input")
+        # cleared before flushing: lines fed while drain() waits wake us up
+        self.input_added.clear()
+        await self.flush()
+        await self.input_added.wait()
+
+    async def wait_for_text(self, uart: int):
+        # LOAD reads the lines up to an empty line
+        if uart not in self.uarts:
+            raise ValueError(f"no input on UART {uart}")
+        while "" not in self.input_lines[uart]:
+            await self.wait_for_input()
+
+    def input_ready(self, count: int) -> bool:
+        return len(self.input_lines[self.uart]) >= count
+
+    def input(self, prompt: str) -> str:
+        if self.uart is None and not self.prompted:
+            self.print(prompt)
+        self.prompted = False
+        return self.input_lines[self.uart].popleft()
+
+    def print_char(self, c: str):
+        self.output.append(c)
+
+    def println(self, value: str = ""):
+        if value:
+            self.print(value)
+        self.output.append("\n")
+
+    def take_output(self) -> str:
+        output = "".join(self.output)
+        self.output.clear()
+        return output
+
+    async def flush(self):
+        if self.writer is not None and self.output:
+            output = self.take_output().replace("\n", "\r\n")  # for terminals
+            self.writer.write(output.encode("latin-1"))
+            await self.writer.drain()
+
+
+class AsyncInterpreter(Interpreter):
+    """
+    Interpreter for an AsyncIO. Programs run in slices of slice_statements
+    statements (see Interpreter.step) and yield to the event loop between
+    them, INPUT and LOAD wait for their lines without blocking the thread.
+    """
+
+    io: AsyncIO
+
+    def __init__(self, io: AsyncIO, *, slice_statements: int = 1000, **kwargs):
+        super().__init__(io, **kwargs)
+        self.slice_statements = slice_statements
+
+    async def run_async(self):
+        await self.run_command_async(RunCommand())
+
+    async def run_command_async(self, command: Command):
+        assert self.repl
+        if command.line_number is None:
+            if command.command_type == CommandTypes.RUN:
+                self.start()
+                await self._run_slices()
+                return
+            elif command.command_type == CommandTypes.LOAD:
+                uart = self.eval(command.uart)
+                if uart in (1, 2) and self.eval(command.mode) == 0:
+                    await self.io.wait_for_text(uart)  # else LOAD fails as usual
+        self.run_command(command)
+        await self.io.flush()
+
+    async def _run_slices(self):
+        try:
+            while True:
+                result = self.step(self.slice_statements)
+                if result.reason == STOP_BUDGET:
+                    await self.io.flush()
+                    await asyncio.sleep(0)  # let the other sessions run
+                elif result.reason == STOP_INPUT:
+                    keyboard = self.io.uart is None
+                    await self.io.wait_for_input(
+                        f"{self.io.prompt_char()} " if keyboard else ""
+                    )
+                elif result.reason == STOP_ERROR:
+                    raise result.error
+                else:
+                    break
+        finally:
+            if self.running:
+                self.stop()  # e.g. the input was closed or the task cancelled
+            await self.io.flush()
+
+
+async def session(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, **options
+):
+    """
+    A REPL over a stream, e.g. one client connection of serve(). The
+    options are passed to AsyncInterpreter.
+    """
+    io = AsyncIO(writer, uarts=())  # the client is the keyboard
+    interp = AsyncInterpreter(io, **options)
+    parser = CodyBasicParser()
+
+    async def read_lines():
+        while line := await reader.readline():
+            io.feed(line.decode("latin-1").rstrip("\r\n"))
+        io.close_input()
+
+    reading = asyncio.create_task(read_lines())
+    io.println("  *** CODY COMPUTER BASIC V1.0emu ***  ")
+    try:
+        while True:
+            io.println("READY.")
+            io.close_uart()  # REPL commands come from the keyboard
+            while not io.input_ready(1):
+                await io.wait_for_input()
+            source = io.input("").strip()
+            if not source:
+                continue
+            try:
+                await interp.run_command_async(parser.parse_command(source))
+            except EOFError:
+                raise
+            except Exception as e:
+                io.print("".join(traceback.format_exception_only(e)))
+                io.println("ERROR")
+    except EOFError:
+        pass  # client closed the connection
+    finally:
+        reading.cancel()
+        try:
+            await io.flush()
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 6502, **options):
+    server = await asyncio.start_server(
+        lambda reader, writer: session(reader, writer, **options), host, port
+    )
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cody BASIC sessions over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6502)
+    parser.add_argument(
+        "--slice",
+        type=int,
+        default=1000,
+        help="statements a program runs before other sessions get their turn",
+    )
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, slice_statements=args.slice))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,10 @@ import sys
 import code
 import traceback
 from cody_parser import CodyBasicParser
+from cody_cache import ProgramCache, DEFAULT_CACHE_DIR
 from cody_interpreter import Interpreter
+from cody_transpiler import TranspilingInterpreter
+from cody_cfg import ControlFlowGraph
 
 
 class CodyBasicREPL(code.InteractiveConsole):
@@ -43,14 +46,21 @@ def repl():
     CodyBasicREPL(parser, interp).interact(banner="Cody BASIC")
 
 
-def run_file(filename):
-    parser = CodyBasicParser()
+def run_file(filename, transpile=False, cache_dir=None):
+    cache = ProgramCache(cache_dir) if cache_dir is not None else None
+    parser = CodyBasicParser(cache)
     parsed = parser.parse_file(filename)
-    interp = Interpreter()
+    interp = TranspilingInterpreter() if transpile else Interpreter()
     interp.load(parsed)
     interp.run()
 
 
+def dump_cfg(filename):
+    interp = Interpreter()
+    interp.load(CodyBasicParser().parse_file(filename))
+    print(ControlFlowGraph(interp.program).dump())
+
+
 def main():
     parser = argparse.ArgumentParser(
         prog=f"{os.path.basename(__file__)}", description="Cody BASIC"
@@ -67,14 +77,41 @@ def main():
         action="store_true",
         help="start graphical emulator",
     )
+    parser.add_argument(
+        "-t",
+        "--transpile",
+        action="store_true",
+        help="run the given file as translated Python code",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help=f"cache parsed programs in {DEFAULT_CACHE_DIR}",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="cache parsed programs in the given directory",
+    )
+    parser.add_argument(
+        "--cfg",
+        action="store_true",
+        help="print the control-flow graph of the given file instead of running it",
+    )
     args = parser.parse_args()
+    if args.cache and args.cache_dir is None:
+        args.cache_dir = DEFAULT_CACHE_DIR
 
     if args.graphical:
         import cody_pygame
 
         cody_pygame.start(args.file)
+    elif args.file and args.cfg:
+        dump_cfg(args.file)
     elif args.file:
-        run_file(args.file)
+        run_file(
+            args.file, transpile=args.transpile, cache_dir=args.cache_dir
+        )
     else:
         repl()
 
@@ -0,0 +1,221 @@
+# batch mode: run many programs with scripted inputs in a process pool
+# python cody_batch.py examples/*.bas [--jobs 4] [--timeout 10] [--report r.json]
+# the inputs of X.bas are read from X.in (one line per INPUT) and X.<name>.in,
+# every input file is one run, without input files the program runs once
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from cody_parser import CodyBasicParser
+from cody_cache import ProgramCache
+from cody_interpreter import Interpreter, TestIO, STOP_BUDGET, STOP_INPUT, STOP_ERROR
+from typing import Optional
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"  # parse or run time error
+STATUS_INPUT = "input"  # INPUT after the last scripted input line
+STATUS_TIMEOUT = "timeout"
+STATUS_CRASH = "crash"  # the worker process died
+
+
+class BatchJob:
+    def __init__(self, filename: str, inputs: list[str], name: Optional[str] = None):
+        self.filename = filename
+        self.inputs = inputs
+        self.name = name if name is not None else filename
+
+
+class BatchResult:
+    def __init__(
+        self,
+        job: BatchJob,
+        status: str,
+        output: list[str],
+        statements: int,
+        seconds: float,
+        error: Optional[str] = None,
+    ):
+        self.name = job.name
+        self.filename = job.filename
+        self.status = status
+        self.output = output
+        self.statements = statements
+        self.seconds = seconds
+        self.error = error
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.name,
+            "file": self.filename,
+            "status": self.status,
+            "statements": self.statements,
+            "seconds": self.seconds,
+            "error": self.error,
+            "output": self.output,
+        }
+
+
+def find_jobs(filename: str) -> list[BatchJob]:
+    """
+    One job per input file of the program, see the top of this file.
+    """
+    base = os.path.splitext(filename)[0]
+    input_files = glob.glob(glob.escape(base) + ".in")
+    input_files += sorted(glob.glob(glob.escape(base) + ".*.in"))
+    if not input_files:
+        return [BatchJob(filename, [])]
+    jobs = []
+    for input_file in input_files:
+        with open(input_file) as f:
+            inputs = f.read().splitlines()
+        name = filename + input_file[len(base) :].removesuffix(".in")
+        jobs.append(BatchJob(filename, inputs, name))
+    return jobs
+
+
+def run_job(
+    job: BatchJob,
+    timeout: Optional[float] = None,
+    slice_statements: int = 1000,
+    cache_dir: Optional[str] = None,
+) -> BatchResult:
+    """
+    Run one program with TestIO. The timeout is checked between slices of
+    slice_statements statements (see Interpreter.step), so a program that
+    runs too long is stopped without ending the worker process.
+    """
+    started = time.perf_counter()
+    io = TestIO(inputs=job.inputs)
+    statements = 0
+    status = STATUS_OK
+    error = None
+    try:
+        cache = ProgramCache(cache_dir) if cache_dir is not None else None
+        interp = Interpreter(io)
+        interp.load(CodyBasicParser(cache).parse_file(job.filename))
+        interp.start()
+        while True:
+            result = interp.step(slice_statements)
+            statements += result.statements
+            if result.reason == STOP_BUDGET:
+                if timeout is not None and time.perf_counter() - started > timeout:
+                    interp.stop()
+                    status = STATUS_TIMEOUT
+                    break
+            elif result.reason == STOP_INPUT:
+                interp.stop()
+                status = STATUS_INPUT
+                break
+            elif result.reason == STOP_ERROR:
+                raise result.error
+            else:
+                break
+    except Exception as e:
+        status = STATUS_ERROR
+        error = "\n".join([f"{type(e).__name__}: {e}", *getattr(e, "__notes__", [])])
+    seconds = time.perf_counter() - started
+    return BatchResult(job, status, io.output_log, statements, seconds, error)
+
+
+def run_batch(
+    jobs: list[BatchJob], workers: Optional[int] = None, **options
+) -> list[BatchResult]:
+    """
+    Run the jobs in a pool of worker processes, the options are passed to
+    run_job. The results are in the order of the jobs.
+
+    When a worker process dies the pool breaks and all its unfinished jobs
+    fail. These are run again by a single worker, in order, so the first
+    one that breaks that pool is the one that crashed. It is reported as
+    crashed, the jobs after it go back to a new pool.
+    """
+    results: list[Optional[BatchResult]] = [None] * len(jobs)
+    pending = list(range(len(jobs)))
+    while pending:
+        broken = _run_pool(jobs, pending, results, workers, options)
+        broken = _run_pool(jobs, broken, results, 1, options)
+        if broken:
+            error = "worker process died"
+            results[broken[0]] = BatchResult(
+                jobs[broken[0]], STATUS_CRASH, [], 0, 0.0, error
+            )
+        pending = broken[1:]
+    return results
+
+
+def _run_pool(
+    jobs: list[BatchJob],
+    indices: list[int],
+    results: list[Optional[BatchResult]],
+    workers: Optional[int],
+    options: dict,
+) -> list[int]:
+    # run the jobs at the indices, return the indices of the jobs that did
+    # not finish because a worker process died
+    broken = []
+    if not indices:
+        return broken
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [(i, pool.submit(run_job, jobs[i], **options)) for i in indices]
+        for i, future in futures:
+            try:
+                results[i] = future.result()
+            except BrokenProcessPool:
+                broken.append(i)
+    return broken
+
+
+def summary(results: list[BatchResult]) -> dict[str, int]:
+    counts = {"total": len(results)}
+    for status in (STATUS_OK, STATUS_ERROR, STATUS_INPUT, STATUS_TIMEOUT, STATUS_CRASH):
+        counts[status] = sum(1 for result in results if result.status == status)
+    return counts
+
+
+def write_report(results: list[BatchResult], filename: str):
+    report = {
+        "summary": summary(results),
+        "results": [result.to_json() for result in results],
+    }
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def print_summary(results: list[BatchResult]):
+    width = max([len(result.name) for result in results] + [7])
+    print(f"{'program':<{width}}  {'status':<7}  {'statements':>10}  {'ms':>8}")
+    for r in results:
+        ms = r.seconds * 1e3
+        print(f"{r.name:<{width}}  {r.status:<7}  {r.statements:>10}  {ms:>8.1f}")
+    print(", ".join(f"{count} {status}" for status, count in summary(results).items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="run Cody BASIC programs in batch")
+    parser.add_argument("files", nargs="+", help="BASIC programs")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="worker processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=None, help="seconds per program run"
+    )
+    parser.add_argument("--report", default=None, help="write a JSON report")
+    parser.add_argument("--cache-dir", default=None, help="cache parsed programs")
+    args = parser.parse_args()
+
+    jobs = [job for filename in args.files for job in find_jobs(filename)]
+    results = run_batch(
+        jobs, args.jobs, timeout=args.timeout, cache_dir=args.cache_dir
+    )
+    print_summary(results)
+    if args.report is not None:
+        write_report(results, args.report)
+    if any(result.status != STATUS_OK for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+from cody_util import to_unsigned, twos_complement, check_length
+from typing import Callable, Optional, TYPE_CHECKING
+import math
+import random
+
+if TYPE_CHECKING:
+    from cody_interpreter import IO
+
+# Built-in functions on already evaluated arguments, used by the backends
+# that evaluate the arguments themselves (bytecode VM, transpiler).
+# Every function gets the IO object as first argument.
+BuiltIn = Callable[..., int | str | None]
+
+
+def builtin_abs(io: "IO", expr) -> int:
+    assert isinstance(expr, int)
+    return twos_complement(abs(expr))
+
+
+def builtin_sqr(io: "IO", expr) -> int:
+    assert isinstance(expr, int)
+    return twos_complement(math.isqrt(expr))
+
+
+def builtin_mod(io: "IO", left, right) -> int:
+    assert isinstance(left, int) and isinstance(right, int)
+    return twos_complement(left % right)
+
+
+def builtin_rnd(io: "IO", seed=None) -> int:
+    # reference: page 273, see Interpreter.eval_builtin_function
+    if seed is not None:
+        assert isinstance(seed, int)
+        if seed == 0:
+            random.seed()
+        else:
+            random.seed(seed)
+    return random.randrange(256)
+
+
+def builtin_not(io: "IO", expr) -> int:
+    assert isinstance(expr, int)
+    return twos_complement(~expr)
+
+
+def builtin_and(io: "IO", left, right) -> int:
+    assert isinstance(left, int) and isinstance(right, int)
+    return twos_complement(left & right)
+
+
+def builtin_or(io: "IO", left, right) -> int:
+    assert isinstance(left, int) and isinstance(right, int)
+    return twos_complement(left | right)
+
+
+def builtin_xor(io: "IO", left, right) -> int:
+    assert isinstance(left, int) and isinstance(right, int)
+    return twos_complement(left ^ right)
+
+
+def builtin_sub(io: "IO", s, start, length) -> str:
+    assert (
+        isinstance(s, str)
+        and isinstance(start, int)
+        and isinstance(length, int)
+        and 0 <= start < len(s)
+        and 0 <= length <= len(s) - start
+    )
+    return s[start : start + length]
+
+
+def builtin_chr(io: "IO", *values) -> str:
+    for value in values:
+        assert 0 <= value < 256
+    return check_length("".join(map(chr, values)))
+
+
+def builtin_str(io: "IO", expr) -> str:
+    assert isinstance(expr, int)
+    return str(expr)  # at most 6 digits
+
+
+def builtin_val(io: "IO", s) -> int:
+    # "returns the number it was able to parse from the beginning of the string"
+    assert isinstance(s, str)
+    digits = []
+    for i, c in enumerate(s):
+        # "Leading minus signs are supported"
+        if c.isdigit() or (i == 0 and c == "-"):
+            digits.append(c)
+        else:
+            break
+    return twos_complement("".join(digits), convert=True)
+
+
+def builtin_len(io: "IO", expr) -> int:
+    assert isinstance(expr, str)
+    return len(expr)
+
+
+def builtin_asc(io: "IO", s) -> int:
+    assert isinstance(s, str)
+    if len(s) > 0:
+        value = ord(s[0])
+        assert 0 <= value < 256
+        return value
+    else:
+        return 0
+
+
+def builtin_peek(io: "IO", address) -> int:
+    return to_unsigned(io.peek(to_unsigned(address)), bits=8)
+
+
+def builtin_at(io: "IO", col, row) -> None:
+    assert isinstance(col, int) and isinstance(row, int)
+    io.print_at(col, row)
+
+
+def builtin_tab(io: "IO", col) -> None:
+    assert isinstance(col, int)
+    io.print_tab(col)
+
+
+# name -> (function, allowed number of arguments or None for any)
+BUILTIN_FUNCTIONS: dict[str, tuple[BuiltIn, Optional[range]]] = {
+    "ABS": (builtin_abs, range(1, 2)),
+    "SQR": (builtin_sqr, range(1, 2)),
+    "MOD": (builtin_mod, range(2, 3)),
+    "RND": (builtin_rnd, range(0, 2)),
+    "NOT": (builtin_not, range(1, 2)),
+    "AND": (builtin_and, range(2, 3)),
+    "OR": (builtin_or, range(2, 3)),
+    "XOR": (builtin_xor, range(2, 3)),
+    "SUB$": (builtin_sub, range(3, 4)),
+    "CHR$": (builtin_chr, None),
+    "STR$": (builtin_str, range(1, 2)),
+    "VAL": (builtin_val, range(1, 2)),
+    "LEN": (builtin_len, range(1, 2)),
+    "ASC": (builtin_asc, range(1, 2)),
+    "PEEK": (builtin_peek, range(1, 2)),
+    "AT": (builtin_at, range(2, 3)),
+    "TAB": (builtin_tab, range(1, 2)),
+}
+
+
+# variants of the built-in functions above without the type checks of the
+# arguments, for calls whose argument types are known (see cody_types)
+UNCHECKED_BUILTINS: dict[BuiltIn, BuiltIn] = {
+    builtin_abs: lambda io, expr: twos_complement(abs(expr)),
+    builtin_sqr: lambda io, expr: twos_complement(math.isqrt(expr)),
+    builtin_mod: lambda io, left, right: twos_complement(left % right),
+    builtin_not: lambda io, expr: ~expr,  # stays in the 16-bit range
+    builtin_and: lambda io, left, right: left & right,
+    builtin_or: lambda io, left, right: left | right,
+    builtin_xor: lambda io, left, right: left ^ right,
+    builtin_str: lambda io, expr: str(expr),  # at most 6 digits
+    builtin_len: lambda io, expr: len(expr),
+}
+
+
+def lookup_builtin_function(name: str, arity: int) -> Optional[BuiltIn]:
+    function, arities = BUILTIN_FUNCTIONS.get(name, (None, range(0)))
+    if function is None or (arities is not None and arity not in arities):
+        return None
+    return function
+
+
+def find_builtin_function(name: str, arity: int) -> BuiltIn:
+    function = lookup_builtin_function(name, arity)
+    if function is None:
+        raise NotImplementedError(f"built-in function {name}/{arity} not implemented")
+    return function
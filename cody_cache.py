@@ -0,0 +1,132 @@
+from typing import Optional, TYPE_CHECKING
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+if TYPE_CHECKING:
+    from cody_parser import Command
+
+# bump if the layout of the cache files changes
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "cody_basic")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# modules whose code decides what the parser produces
+PARSER_MODULES = ("cody_parser", "cody_util", "cody_variables", "cody_builtins")
+
+
+def parser_version() -> str:
+    """
+    Hash of the parser source code, so that cached programs are invalidated
+    by any change to the parser.
+    """
+    h = hashlib.sha256()
+    for name in PARSER_MODULES:
+        with open(sys.modules[name].__file__, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+class ProgramCache:
+    """
+    On-disk cache of parsed programs, similar to .pyc files for Python.
+
+    Entries are keyed by the hash of the source code, the parser version and
+    the cache format version, so stale entries are never read. When the
+    cache grows beyond max_bytes the least recently used entries are deleted.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.directory = directory if directory is not None else DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self._version: Optional[str] = None
+
+    @property
+    def version(self) -> str:
+        if self._version is None:
+            self._version = f"{CACHE_FORMAT_VERSION}-{parser_version()}"
+        return self._version
+
+    def key(self, source: str) -> str:
+        h = hashlib.sha256(self.version.encode())
+        h.update(source.encode("utf-8", errors="surrogatepass"))
+        return h.hexdigest()
+
+    def path(self, source: str) -> str:
+        return os.path.join(self.directory, f"{self.key(source)}.pickle")
+
+    def get(self, source: str) -> Optional[list["Command"]]:
+        path = self.path(source)
+        try:
+            with open(path, "rb") as f:
+                program = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # broken entry (e.g. interrupted write): parse again
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return program
+
+    def put(self, source: str, program: list["Command"]):
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temporary file first, so readers never see partial files
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(program, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path(source))
+        except BaseException:
+            self._remove(tmp)
+            raise
+        self.evict()
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        """
+        Return (last use, size, path) of all cache entries.
+        """
+        result = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return result
+        for name in names:
+            if not name.endswith(".pickle"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # removed concurrently
+            result.append((stat.st_mtime, stat.st_size, path))
+        return result
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self._remove(path)
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,238 @@
+from cody_parser import Command, CommandTypes
+from typing import Optional
+
+# kinds of edges between basic blocks
+NEXT = "next"  # fall-through to the following line
+JUMP = "jump"  # GOTO with a constant line number
+CALL = "call"  # GOSUB with a constant line number
+RETURN = "return"  # RETURN to the line after a GOSUB
+LOOP = "loop"  # NEXT back to the body of its FOR
+
+# commands that end a basic block
+TERMINATORS = (
+    CommandTypes.GOTO,
+    CommandTypes.GOSUB,
+    CommandTypes.IF,
+    CommandTypes.FOR,
+    CommandTypes.NEXT,
+    CommandTypes.RETURN,
+    CommandTypes.END,
+)
+
+
+class BasicBlock:
+    """
+    A straight-line run of commands: only the first command is jumped to and
+    only the last command jumps.
+    """
+
+    def __init__(self, index: int, start: int, end: int):
+        self.index = index
+        # commands self.program[start:end] of the graph
+        self.start = start
+        self.end = end
+        self.edges: list[tuple[str, int]] = []  # (kind, block index)
+        # the block ends with a GOTO/GOSUB to a computed line number
+        self.computed = False
+        # the block is the target of a back edge, i.e. the start of a loop
+        self.loop_header = False
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+
+class ControlFlowGraph:
+    """
+    Basic blocks and edges of a linked program (see Interpreter.link).
+
+    Jumps with computed line numbers have no edges (BasicBlock.computed),
+    NEXT is matched with the closest FOR before it in the program text, which
+    is how loops are usually written, but not enforced by the interpreter.
+    """
+
+    def __init__(self, program: list[Command]):
+        self.program = program
+        self.blocks: list[BasicBlock] = []
+        self.block_of: list[int] = []  # command index -> block index
+        self.build()
+
+    def build(self):
+        leaders = self.find_leaders()
+        for start in sorted(leaders):
+            if self.blocks:
+                self.blocks[-1].end = start
+            self.blocks.append(BasicBlock(len(self.blocks), start, len(self.program)))
+        for block in self.blocks:
+            self.block_of.extend([block.index] * len(block))
+
+        loop_bodies = self.match_loops()
+        return_sites = sorted(
+            self.successor(i)
+            for i, cmd in enumerate(self.program)
+            if self.inner(cmd).command_type == CommandTypes.GOSUB
+            and self.successor(i) is not None
+        )
+        for block in self.blocks:
+            last = block.end - 1
+            edges = self.command_edges(last, loop_bodies, return_sites)
+            for kind, target in edges:
+                if target is None:
+                    block.computed = True
+                else:
+                    block.edges.append((kind, self.block_of[target]))
+            block.edges = list(dict.fromkeys(block.edges))  # without duplicates
+        self.find_loop_headers()
+
+    @staticmethod
+    def inner(command: Command) -> Command:
+        # the command that is executed if the condition of an IF holds
+        if command.command_type == CommandTypes.IF:
+            return command.command
+        return command
+
+    def successor(self, index: int) -> Optional[int]:
+        return self.program[index].next_index
+
+    def find_leaders(self) -> set[int]:
+        leaders = {0} if self.program else set()
+        for i, cmd in enumerate(self.program):
+            if cmd.command_type in TERMINATORS and cmd.next_index is not None:
+                leaders.add(cmd.next_index)
+            target = self.inner(cmd).target_index
+            if target is not None:
+                leaders.add(target)
+        return leaders
+
+    def match_loops(self) -> dict[int, int]:
+        """
+        Return the index of the loop body for every NEXT (command index).
+        """
+        bodies = {}
+        loops = []
+        for i, cmd in enumerate(self.program):
+            if cmd.command_type == CommandTypes.FOR:
+                loops.append(i)
+            elif self.inner(cmd).command_type == CommandTypes.NEXT and loops:
+                body = self.successor(loops[-1])
+                if body is not None:
+                    bodies[i] = body
+                if cmd.command_type == CommandTypes.NEXT:
+                    loops.pop()  # a conditional NEXT does not close the loop
+        return bodies
+
+    def command_edges(
+        self, index: int, loop_bodies: dict[int, int], return_sites: list[int]
+    ) -> list[tuple[str, Optional[int]]]:
+        cmd = self.program[index]
+        inner = self.inner(cmd)
+        t = inner.command_type
+        edges = []
+        if t in (CommandTypes.GOTO, CommandTypes.GOSUB):
+            edges.append((JUMP if t == CommandTypes.GOTO else CALL, inner.target_index))
+        elif t == CommandTypes.RETURN:
+            edges.extend((RETURN, site) for site in return_sites)
+        elif t == CommandTypes.NEXT and index in loop_bodies:
+            edges.append((LOOP, loop_bodies[index]))
+        # commands without jump and IFs with a false condition fall through
+        falls_through = t not in (
+            CommandTypes.GOTO,
+            CommandTypes.GOSUB,
+            CommandTypes.RETURN,
+            CommandTypes.END,
+        )
+        if (falls_through or cmd is not inner) and cmd.next_index is not None:
+            edges.append((NEXT, cmd.next_index))
+        return edges
+
+    def find_loop_headers(self):
+        # iterative depth-first search, back edges lead to loop headers
+        if not self.blocks:
+            return
+        state = [0] * len(self.blocks)  # 0: new, 1: on stack, 2: done
+        for root in range(len(self.blocks)):
+            if state[root]:
+                continue
+            state[root] = 1
+            stack = [(root, iter(self.blocks[root].edges))]
+            while stack:
+                block, edges = stack[-1]
+                for _, target in edges:
+                    if state[target] == 1:
+                        self.blocks[target].loop_header = True
+                    elif state[target] == 0:
+                        state[target] = 1
+                        stack.append((target, iter(self.blocks[target].edges)))
+                        break
+                else:
+                    state[block] = 2
+                    stack.pop()
+
+    def reachable(self) -> set[int]:
+        """
+        Return the indices of all blocks reachable from the first line. If a
+        reachable block jumps to a computed line, every block is reachable.
+        """
+        if not self.blocks:
+            return set()
+        seen = {0}
+        todo = [0]
+        while todo:
+            block = self.blocks[todo.pop()]
+            if block.computed:
+                return set(range(len(self.blocks)))
+            for _, target in block.edges:
+                if target not in seen:
+                    seen.add(target)
+                    todo.append(target)
+        return seen
+
+    def unreachable_lines(self) -> list[int]:
+        """
+        Line numbers that can never be executed (dead lines).
+        """
+        reachable = self.reachable()
+        return [
+            cmd.line_number
+            for block in self.blocks
+            if block.index not in reachable
+            for cmd in self.program[block.start : block.end]
+        ]
+
+    def thread_jump(self, index: int) -> int:
+        """
+        Follow a chain of GOTOs with constant targets starting at the given
+        command index, returns the index of the first command that is not
+        such a GOTO (or that starts a cycle).
+        """
+        seen = set()
+        while index not in seen:
+            cmd = self.program[index]
+            if cmd.command_type != CommandTypes.GOTO or cmd.target_index is None:
+                break
+            seen.add(index)
+            index = cmd.target_index
+        return index
+
+    def describe_block(self, block: BasicBlock) -> str:
+        first = self.program[block.start].line_number
+        last = self.program[block.end - 1].line_number
+        lines = f"line {first}" if first == last else f"lines {first}-{last}"
+        return f"block {block.index} ({lines})"
+
+    def dump(self) -> str:
+        reachable = self.reachable()
+        out = []
+        for block in self.blocks:
+            notes = [f"{len(block)} command" + ("s" if len(block) > 1 else "")]
+            if block.loop_header:
+                notes.append("loop header")
+            if block.index not in reachable:
+                notes.append("unreachable")
+            out.append(f"{self.describe_block(block)}: {', '.join(notes)}")
+            for cmd in self.program[block.start : block.end]:
+                out.append(f"    {cmd.source}")
+            for kind, target in block.edges:
+                out.append(f"  -> {kind} {self.describe_block(self.blocks[target])}")
+            if block.computed:
+                out.append("  -> computed line number")
+        return "\n".join(out)
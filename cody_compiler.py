@@ -0,0 +1,221 @@
+from cody_parser import ASTTypes, ASTNode
+from cody_util import wrap16, check_string, check_length
+from cody_variables import get_element
+from cody_builtins import BuiltIn
+from cody_types import infer_type, INT
+from typing import Callable, TYPE_CHECKING
+import operator
+
+if TYPE_CHECKING:
+    from cody_interpreter import Interpreter
+
+# a compiled expression: evaluates its subtree for the given interpreter
+Closure = Callable[["Interpreter"], int | str | bool | None]
+
+COMPARISONS = {
+    ASTTypes.Equal: operator.eq,
+    ASTTypes.NotEqual: operator.ne,
+    ASTTypes.Less: operator.lt,
+    ASTTypes.LessEqual: operator.le,
+    ASTTypes.Greater: operator.gt,
+    ASTTypes.GreaterEqual: operator.ge,
+}
+
+INTEGER_OPS = {
+    ASTTypes.BinarySub: operator.sub,
+    ASTTypes.BinaryMul: operator.mul,
+    ASTTypes.BinaryDiv: operator.floordiv,  # integer div
+}
+
+
+def compile_expression(node: ASTNode) -> Closure:
+    """
+    Turn an expression tree into nested closures that compute the same
+    values as Interpreter.eval. The closure is cached on the node as
+    node.compiled.
+    """
+    compiled = getattr(node, "compiled", None)
+    if compiled is None:
+        compiled = _compile(node)
+        node.compiled = compiled
+    return compiled
+
+
+def _compile(node: ASTNode) -> Closure:
+    if node.ast_type in COMPARISONS:
+        return _compile_comparison(
+            COMPARISONS[node.ast_type],
+            compile_expression(node.left),
+            compile_expression(node.right),
+        )
+    elif node.ast_type in INT_CLOSURES and infer_type(node) == INT:
+        # both operands are integers, no checks needed
+        return INT_CLOSURES[node.ast_type](
+            compile_expression(node.left), compile_expression(node.right)
+        )
+    elif node.ast_type == ASTTypes.BinaryAdd:
+        return _compile_add(
+            compile_expression(node.left), compile_expression(node.right)
+        )
+    elif node.ast_type in INTEGER_OPS:
+        return _compile_integer_op(
+            INTEGER_OPS[node.ast_type],
+            compile_expression(node.left),
+            compile_expression(node.right),
+        )
+    elif node.ast_type == ASTTypes.UnaryMinus:
+        return _compile_unary_minus(compile_expression(node.expr))
+    elif node.ast_type == ASTTypes.StringLiteral:
+        return _compile_constant(check_string(node.literal))
+    elif node.ast_type == ASTTypes.IntegerLiteral:
+        return _compile_constant(wrap16(node.value))
+    elif node.ast_type in (ASTTypes.IntegerVariable, ASTTypes.StringVariable):
+        return _compile_variable(node)
+    elif node.ast_type == ASTTypes.ArrayExpression:
+        return _compile_array(node.subnode, compile_expression(node.index))
+    elif node.ast_type == ASTTypes.BuiltInVariable:
+        return _compile_builtin_var(node.name)
+    elif node.ast_type == ASTTypes.BuiltInCall:
+        if node.function is None:
+            # reported when the call is executed
+            return _compile_builtin_call(node)
+        args = [compile_expression(arg) for arg in node.expressions]
+        return _compile_bound_builtin_call(node.function, args)
+    else:
+        raise NotImplementedError(f"ast type {node.ast_type.name} not implemented")
+
+
+def _compile_comparison(op, left: Closure, right: Closure) -> Closure:
+    def closure(interp):
+        lv = left(interp)
+        rv = right(interp)
+        assert isinstance(lv, (int, str)) and type(lv) == type(rv)
+        return op(lv, rv)
+
+    return closure
+
+
+def _compile_add(left: Closure, right: Closure) -> Closure:
+    def closure(interp):
+        lv = left(interp)
+        rv = right(interp)
+        assert isinstance(lv, (int, str)) and isinstance(rv, (int, str))
+        if isinstance(lv, int) and isinstance(rv, int):
+            return wrap16(lv + rv)
+        else:
+            return check_length(f"{lv}{rv}")
+
+    return closure
+
+
+def _compile_integer_op(op, left: Closure, right: Closure) -> Closure:
+    def closure(interp):
+        lv = left(interp)
+        rv = right(interp)
+        assert isinstance(lv, int) and isinstance(rv, int)
+        return wrap16(op(lv, rv))
+
+    return closure
+
+
+# Closures for integer arithmetic on operands that are known to be integers
+# (see cody_types), with inlined wrap16.
+
+
+def _compile_int_add(left: Closure, right: Closure) -> Closure:
+    def closure(interp):
+        return ((left(interp) + right(interp) + 0x8000) & 0xFFFF) - 0x8000
+
+    return closure
+
+
+def _compile_int_sub(left: Closure, right: Closure) -> Closure:
+    def closure(interp):
+        return ((left(interp) - right(interp) + 0x8000) & 0xFFFF) - 0x8000
+
+    return closure
+
+
+def _compile_int_mul(left: Closure, right: Closure) -> Closure:
+    def closure(interp):
+        return ((left(interp) * right(interp) + 0x8000) & 0xFFFF) - 0x8000
+
+    return closure
+
+
+def _compile_int_div(left: Closure, right: Closure) -> Closure:
+    def closure(interp):
+        return ((left(interp) // right(interp) + 0x8000) & 0xFFFF) - 0x8000
+
+    return closure
+
+
+INT_CLOSURES = {
+    ASTTypes.BinaryAdd: _compile_int_add,
+    ASTTypes.BinarySub: _compile_int_sub,
+    ASTTypes.BinaryMul: _compile_int_mul,
+    ASTTypes.BinaryDiv: _compile_int_div,
+}
+
+
+def _compile_unary_minus(expr: Closure) -> Closure:
+    def closure(interp):
+        value = expr(interp)
+        assert isinstance(value, int)
+        return wrap16(-value)
+
+    return closure
+
+
+def _compile_constant(value: int | str) -> Closure:
+    def closure(interp):
+        return value
+
+    return closure
+
+
+def _compile_variable(target: ASTNode) -> Closure:
+    slot = target.slot
+    if target.ast_type == ASTTypes.IntegerVariable:
+
+        def closure(interp):
+            return interp.int_arrays[slot][0]
+
+    else:
+        assert target.ast_type == ASTTypes.StringVariable
+
+        def closure(interp):
+            return interp.strings[slot]
+
+    return closure
+
+
+def _compile_array(target: ASTNode, index: Closure) -> Closure:
+    assert target.ast_type == ASTTypes.IntegerVariable
+    slot = target.slot
+
+    def closure(interp):
+        return get_element(interp.int_arrays[slot], index(interp))
+
+    return closure
+
+
+def _compile_builtin_var(name: str) -> Closure:
+    def closure(interp):
+        return interp.eval_builtin_var(name)
+
+    return closure
+
+
+def _compile_builtin_call(node: ASTNode) -> Closure:
+    def closure(interp):
+        return interp.eval_builtin_function(node)
+
+    return closure
+
+
+def _compile_bound_builtin_call(function: BuiltIn, args: list[Closure]) -> Closure:
+    def closure(interp):
+        return function(interp.io, *[arg(interp) for arg in args])
+
+    return closure
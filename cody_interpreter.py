@@ -1,10 +1,17 @@
 from cody_parser import CodyBasicParser, ASTTypes, ASTNode, CommandTypes, Command
+from cody_parser import command_expressions, NewCommand, RunCommand, COMMAND_CLASSES
+from cody_compiler import compile_expression
+from cody_optimizer import optimize_command
+from cody_types import infer_type, INT
+from cody_builtins import UNCHECKED_BUILTINS
 from abc import ABC, abstractmethod
 from typing import Optional, Iterable, Literal
-from cody_util import to_unsigned, twos_complement, check_string
+from cody_util import to_unsigned, twos_complement, wrap16, check_string
+from cody_util import check_length
+from cody_variables import new_int_arrays, new_strings, clear_int_arrays
+from cody_variables import variable_slot, get_element, set_element, element_index
+import bisect
 import time
-import random
-import math
 
 
 class IO(ABC):
@@ -86,6 +93,13 @@ class IO(ABC):
     @abstractmethod
     def input(self, prompt: str) -> str: ...
 
+    def input_ready(self, count: int) -> bool:
+        """
+        True if "count" lines can be read with input() without waiting. Only
+        asked by Interpreter.step, IOs with a blocking input() keep this.
+        """
+        return True
+
     def prompt_char(self) -> str:
         return "?"
 
@@ -102,17 +116,87 @@ class IO(ABC):
         return time.monotonic() * 60
 
 
+# reasons why Interpreter.step returned
+STOP_BUDGET = "budget"  # max_statements statements were run
+STOP_INPUT = "input"  # an INPUT waits for lines (IO.input_ready)
+STOP_END = "end"  # the program ended
+STOP_ERROR = "error"  # the program failed with StepResult.error
+
+
+class StepResult:
+    def __init__(
+        self, reason: str, statements: int, error: Optional[Exception] = None
+    ):
+        self.reason = reason
+        self.statements = statements  # number of statements run
+        self.error = error
+
+    @property
+    def resumable(self) -> bool:
+        return self.reason in (STOP_BUDGET, STOP_INPUT)
+
+
+class InputPending(Exception):
+    """
+    Raised by INPUT while stepping if the IO has not enough input lines yet.
+    """
+
+    def __init__(self, command: Command):
+        super().__init__()
+        self.command = command  # the INPUT, e.g. the command of an IF
+
+
 class Interpreter:
-    def __init__(self, io: Optional[IO] = None):
+    def __init__(
+        self,
+        io: Optional[IO] = None,
+        *,
+        compile_expressions: bool = False,
+        optimize: bool = True,
+        fuse_statements: bool = False,
+        elide_checks: bool = False,
+    ):
         self.io = io if io is not None else StdIO()
+        # evaluate expressions with closures (see cody_compiler) instead of
+        # walking the tree
+        self.compile_expressions = compile_expressions
+        if compile_expressions:
+            self.eval = self.eval_compiled
+        # skip the run time type checks of expressions whose types are known
+        # (see cody_types), ignored when compiling expressions
+        self.elide_checks = elide_checks
+        if elide_checks and not compile_expressions:
+            self.eval = self.eval_unchecked
+        # fold constant expressions of loaded lines (see cody_optimizer)
+        self.optimize = optimize
+        # run straight-line commands as one unit (see _run_fused)
+        self.fuse_statements = fuse_statements
+        # start index -> (runners and commands, next index) or () if the
+        # command at the index cannot be fused, filled on demand
+        self.fused: dict[int, tuple] = {}
         self.program = []  # sorted list of commands (by line number)
+        self.line_numbers: list[int] = []  # line numbers of self.program (same order)
+        self.linked: bool = True  # False if self.program changed since last link()
         self.running: bool = False  # True if running program, False if in repl mode
-        self.call_stack: list[int] = []
-        self.loop_stack: list[tuple[str, int, int, int]] = []
-        self.int_arrays: dict[str, dict[str, int]] = {}
-        self.strings: dict[str, str] = {}
-        self.data_pos: int = 0
-        self.data_segment: list[int] = []
+        # return indices (successors of the GOSUBs) of the running subroutines
+        self.call_stack: list[Optional[int]] = []
+        # index of the next command of a program run by step(), None if done
+        self.step_index: Optional[int] = None
+        # INPUT inside the IF at step_index that waits for its input, the IF
+        # condition is not evaluated again when resuming
+        self.step_pending: Optional[Command] = None
+        self.stepping: bool = False  # True while in step()
+        # frames of the running FOR loops, see FOR and NEXT in _run_command
+        self.loop_stack: list[tuple] = []
+        # variables by slot (see cody_variables)
+        self.int_arrays = new_int_arrays()
+        self.strings = new_strings()
+        # values of all DATA lines in line order, READ takes them at the cursor
+        self.data_values: list[int] = []
+        self.data_cursor: int = 0
+        # line numbers of the DATA lines and their number of values (same order)
+        self.data_lines: list[int] = []
+        self.data_counts: list[int] = []
 
     @property
     def repl(self):
@@ -121,32 +205,60 @@ class Interpreter:
     def reset(self, program=False):
         if program:
             self.program.clear()
+            self.line_numbers.clear()
+            self.fused.clear()
+            self.data_values.clear()
+            self.data_lines.clear()
+            self.data_counts.clear()
+            self.linked = True
         self.running = False
+        self.step_index = None
+        self.step_pending = None
         self.call_stack.clear()
         self.loop_stack.clear()
-        self.int_arrays.clear()
-        self.strings.clear()
-        self.data_pos = 0
-        self.data_segment.clear()
+        clear_int_arrays(self.int_arrays)
+        self.strings[:] = new_strings()
+        self.data_cursor = 0
 
     def find_line_number(
         self,
         line_number: int,
-        mode: Literal["exact", "next"] = "exact",
+        mode: Literal["exact", "next", "after", "exact_or_next"] = "exact",
         default: Optional[int] = None,
     ) -> Optional[int]:
-        # precondition: self.program must be sorted!
-        # TODO: smarter algorithm
-        for i, cmd in enumerate(self.program):
-            assert 0 <= cmd.line_number <= 65535
-            if cmd.line_number == line_number and mode == "exact":
+        """
+        Find the index of a line in self.program by binary search.
+
+        "exact" returns the index of the line itself (IndexError if missing),
+        "next"/"after" the index of the first line behind it and
+        "exact_or_next" the index of the line or, if missing, the first line
+        behind it. "default" is returned if no such line exists.
+        """
+        # precondition: self.line_numbers must be in sync with self.program
+        if mode == "exact":
+            i = bisect.bisect_left(self.line_numbers, line_number)
+            if i < len(self.line_numbers) and self.line_numbers[i] == line_number:
                 return i
-            elif cmd.line_number > line_number:
-                if mode == "exact":
-                    raise IndexError(f"could not find line number {line_number}")
-                else:
-                    return i
-        return default
+            raise IndexError(f"could not find line number {line_number}")
+        elif mode in ("next", "after"):
+            i = bisect.bisect_right(self.line_numbers, line_number)
+        elif mode == "exact_or_next":
+            i = bisect.bisect_left(self.line_numbers, line_number)
+        else:
+            raise ValueError(f"unknown mode {mode}")
+        return i if i < len(self.line_numbers) else default
+
+    def lines_in_range(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> list[Command]:
+        """
+        Return the commands with start <= line number <= end (None for no
+        limit), found by binary search.
+        """
+        first = 0 if start is None else bisect.bisect_left(self.line_numbers, start)
+        if end is None:
+            return self.program[first:]
+        return self.program[first : bisect.bisect_right(self.line_numbers, end)]
 
     def compute_target(self, node: ASTNode) -> tuple[ASTNode, int]:
         if node.ast_type == ASTTypes.ArrayExpression:
@@ -156,18 +268,16 @@ class Interpreter:
             target = node
             index = 0
         else:
-            raise ValueError(f"cannot read/write to node {node.ast_type.name.name}")
+            raise ValueError(f"cannot read/write to node {node.ast_type.name}")
         return target, index
 
     def get_value(self, target: ASTNode, index: int) -> int | str:
         if target.ast_type == ASTTypes.IntegerVariable:
-            value = self.int_arrays.setdefault(target.name, {}).setdefault(index, 0)
-            return twos_complement(value)
+            return get_element(self.int_arrays[target.slot], index)
         elif target.ast_type == ASTTypes.StringVariable:
             # string arrays not supported
             assert index == 0
-            value = self.strings.setdefault(target.name, "")
-            return check_string(value)
+            return self.strings[target.slot]
         else:
             raise ValueError(f"cannot read from node {target.ast_type.name}")
 
@@ -175,16 +285,28 @@ class Interpreter:
         self, target: ASTNode, index: int, value: int | str, convert_int: bool = False
     ):
         if target.ast_type == ASTTypes.IntegerVariable:
-            value = twos_complement(value, convert=convert_int)
-            self.int_arrays.setdefault(target.name, {})[index] = value
+            if type(value) is int:
+                value = wrap16(value)
+            else:
+                value = twos_complement(value, convert=convert_int)
+            set_element(self.int_arrays[target.slot], index, value)
         elif target.ast_type == ASTTypes.StringVariable:
             # string arrays not supported
             assert index == 0
-            value = check_string(value)
-            self.strings[target.name] = value
+            assert isinstance(value, str)  # valid, see check_length
+            self.strings[target.slot] = value
         else:
             raise ValueError(f"cannot write to node {target.ast_type.name}")
 
+    def variable(self, name: str, index: int = 0) -> int | str:
+        """
+        Return the value of a variable by name, e.g. "A" or "A$".
+        """
+        if name.endswith("$"):
+            assert index == 0
+            return self.strings[variable_slot(name[:-1])]
+        return get_element(self.int_arrays[variable_slot(name)], index)
+
     def eval(self, node):
         if node.ast_type == ASTTypes.Equal:
             left = self.eval(node.left)
@@ -221,32 +343,32 @@ class Interpreter:
             right = self.eval(node.right)
             assert isinstance(left, (int, str)) and isinstance(right, (int, str))
             if isinstance(left, int) and isinstance(right, int):
-                return twos_complement(left + right)
+                return wrap16(left + right)
             else:
-                return check_string(f"{left}{right}")
+                return check_length(f"{left}{right}")
         elif node.ast_type == ASTTypes.BinarySub:
             left = self.eval(node.left)
             right = self.eval(node.right)
             assert isinstance(left, int) and isinstance(right, int)
-            return twos_complement(left - right)
+            return wrap16(left - right)
         elif node.ast_type == ASTTypes.BinaryMul:
             left = self.eval(node.left)
             right = self.eval(node.right)
             assert isinstance(left, int) and isinstance(right, int)
-            return twos_complement(left * right)
+            return wrap16(left * right)
         elif node.ast_type == ASTTypes.BinaryDiv:
             left = self.eval(node.left)
             right = self.eval(node.right)
             assert isinstance(left, int) and isinstance(right, int)
-            return twos_complement(left // right)  # integer div
+            return wrap16(left // right)  # integer div
         elif node.ast_type == ASTTypes.UnaryMinus:
             expr = self.eval(node.expr)
             assert isinstance(expr, int)
-            return twos_complement(-expr)
+            return wrap16(-expr)
         elif node.ast_type == ASTTypes.StringLiteral:
-            return check_string(node.literal)
+            return node.literal  # checked by the parser
         elif node.ast_type == ASTTypes.IntegerLiteral:
-            return twos_complement(node.value)
+            return wrap16(node.value)
         elif node.ast_type in (
             ASTTypes.IntegerVariable,
             ASTTypes.StringVariable,
@@ -257,324 +379,453 @@ class Interpreter:
         elif node.ast_type == ASTTypes.BuiltInVariable:
             return self.eval_builtin_var(node.name)
         elif node.ast_type == ASTTypes.BuiltInCall:
-            return self.eval_builtin_function(node.name, node.expressions)
+            return self.eval_builtin_function(node)
         else:
             raise NotImplementedError(f"ast type {node.ast_type.name} not implemented")
 
+    def eval_unchecked(self, node):
+        """
+        Like eval, but without the type checks for expressions of a known
+        static type. Other expressions are evaluated with the checks.
+        """
+        if infer_type(node) is None:
+            return Interpreter.eval(self, node)
+        t = node.ast_type
+        if t == ASTTypes.IntegerLiteral:
+            return node.value  # range checked by infer_type
+        elif t == ASTTypes.IntegerVariable:
+            return self.int_arrays[node.slot][0]
+        elif t == ASTTypes.StringVariable:
+            return self.strings[node.slot]
+        elif t == ASTTypes.ArrayExpression:
+            index = self.eval(node.index)
+            return get_element(self.int_arrays[node.subnode.slot], index)
+        elif t == ASTTypes.StringLiteral:
+            return node.literal  # checked by infer_type
+        elif t == ASTTypes.BuiltInCall:
+            function = UNCHECKED_BUILTINS.get(node.function, node.function)
+            return function(self.io, *[self.eval(arg) for arg in node.expressions])
+        elif t == ASTTypes.BuiltInVariable:
+            return self.eval_builtin_var(node.name)
+        elif t == ASTTypes.UnaryMinus:
+            return ((0x8000 - self.eval(node.expr)) & 0xFFFF) - 0x8000
+        left = self.eval(node.left)
+        right = self.eval(node.right)
+        # arithmetic wraps to 16 bits with an inlined wrap16
+        if t == ASTTypes.BinaryAdd:
+            if node.static_type == INT:
+                return ((left + right + 0x8000) & 0xFFFF) - 0x8000
+            return check_length(f"{left}{right}")
+        elif t == ASTTypes.BinarySub:
+            return ((left - right + 0x8000) & 0xFFFF) - 0x8000
+        elif t == ASTTypes.BinaryMul:
+            return ((left * right + 0x8000) & 0xFFFF) - 0x8000
+        elif t == ASTTypes.BinaryDiv:
+            return ((left // right + 0x8000) & 0xFFFF) - 0x8000  # integer div
+        elif t == ASTTypes.Equal:
+            return left == right
+        elif t == ASTTypes.NotEqual:
+            return left != right
+        elif t == ASTTypes.Less:
+            return left < right
+        elif t == ASTTypes.LessEqual:
+            return left <= right
+        elif t == ASTTypes.Greater:
+            return left > right
+        elif t == ASTTypes.GreaterEqual:
+            return left >= right
+        raise NotImplementedError(f"ast type {t.name} not implemented")
+
+    def eval_compiled(self, node):
+        return compile_expression(node)(self)
+
     def eval_builtin_var(self, name):
         if name == "TI":
             return twos_complement(self.io.get_time(), convert=True)
         else:
             raise NotImplementedError(f"built-in variable {name} not implemented")
 
-    def eval_builtin_function(self, name, args):
-        if name == "ABS" and len(args) == 1:
-            expr = self.eval(args[0])
-            assert isinstance(expr, int)
-            return twos_complement(abs(expr))
-        elif name == "SQR" and len(args) == 1:
-            expr = self.eval(args[0])
-            assert isinstance(expr, int)
-            return twos_complement(math.isqrt(expr))
-        elif name == "MOD" and len(args) == 2:
-            left = self.eval(args[0])
-            right = self.eval(args[1])
-            assert isinstance(left, int) and isinstance(right, int)
-            return twos_complement(left % right)
-        elif name == "RND" and len(args) <= 1:
-            # reference: page 273
-            # "The function has two forms, one that accepts a number as the random seed value, and a no-argument form that returns the next random number in the sequence."
-            if len(args) == 1:
-                seed = self.eval(args[0])
-                assert isinstance(seed, int)
-                if seed == 0:
-                    # "A seed value of zero is invalid and will be replaced with the system's default seed value."
-                    random.seed()
-                else:
-                    # "For a given seed value the resulting sequence will always be the same."
-                    random.seed(seed)
-            # "[...] generate random numbers between 0 and 255."
-            return random.randrange(256)
-        elif name == "NOT" and len(args) == 1:
-            expr = self.eval(args[0])
-            assert isinstance(expr, int)
-            return twos_complement(~expr)
-        elif name == "AND" and len(args) == 2:
-            left = self.eval(args[0])
-            right = self.eval(args[1])
-            assert isinstance(left, int) and isinstance(right, int)
-            return twos_complement(left & right)
-        elif name == "OR" and len(args) == 2:
-            left = self.eval(args[0])
-            right = self.eval(args[1])
-            assert isinstance(left, int) and isinstance(right, int)
-            return twos_complement(left | right)
-        elif name == "XOR" and len(args) == 2:
-            left = self.eval(args[0])
-            right = self.eval(args[1])
-            assert isinstance(left, int) and isinstance(right, int)
-            return twos_complement(left ^ right)
-        elif name == "SUB$" and len(args) == 3:
-            s = self.eval(args[0])
-            start = self.eval(args[1])
-            length = self.eval(args[2])
-            assert (
-                isinstance(s, str)
-                and isinstance(start, int)
-                and isinstance(length, int)
-                and 0 <= start < len(s)
-                and 0 <= length <= len(s) - start
-            )
-            return s[start : start + length]
-        elif name == "CHR$":
-
-            def codscii_chr(x):
-                value = self.eval(x)
-                assert 0 <= value < 256
-                return chr(value)
-
-            return check_string("".join(map(codscii_chr, args)))
-        elif name == "STR$" and len(args) == 1:
-            expr = self.eval(args[0])
-            assert isinstance(expr, int)
-            return check_string(expr, convert=True)
-        elif name == "VAL" and len(args) == 1:
-            # "returns the number it was able to parse from the beginning of the string"
-            s = self.eval(args[0])
-            assert isinstance(s, str)
-            digits = []
-            for i, c in enumerate(s):
-                # "Leading minus signs are supported"
-                if c.isdigit() or (i == 0 and c == "-"):
-                    digits.append(c)
-                else:
-                    break
-            return twos_complement("".join(digits), convert=True)
-        elif name == "LEN" and len(args) == 1:
-            expr = self.eval(args[0])
-            assert isinstance(expr, str)
-            return len(expr)
-        elif name == "ASC" and len(args) == 1:
-            s = self.eval(args[0])
-            assert isinstance(s, str)
-            if len(s) > 0:
-
-                def codscii_ord(c):
-                    value = ord(c)
-                    assert 0 <= value < 256
-                    return value
-
-                return codscii_ord(s[0])
-            else:
-                return 0
-        elif name == "PEEK" and len(args) == 1:
-            address = to_unsigned(self.eval(args[0]))
-            return to_unsigned(self.io.peek(address), bits=8)
-        elif name == "AT" and len(args) == 2:
-            col = self.eval(args[0])
-            row = self.eval(args[1])
-            assert isinstance(col, int) and isinstance(row, int)
-            self.io.print_at(col, row)
-            return None
-        elif name == "TAB" and len(args) == 1:
-            row = self.eval(args[0])
-            assert isinstance(row, int)
-            self.io.print_tab(row)
-            return None
-        else:
+    def eval_builtin_function(self, node):
+        # node.function was bound by the parser, see cody_builtins
+        if node.function is None:
             raise NotImplementedError(
-                f"built-in function {name}/{len(args)} not implemented"
+                f"built-in function {node.name}/{len(node.expressions)} not implemented"
             )
+        return node.function(self.io, *[self.eval(arg) for arg in node.expressions])
 
-    def _run_command(self, command: Command) -> Optional[int]:
+    def _check_cancel(self):
         if getattr(self.io, "cancel", None):
             # TODO: hack
             self.io.cancel = False
             raise KeyboardInterrupt
 
+    def _run_command(self, command: Command) -> Optional[int]:
+        self._check_cancel()
+
         if self.repl and command.line_number is not None:
             # repl mode but the command has a line number:
             # edit saved program
             self.load_command(command)
             return  # done
 
-        next_index = "recalc"
-        if command.command_type in (
-            CommandTypes.REM,
-            CommandTypes.EMPTY,
-            CommandTypes.DATA,
-        ):
-            pass  # ignore comments and (already precomputed) DATA values
-        elif command.command_type == CommandTypes.LIST:
-            assert self.repl
-            start = self.eval(command.start) if command.start else None
-            end = self.eval(command.end) if command.end else None
-            for cmd in self.program:
-                if (start is None or start <= cmd.line_number) and (
-                    end is None or cmd.line_number <= end
-                ):
-                    self.io.print(cmd.source)
-                    self.io.println()
-        elif command.command_type == CommandTypes.LOAD:
-            assert self.repl
-            uart = self.eval(command.uart)
-            mode = self.eval(command.mode)
-            assert mode in (0, 1)
-            if mode == 0:  # text mode
-                lines = self.io.load_text(uart)
-                parser = CodyBasicParser()
-                parsed = parser.parse_lines(lines)
-                self.load(parsed)
-            else:
-                raise NotImplementedError("LOAD in binary mode not supported")
-        elif command.command_type == CommandTypes.SAVE:
-            assert self.repl
-            uart = self.eval(command.uart)
-            self.io.save_text(uart, map(lambda cmd: cmd.source, self.program))
-        elif command.command_type == CommandTypes.RUN:
-            assert self.repl
-            self.reset()
-            # precondition: self.program must be sorted, so 0 is the first line
-            next_index = 0
-        elif command.command_type == CommandTypes.NEW:
-            assert self.repl
-            self.reset(program=True)
-        elif command.command_type == CommandTypes.ASSIGNMENT:
-            target, index = self.compute_target(command.lvalue)
-            value = self.eval(command.rvalue)
-            self.set_value(target, index, value)
-        elif command.command_type == CommandTypes.PRINT:
-            value = ""
-            for expr in command.expressions:
-                v = self.eval(expr)
-                if v is not None:
-                    self.io.print(check_string(v, convert=True))
-
-            if not command.no_new_line:
-                self.io.println()
-        elif command.command_type == CommandTypes.INPUT:
-            assert self.running
-            for expr in command.expressions:
-                target, index = self.compute_target(expr)
-                value = self.io.input(f"{self.io.prompt_char()} ")
-                self.set_value(target, index, value, convert_int=True)
-        elif command.command_type == CommandTypes.OPEN:
-            assert self.running
-            uart = self.eval(command.uart)
-            bit_rate = self.eval(command.bit_rate)
-            self.io.open_uart(uart, bit_rate)
-        elif command.command_type == CommandTypes.CLOSE:
-            assert self.running
-            self.io.close_uart()
-        elif command.command_type == CommandTypes.POKE:
-            address = to_unsigned(self.eval(command.address))
-            value = to_unsigned(self.eval(command.expression), bits=8)
-            self.io.poke(address, value)
-        elif command.command_type == CommandTypes.SYS:
-            address = to_unsigned(self.eval(command.address))
-            self.io.sys(address)
-        elif command.command_type == CommandTypes.IF:
-            value = self.eval(command.condition)
-            assert isinstance(value, bool)
-            if (
-                value
-                and (potential_jump_target := self._run_command(command.command))
-                is not None
-            ):
-                next_index = potential_jump_target
-        elif command.command_type == CommandTypes.GOTO:
-            assert self.running
-            target = self.eval(command.expression)
-            assert isinstance(target, int)
-            next_index = self.find_line_number(target)
-        elif command.command_type == CommandTypes.FOR:
-            assert self.running
-
-            loop_var, loop_var_index = self.compute_target(command.loop_variable)
-            assert loop_var.ast_type == ASTTypes.IntegerVariable
-            initial = self.eval(command.initial)
-            self.set_value(loop_var, loop_var_index, initial)
-
-            limit = self.eval(command.limit)
-            assert initial <= limit
-            self.loop_stack.append(
-                (loop_var, loop_var_index, limit, command.line_number)
-            )
-        elif command.command_type == CommandTypes.NEXT:
-            assert self.running
-            loop_var, loop_var_index, limit, for_line_number = self.loop_stack[-1]
-            current_value = self.get_value(loop_var, loop_var_index)
-            if current_value >= limit:
-                self.loop_stack.pop()
-            else:
-                self.set_value(loop_var, loop_var_index, current_value + 1)
-                next_index = self.find_line_number(for_line_number, mode="next")
-        elif command.command_type == CommandTypes.GOSUB:
-            assert self.running
-            target = self.eval(command.expression)
-            assert isinstance(target, int)
-            assert command.line_number is not None
-            self.call_stack.append(command.line_number)
-            next_index = self.find_line_number(target)
-        elif command.command_type == CommandTypes.RETURN:
-            assert self.running
-            next_index = self.find_line_number(self.call_stack.pop(), mode="after")
-        elif command.command_type == CommandTypes.END:
-            assert self.running
-            next_index = None
-        elif command.command_type == CommandTypes.READ:
-            for expr in command.expressions:
-                target, index = self.compute_target(expr)
-                # only integer variables supported
-                assert target.ast_type == ASTTypes.IntegerVariable
-                value = self.read_next_data_value()
-                self.set_value(target, index, value)
-        elif command.command_type == CommandTypes.RESTORE:
-            self.data_pos = 0
-            self.data_segment.clear()
-        else:
+        runner = self.RUNNERS_BY_CLASS.get(type(command))
+        if runner is None:
             raise NotImplementedError(
                 f"command type {command.command_type.name} not implemented"
             )
+        # next_index is precomputed by link(), None for commands without line number
+        return runner(self, command)
 
-        if next_index == "recalc":
-            if command.line_number is not None:
-                return self.find_line_number(command.line_number, mode="next")
-            else:
-                return None
+    # Every runner returns the index of the next command (None to stop).
+
+    def _run_nothing(self, command: Command) -> Optional[int]:
+        # comments and (already precomputed) DATA values
+        return command.next_index
+
+    def _run_list(self, command: Command) -> Optional[int]:
+        assert self.repl
+        start = self.eval(command.start) if command.start else None
+        end = self.eval(command.end) if command.end else None
+        for cmd in self.lines_in_range(start, end):
+            self.io.print(cmd.source)
+            self.io.println()
+        return command.next_index
+
+    def _run_load(self, command: Command) -> Optional[int]:
+        assert self.repl
+        uart = self.eval(command.uart)
+        mode = self.eval(command.mode)
+        assert mode in (0, 1)
+        if mode == 0:  # text mode
+            lines = self.io.load_text(uart)
+            parser = CodyBasicParser()
+            parsed = parser.parse_lines(lines)
+            self.load(parsed)
         else:
-            return next_index
+            raise NotImplementedError("LOAD in binary mode not supported")
+        return command.next_index
+
+    def _run_save(self, command: Command) -> Optional[int]:
+        assert self.repl
+        uart = self.eval(command.uart)
+        self.io.save_text(uart, map(lambda cmd: cmd.source, self.program))
+        return command.next_index
+
+    def _run_run(self, command: Command) -> Optional[int]:
+        assert self.repl
+        self.reset()
+        # precondition: self.program must be sorted, so 0 is the first line
+        return 0
+
+    def _run_new(self, command: Command) -> Optional[int]:
+        assert self.repl
+        self.reset(program=True)
+        return command.next_index
+
+    def _run_assignment(self, command: Command) -> Optional[int]:
+        target, index = self.compute_target(command.lvalue)
+        value = self.eval(command.rvalue)
+        self.set_value(target, index, value)
+        return command.next_index
+
+    def _run_print(self, command: Command) -> Optional[int]:
+        for expr in command.expressions:
+            v = self.eval(expr)
+            if v is not None:
+                self.io.print(v if isinstance(v, str) else str(v))
+
+        if not command.no_new_line:
+            self.io.println()
+        return command.next_index
+
+    def _run_input(self, command: Command) -> Optional[int]:
+        assert self.running
+        if self.stepping and not self.io.input_ready(len(command.expressions)):
+            raise InputPending(command)  # before reading anything, runs again
+        for expr in command.expressions:
+            target, index = self.compute_target(expr)
+            value = self.io.input(f"{self.io.prompt_char()} ")
+            if target.ast_type == ASTTypes.StringVariable:
+                value = check_string(value)
+            self.set_value(target, index, value, convert_int=True)
+        return command.next_index
+
+    def _run_open(self, command: Command) -> Optional[int]:
+        assert self.running
+        uart = self.eval(command.uart)
+        bit_rate = self.eval(command.bit_rate)
+        self.io.open_uart(uart, bit_rate)
+        return command.next_index
+
+    def _run_close(self, command: Command) -> Optional[int]:
+        assert self.running
+        self.io.close_uart()
+        return command.next_index
+
+    def _run_poke(self, command: Command) -> Optional[int]:
+        address = to_unsigned(self.eval(command.address))
+        value = to_unsigned(self.eval(command.expression), bits=8)
+        self.io.poke(address, value)
+        return command.next_index
+
+    def _run_sys(self, command: Command) -> Optional[int]:
+        address = to_unsigned(self.eval(command.address))
+        self.io.sys(address)
+        return command.next_index
+
+    def _run_if(self, command: Command) -> Optional[int]:
+        value = self.eval(command.condition)
+        assert isinstance(value, bool)
+        if value:
+            # linked with the same successor as the IF itself
+            return self._run_command(command.command)
+        return command.next_index
+
+    def _run_goto(self, command: Command) -> Optional[int]:
+        assert self.running
+        if command.target_index is not None:
+            return command.target_index
+        target = self.eval(command.expression)
+        assert isinstance(target, int)
+        return self.find_line_number(to_unsigned(target))
+
+    def _run_for(self, command: Command) -> Optional[int]:
+        assert self.running
+
+        loop_var, loop_var_index = self.compute_target(command.loop_variable)
+        assert loop_var.ast_type == ASTTypes.IntegerVariable
+        initial = self.eval(command.initial)
+        self.set_value(loop_var, loop_var_index, initial)
+
+        limit = self.eval(command.limit)
+        assert initial <= limit
+        # the element of the loop variable exists now (set_value), NEXT
+        # increments it in place and jumps to the body by index
+        self.loop_stack.append(
+            (
+                self.int_arrays[loop_var.slot],
+                element_index(loop_var_index),
+                limit,
+                command.next_index,
+            )
+        )
+        return command.next_index
+
+    def _run_next(self, command: Command) -> Optional[int]:
+        assert self.running
+        values, index, limit, body_index = self.loop_stack[-1]
+        value = values[index]
+        if value >= limit:
+            self.loop_stack.pop()
+            return command.next_index
+        values[index] = value + 1  # no overflow: value < limit
+        return body_index
+
+    def _run_gosub(self, command: Command) -> Optional[int]:
+        assert self.running
+        assert command.line_number is not None
+        next_index = self._run_goto(command)
+        self.call_stack.append(command.next_index)
+        return next_index
+
+    def _run_return(self, command: Command) -> Optional[int]:
+        assert self.running
+        return self.call_stack.pop()
+
+    def _run_end(self, command: Command) -> Optional[int]:
+        assert self.running
+        return None
+
+    def _run_read(self, command: Command) -> Optional[int]:
+        for expr in command.expressions:
+            target, index = self.compute_target(expr)
+            # only integer variables supported
+            assert target.ast_type == ASTTypes.IntegerVariable
+            value = self.read_next_data_value()
+            self.set_value(target, index, value)
+        return command.next_index
+
+    def _run_restore(self, command: Command) -> Optional[int]:
+        self.data_cursor = 0
+        return command.next_index
+
+    COMMAND_RUNNERS = {
+        CommandTypes.REM: _run_nothing,
+        CommandTypes.EMPTY: _run_nothing,
+        CommandTypes.DATA: _run_nothing,
+        CommandTypes.LIST: _run_list,
+        CommandTypes.LOAD: _run_load,
+        CommandTypes.SAVE: _run_save,
+        CommandTypes.RUN: _run_run,
+        CommandTypes.NEW: _run_new,
+        CommandTypes.ASSIGNMENT: _run_assignment,
+        CommandTypes.PRINT: _run_print,
+        CommandTypes.INPUT: _run_input,
+        CommandTypes.OPEN: _run_open,
+        CommandTypes.CLOSE: _run_close,
+        CommandTypes.POKE: _run_poke,
+        CommandTypes.SYS: _run_sys,
+        CommandTypes.IF: _run_if,
+        CommandTypes.GOTO: _run_goto,
+        CommandTypes.FOR: _run_for,
+        CommandTypes.NEXT: _run_next,
+        CommandTypes.GOSUB: _run_gosub,
+        CommandTypes.RETURN: _run_return,
+        CommandTypes.END: _run_end,
+        CommandTypes.READ: _run_read,
+        CommandTypes.RESTORE: _run_restore,
+    }
+    # the same runners by command class, the class is hashed faster than the
+    # enum member
+    RUNNERS_BY_CLASS = {
+        COMMAND_CLASSES[t]: runner for t, runner in COMMAND_RUNNERS.items()
+    }
+
+    # commands that can be fused with the following command: no control flow
+    # and nothing that depends on the REPL state, None for commands without
+    # any effect at run time
+    FUSABLE_COMMANDS = {
+        CommandTypes.ASSIGNMENT: _run_assignment,
+        CommandTypes.PRINT: _run_print,
+        CommandTypes.POKE: _run_poke,
+        CommandTypes.REM: None,
+        CommandTypes.EMPTY: None,
+        CommandTypes.DATA: None,
+    }
+
+    def _fuse(self, start: int) -> tuple:
+        """
+        Collect the straight-line run of fusable commands starting at
+        index "start", returns ((runner, command), ...) and the index of the
+        command behind the run or () if the first command is not fusable.
+        """
+        body = []
+        next_index = start
+        while next_index is not None:
+            cmd = self.program[next_index]
+            if cmd.command_type not in self.FUSABLE_COMMANDS:
+                break
+            runner = self.FUSABLE_COMMANDS[cmd.command_type]
+            if runner is not None:
+                body.append((runner, cmd))
+            next_index = cmd.next_index
+        if next_index == start:
+            return ()
+        return tuple(body), next_index
 
     def load(self, code: Iterable[Command]):
-        self.run_command(Command(CommandTypes.NEW))
+        """
+        Replace the program by the given lines. The result is the same as
+        entering the lines one by one (the last line with a number wins,
+        empty lines delete), but the program is sorted and linked once.
+        """
+        self.run_command(NewCommand())
+        lines: dict[int, Command] = {}
         for cmd in code:
-            self.load_command(cmd)
+            assert cmd.line_number is not None
+            assert 0 <= cmd.line_number <= 65535
+            if cmd.command_type == CommandTypes.EMPTY:
+                lines.pop(cmd.line_number, None)
+            else:
+                lines[cmd.line_number] = cmd
+        self.line_numbers.extend(sorted(lines))
+        self.program.extend(self.own(lines[n]) for n in self.line_numbers)
+        for cmd in self.program:
+            self._prepare_command(cmd)  # DATA values are appended in order
+        self.link()
+
+    def link(self):
+        """
+        Precompute the successor index of every command and the target index
+        of every GOTO/GOSUB with a constant line number, so that running the
+        program does not have to search for them.
+        """
+        for i, cmd in enumerate(self.program):
+            next_index = i + 1 if i + 1 < len(self.program) else None
+            self._link_command(cmd, next_index)
+        self.fused.clear()
+        self.linked = True
+
+    def _link_command(self, command: Command, next_index: Optional[int]):
+        command.next_index = next_index
+        command.target_index = None
+        if self.compile_expressions:
+            for node in command_expressions(command):
+                compile_expression(node)
+        if command.command_type in (CommandTypes.GOTO, CommandTypes.GOSUB):
+            if command.expression.ast_type == ASTTypes.IntegerLiteral:
+                target = to_unsigned(command.expression.value)
+                try:
+                    command.target_index = self.find_line_number(target)
+                except IndexError:
+                    pass  # reported when the jump is executed
+        elif command.command_type == CommandTypes.IF:
+            self._link_command(command.command, next_index)
 
     def load_command(self, command: Command):
         assert command.line_number is not None
+        assert 0 <= command.line_number <= 65535
         if command.command_type == CommandTypes.EMPTY:
             # remove
             try:
-                del self.program[self.find_line_number(command.line_number)]
-            except Exception:
-                pass
+                idx = self.find_line_number(command.line_number)
+            except IndexError:
+                return
+            del self.program[idx]
+            del self.line_numbers[idx]
+            self._update_data(command.line_number, [])
         else:
             # save
+            command = self.own(command)
+            self._prepare_command(command)
             idx = self.find_line_number(
                 command.line_number, mode="exact_or_next", default=len(self.program)
             )
             if (
                 idx < len(self.program)
-                and self.program[idx].line_number == command.line_number
+                and self.line_numbers[idx] == command.line_number
             ):
                 # override
                 self.program[idx] = command
             else:
                 # new line
                 self.program.insert(idx, command)
+                self.line_numbers.insert(idx, command.line_number)
+        # call and loop frames hold indices into the old program
+        self.call_stack.clear()
+        self.loop_stack.clear()
+        self.linked = False
+
+    def own(self, command: Command) -> Command:
+        """
+        Return the command to put into the program. link() stores indices
+        into this program on the command, so a command that is already in
+        the program of another interpreter is copied first. The expressions
+        stay shared, optimizing and compiling them gives the same result for
+        every interpreter.
+        """
+        if command.owner is not None and command.owner is not self:
+            command = outer = command.copy()
+            while outer.command_type == CommandTypes.IF:  # linked as well
+                outer.command = outer.command.copy()
+                outer = outer.command
+        command.owner = self
+        return command
+
+    def _prepare_command(self, command: Command):
+        # optimize a new line and update the DATA values of its line number
+        if self.optimize:
+            optimize_command(command, self.eval)
+        values = []
+        if command.command_type == CommandTypes.DATA:
+            values = [
+                e.value if e.ast_type == ASTTypes.IntegerLiteral else self.eval(e)
+                for e in command.expressions
+            ]
+        self._update_data(command.line_number, values)
 
     def run(self):
-        self.run_command(Command(CommandTypes.RUN))
+        self.run_command(RunCommand())
 
     def run_command(self, command: Command):
         assert self.repl
@@ -583,27 +834,148 @@ class Interpreter:
 
     def _run_loop(self, next_index: Optional[int]):
         assert self.repl
+        if next_index is not None and not self.linked:
+            self.link()  # program was edited since the last run
+        self.running = True
+        cmd = None
+        try:
+            if self.fuse_statements:
+                self._run_fused(next_index)
+            else:
+                while next_index is not None:
+                    cmd = self.program[next_index]
+                    next_index = self._run_command(cmd)
+        except Exception as e:
+            if cmd is not None:
+                e.add_note(f"in line {cmd.source}")
+            raise
+        finally:
+            self.running = False
+
+    def start(self):
+        """
+        Prepare the program to be run by step(), like RUN without running.
+        """
+        assert self.repl
+        next_index = self._run_command(RunCommand())  # resets all variables
+        if not self.linked:
+            self.link()
+        self.step_index = next_index if self.program else None
         self.running = True
+
+    def step(self, max_statements: int = 1000) -> StepResult:
+        """
+        Run up to max_statements statements of the program started with
+        start(). The result tells why it returned, if it is resumable the
+        next call continues with the next statement. The host can run
+        several interpreters in one thread like this, REPL commands are
+        not possible until the program ended (or stop() was called).
+        """
+        assert self.running and not self.stepping
+        next_index = self.step_index
+        count = 0
+        cmd = None
+        self.stepping = True
         try:
+            if self.step_pending is not None and max_statements > 0:
+                cmd = self.program[next_index]
+                pending, self.step_pending = self.step_pending, None
+                next_index = self._run_command(pending)
+                count += 1
             while next_index is not None:
+                if count == max_statements:
+                    self.step_index = next_index
+                    return StepResult(STOP_BUDGET, count)
                 cmd = self.program[next_index]
                 next_index = self._run_command(cmd)
+                count += 1
+        except InputPending as e:
+            self.step_index = next_index
+            if e.command is not cmd:
+                self.step_pending = e.command  # nested in the IF at next_index
+            return StepResult(STOP_INPUT, count)
+        except Exception as e:
+            e.add_note(f"in line {cmd.source}")
+            self.stop()
+            return StepResult(STOP_ERROR, count, e)
+        except BaseException:
+            self.stop()  # e.g. KeyboardInterrupt from a cancel
+            raise
         finally:
-            self.running = False
-
-    def read_next_data_value(self):
-        if not self.data_segment:
-            # find next DATA command
-            for i in range(self.data_pos, len(self.program)):
-                cmd = self.program[i]
-                if cmd.command_type == CommandTypes.DATA and cmd.expressions:
-                    self.data_pos = i + 1
-                    self.data_segment = list(map(self.eval, cmd.expressions))
-                    break
+            self.stepping = False
+        self.stop()
+        return StepResult(STOP_END, count)
+
+    def stop(self):
+        """
+        End a program started with start(), e.g. after an error.
+        """
+        self.running = False
+        self.step_index = None
+        self.step_pending = None
+
+    def _run_fused(self, next_index: Optional[int]):
+        """
+        Like the loop in _run_loop, but runs of fusable commands are executed
+        in one step: one cancel check and one successor lookup per run.
+        """
+        program = self.program
+        fused = self.fused
+        cmd = None
+        try:
+            while next_index is not None:
+                block = fused.get(next_index)
+                if block is None:
+                    block = fused[next_index] = self._fuse(next_index)
+                if block:
+                    self._check_cancel()
+                    body, next_index = block
+                    for runner, cmd in body:
+                        runner(self, cmd)
+                else:
+                    cmd = program[next_index]
+                    next_index = self._run_command(cmd)
+        except Exception as e:
+            if cmd is not None:
+                e.add_note(f"in line {cmd.source}")
+            raise
+
+    def _update_data(self, line_number: int, values: list[int]):
+        """
+        Replace the DATA values of a line in self.data_values (an empty list
+        removes them), only the values of this line are evaluated again.
+        """
+        lines = self.data_lines
+        if values and (not lines or lines[-1] < line_number):
+            # appending lines in order, e.g. while loading a program
+            lines.append(line_number)
+            self.data_counts.append(len(values))
+            self.data_values.extend(values)
+            return
+        i = bisect.bisect_left(lines, line_number)
+        found = i < len(lines) and lines[i] == line_number
+        if not values and not found:
+            return  # no DATA line before and after
+        start = sum(self.data_counts[:i])
+        if found:
+            end = start + self.data_counts[i]
+            if values:
+                self.data_counts[i] = len(values)
             else:
-                raise ValueError("no more data values")
+                del lines[i]
+                del self.data_counts[i]
+        else:
+            end = start
+            lines.insert(i, line_number)
+            self.data_counts.insert(i, len(values))
+        self.data_values[start:end] = values
 
-        return self.data_segment.pop(0)
+    def read_next_data_value(self) -> int:
+        if self.data_cursor >= len(self.data_values):
+            raise ValueError("no more data values")
+        value = self.data_values[self.data_cursor]
+        self.data_cursor += 1
+        return value
 
 
 class StdIO(IO):
@@ -678,6 +1050,9 @@ class TestIO(IO):
         self._check_new_line()
         self.new_line[self.uart] = True
 
+    def input_ready(self, count: int) -> bool:
+        return len(self._ilog()) >= count
+
     def input(self, prompt: str) -> str:
         result = str(self._ilog().pop(0))
         if self.print_prompts:
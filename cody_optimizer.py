@@ -0,0 +1,171 @@
+from cody_parser import ASTTypes, ASTNode, Command, CommandTypes
+from cody_parser import COMMAND_EXPRESSION_FIELDS, IntegerLiteral, StringLiteral
+from typing import Callable
+
+# evaluates a constant expression, e.g. Interpreter.eval
+Evaluate = Callable[[ASTNode], int | str | bool | None]
+
+# built-in functions without side effects, RND, PEEK, AT and TAB are missing
+PURE_BUILTINS = {
+    "ABS",
+    "SQR",
+    "MOD",
+    "NOT",
+    "AND",
+    "OR",
+    "XOR",
+    "SUB$",
+    "CHR$",
+    "STR$",
+    "VAL",
+    "LEN",
+    "ASC",
+}
+
+# built-in functions that always return an integer
+INTEGER_BUILTINS = {
+    "ABS",
+    "SQR",
+    "MOD",
+    "RND",
+    "NOT",
+    "AND",
+    "OR",
+    "XOR",
+    "VAL",
+    "LEN",
+    "ASC",
+    "PEEK",
+}
+
+COMPARISONS = {
+    ASTTypes.Equal,
+    ASTTypes.NotEqual,
+    ASTTypes.Less,
+    ASTTypes.LessEqual,
+    ASTTypes.Greater,
+    ASTTypes.GreaterEqual,
+}
+
+ARITHMETIC = {
+    ASTTypes.BinaryAdd,
+    ASTTypes.BinarySub,
+    ASTTypes.BinaryMul,
+    ASTTypes.BinaryDiv,
+}
+
+
+def is_constant(node: ASTNode) -> bool:
+    return node.ast_type in (ASTTypes.IntegerLiteral, ASTTypes.StringLiteral)
+
+
+def is_literal(node: ASTNode, value: int) -> bool:
+    return node.ast_type == ASTTypes.IntegerLiteral and node.value == value
+
+
+def is_integer(node: ASTNode) -> bool:
+    """
+    True if the expression evaluates to an integer (or fails). Integers are
+    always in the 16-bit range, so identities like x*1 need no wraparound.
+    """
+    t = node.ast_type
+    if t in (
+        ASTTypes.IntegerLiteral,
+        ASTTypes.IntegerVariable,
+        ASTTypes.ArrayExpression,
+        ASTTypes.BinarySub,
+        ASTTypes.BinaryMul,
+        ASTTypes.BinaryDiv,
+        ASTTypes.UnaryMinus,
+        ASTTypes.BuiltInVariable,
+    ):
+        return True
+    elif t == ASTTypes.BinaryAdd:
+        return is_integer(node.left) and is_integer(node.right)
+    elif t == ASTTypes.BuiltInCall:
+        return node.name in INTEGER_BUILTINS
+    return False
+
+
+def fold(node: ASTNode, evaluate: Evaluate) -> ASTNode:
+    """
+    Replace a constant expression by its value. Expressions that fail are
+    kept, so that the error is reported when (and if) they are executed.
+    """
+    try:
+        value = evaluate(node)
+    except Exception:
+        return node
+    if isinstance(value, bool):
+        return node  # comparisons have no literal
+    elif isinstance(value, int):
+        return IntegerLiteral(value)
+    elif isinstance(value, str):
+        return StringLiteral(value)
+    return node
+
+
+def simplify(node: ASTNode) -> ASTNode:
+    # identities of integer arithmetic: x+0, 0+x, x-0, x*1, 1*x, x/1
+    t = node.ast_type
+    left, right = node.left, node.right
+    if t == ASTTypes.BinaryAdd:
+        if is_literal(right, 0) and is_integer(left):
+            return left
+        if is_literal(left, 0) and is_integer(right):
+            return right
+    elif t == ASTTypes.BinarySub:
+        if is_literal(right, 0) and is_integer(left):
+            return left
+    elif t == ASTTypes.BinaryMul:
+        if is_literal(right, 1) and is_integer(left):
+            return left
+        if is_literal(left, 1) and is_integer(right):
+            return right
+    elif t == ASTTypes.BinaryDiv:
+        if is_literal(right, 1) and is_integer(left):
+            return left
+    return node
+
+
+def optimize_expression(node: ASTNode, evaluate: Evaluate) -> ASTNode:
+    """
+    Return an equivalent expression with constant subexpressions folded and
+    arithmetic identities removed (the node is modified in place).
+    """
+    t = node.ast_type
+    if t in COMPARISONS or t in ARITHMETIC:
+        node.left = optimize_expression(node.left, evaluate)
+        node.right = optimize_expression(node.right, evaluate)
+        if t in COMPARISONS:
+            return node
+        if is_constant(node.left) and is_constant(node.right):
+            return fold(node, evaluate)
+        return simplify(node)
+    elif t == ASTTypes.UnaryMinus:
+        node.expr = optimize_expression(node.expr, evaluate)
+        if is_constant(node.expr):
+            return fold(node, evaluate)
+    elif t == ASTTypes.ArrayExpression:
+        node.index = optimize_expression(node.index, evaluate)
+    elif t == ASTTypes.BuiltInCall:
+        node.expressions = [optimize_expression(e, evaluate) for e in node.expressions]
+        if node.name in PURE_BUILTINS and all(map(is_constant, node.expressions)):
+            return fold(node, evaluate)
+    return node
+
+
+def optimize_command(command: Command, evaluate: Evaluate) -> Command:
+    """
+    Optimize all expressions of a command in place. The source of the
+    command is kept, so LIST and SAVE show the program as it was entered.
+    """
+    for field in COMMAND_EXPRESSION_FIELDS:
+        value = getattr(command, field, None)
+        if isinstance(value, list):
+            setattr(command, field, [optimize_expression(e, evaluate) for e in value])
+        elif value is not None:
+            setattr(command, field, optimize_expression(value, evaluate))
+    if command.command_type == CommandTypes.IF:
+        optimize_command(command.command, evaluate)
+    return command
@@ -1,6 +1,12 @@
 from enum import Enum, auto, unique
-from typing import Optional, Iterable
+from typing import Optional, Iterable, TYPE_CHECKING
+import re
 from cody_util import twos_complement, check_string
+from cody_variables import variable_slot
+from cody_builtins import BuiltIn, lookup_builtin_function
+
+if TYPE_CHECKING:
+    from cody_cache import ProgramCache
 
 
 @unique
@@ -83,54 +89,480 @@ builtin_vars = [
 
 
 class Command:
+    """
+    Base class of all commands, there is one subclass with fixed fields
+    (__slots__) per command type. The fields are set by the parser.
+    """
+
+    __slots__ = ("line_number", "source", "next_index", "target_index", "owner")
+    command_type: CommandTypes
+
     def __init__(
-        self,
-        command_type: CommandTypes,
-        line_number: Optional[int] = None,
-        source: Optional[str] = None,
+        self, line_number: Optional[int] = None, source: Optional[str] = None
     ):
-        self.command_type = command_type
         self.line_number = line_number
         self.source = source
+        # set by Interpreter.link: index of the fall-through successor and
+        # of the jump target of GOTO/GOSUB with a constant line number
+        self.next_index: Optional[int] = None
+        self.target_index: Optional[int] = None
+        # the interpreter whose program holds the command, see Interpreter.own
+        self.owner = None
+
+    def copy(self) -> "Command":
+        # shallow copy, fields are shared
+        new = object.__new__(type(self))
+        for name in Command.__slots__ + self.__slots__:
+            setattr(new, name, getattr(self, name))
+        return new
+
+
+class AssignmentCommand(Command):
+    __slots__ = ("lvalue", "rvalue")
+    command_type = CommandTypes.ASSIGNMENT
+
+
+class EmptyCommand(Command):
+    __slots__ = ()
+    command_type = CommandTypes.EMPTY
+
+
+class RemCommand(Command):
+    __slots__ = ()
+    command_type = CommandTypes.REM
+
+
+class GosubCommand(Command):
+    __slots__ = ("expression",)
+    command_type = CommandTypes.GOSUB
+
+
+class PrintCommand(Command):
+    __slots__ = ("expressions", "no_new_line")
+    command_type = CommandTypes.PRINT
+
+
+class IfCommand(Command):
+    __slots__ = ("condition", "command")
+    command_type = CommandTypes.IF
+
+
+class EndCommand(Command):
+    __slots__ = ()
+    command_type = CommandTypes.END
+
+
+class InputCommand(Command):
+    __slots__ = ("expressions",)
+    command_type = CommandTypes.INPUT
+
+
+class GotoCommand(Command):
+    __slots__ = ("expression",)
+    command_type = CommandTypes.GOTO
+
+
+class NextCommand(Command):
+    __slots__ = ()
+    command_type = CommandTypes.NEXT
+
+
+class ForCommand(Command):
+    __slots__ = ("loop_variable", "initial", "limit")
+    command_type = CommandTypes.FOR
+
+
+class ReturnCommand(Command):
+    __slots__ = ()
+    command_type = CommandTypes.RETURN
+
+
+class OpenCommand(Command):
+    __slots__ = ("uart", "bit_rate")
+    command_type = CommandTypes.OPEN
+
+
+class CloseCommand(Command):
+    __slots__ = ()
+    command_type = CommandTypes.CLOSE
+
+
+class DataCommand(Command):
+    __slots__ = ("expressions",)
+    command_type = CommandTypes.DATA
+
+
+class ReadCommand(Command):
+    __slots__ = ("expressions",)
+    command_type = CommandTypes.READ
+
+
+class RestoreCommand(Command):
+    __slots__ = ()
+    command_type = CommandTypes.RESTORE
+
+
+class PokeCommand(Command):
+    __slots__ = ("address", "expression")
+    command_type = CommandTypes.POKE
+
+
+class SysCommand(Command):
+    __slots__ = ("address",)
+    command_type = CommandTypes.SYS
+
+
+class NewCommand(Command):
+    __slots__ = ()
+    command_type = CommandTypes.NEW
+
+
+class LoadCommand(Command):
+    __slots__ = ("uart", "mode")
+    command_type = CommandTypes.LOAD
+
+
+class SaveCommand(Command):
+    __slots__ = ("uart",)
+    command_type = CommandTypes.SAVE
+
+
+class RunCommand(Command):
+    __slots__ = ()
+    command_type = CommandTypes.RUN
+
+
+class ListCommand(Command):
+    __slots__ = ("start", "end")
+    command_type = CommandTypes.LIST
+
+
+COMMAND_CLASSES: dict[CommandTypes, type[Command]] = {
+    cls.command_type: cls for cls in Command.__subclasses__()
+}
+assert len(COMMAND_CLASSES) == len(CommandTypes)
 
 
 class ASTNode:
-    def __init__(self, ast_type: ASTTypes):
-        self.ast_type = ast_type
+    """
+    Base class of all expression nodes, there is one subclass with fixed
+    fields (__slots__) per AST type.
+    """
+
+    # "compiled" is only set by cody_compiler.compile_expression,
+    # "static_type" only by cody_types.infer_type
+    __slots__ = ("compiled", "static_type")
+    ast_type: ASTTypes
+
+
+class IntegerLiteral(ASTNode):
+    __slots__ = ("value",)
+    ast_type = ASTTypes.IntegerLiteral
+
+    def __init__(self, value: int):
+        self.value = value
+
+
+class StringLiteral(ASTNode):
+    __slots__ = ("literal",)
+    ast_type = ASTTypes.StringLiteral
+
+    def __init__(self, literal: str):
+        self.literal = literal
+
+
+class NamedNode(ASTNode):
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class VariableNode(NamedNode):
+    # storage slot of the variable, see cody_variables
+    __slots__ = ("slot",)
+
+    def __init__(self, name: str):
+        self.name = name
+        self.slot = variable_slot(name)
+
+
+class IntegerVariable(VariableNode):
+    __slots__ = ()
+    ast_type = ASTTypes.IntegerVariable
+
+
+class StringVariable(VariableNode):
+    __slots__ = ()
+    ast_type = ASTTypes.StringVariable
+
+
+class BuiltInVariable(NamedNode):
+    __slots__ = ()
+    ast_type = ASTTypes.BuiltInVariable
+
+
+class BuiltInCall(NamedNode):
+    # function: bound by name and number of arguments (None if there is none)
+    __slots__ = ("expressions", "function")
+    ast_type = ASTTypes.BuiltInCall
+
+    def __init__(self, name: str, expressions: Optional[list[ASTNode]] = None):
+        self.name = name
+        self.expressions = expressions if expressions is not None else []
+        self.function: Optional[BuiltIn] = lookup_builtin_function(
+            name, len(self.expressions)
+        )
+
+
+class ArrayExpression(ASTNode):
+    __slots__ = ("subnode", "index")
+    ast_type = ASTTypes.ArrayExpression
+
+    def __init__(self, subnode: IntegerVariable, index: ASTNode):
+        self.subnode = subnode
+        self.index = index
+
+
+class UnaryMinus(ASTNode):
+    __slots__ = ("expr",)
+    ast_type = ASTTypes.UnaryMinus
+
+    def __init__(self, expr: ASTNode):
+        self.expr = expr
+
+
+class BinaryOp(ASTNode):
+    __slots__ = ("left", "right")
+
+    def __init__(self, left: ASTNode, right: ASTNode):
+        self.left = left
+        self.right = right
+
+
+class BinaryAdd(BinaryOp):
+    __slots__ = ()
+    ast_type = ASTTypes.BinaryAdd
+
+
+class BinarySub(BinaryOp):
+    __slots__ = ()
+    ast_type = ASTTypes.BinarySub
+
+
+class BinaryMul(BinaryOp):
+    __slots__ = ()
+    ast_type = ASTTypes.BinaryMul
+
+
+class BinaryDiv(BinaryOp):
+    __slots__ = ()
+    ast_type = ASTTypes.BinaryDiv
+
+
+class Equal(BinaryOp):
+    __slots__ = ()
+    ast_type = ASTTypes.Equal
+
+
+class NotEqual(BinaryOp):
+    __slots__ = ()
+    ast_type = ASTTypes.NotEqual
+
+
+class Less(BinaryOp):
+    __slots__ = ()
+    ast_type = ASTTypes.Less
+
+
+class LessEqual(BinaryOp):
+    __slots__ = ()
+    ast_type = ASTTypes.LessEqual
+
+
+class Greater(BinaryOp):
+    __slots__ = ()
+    ast_type = ASTTypes.Greater
+
+
+class GreaterEqual(BinaryOp):
+    __slots__ = ()
+    ast_type = ASTTypes.GreaterEqual
+
+
+AST_CLASSES: dict[ASTTypes, type[ASTNode]] = {
+    cls.ast_type: cls
+    for cls in (
+        IntegerLiteral,
+        StringLiteral,
+        IntegerVariable,
+        StringVariable,
+        BuiltInVariable,
+        BuiltInCall,
+        ArrayExpression,
+        UnaryMinus,
+        BinaryAdd,
+        BinarySub,
+        BinaryMul,
+        BinaryDiv,
+        Equal,
+        NotEqual,
+        Less,
+        LessEqual,
+        Greater,
+        GreaterEqual,
+    )
+}
+assert len(AST_CLASSES) == len(ASTTypes)
+
+
+# attributes of a Command that hold expressions (ASTNode or list of ASTNodes)
+COMMAND_EXPRESSION_FIELDS = (
+    "expression",
+    "expressions",
+    "lvalue",
+    "rvalue",
+    "condition",
+    "loop_variable",
+    "initial",
+    "limit",
+    "uart",
+    "bit_rate",
+    "mode",
+    "address",
+    "start",
+    "end",
+)
+
+
+def command_expressions(command: Command) -> list[ASTNode]:
+    """
+    Return the root nodes of all expressions of a command (not including the
+    command of an IF statement).
+    """
+    nodes = []
+    for field in COMMAND_EXPRESSION_FIELDS:
+        value = getattr(command, field, None)
+        if isinstance(value, list):
+            nodes.extend(value)
+        elif value is not None:
+            nodes.append(value)
+    return nodes
+
+
+# a token is a number, a string literal (including the quotes), a name or an
+# operator, whitespace between tokens is skipped
+TOKEN_PATTERN = re.compile(
+    r"""
+    [0-9]+
+  | "[^"]*"
+  | [A-Za-z]+\$?  # string variables and functions end with $
+  | <> | <= | >=
+  | \S
+    """,
+    re.VERBOSE,
+)
+
+REL_OPS = {
+    "=": Equal,
+    "<>": NotEqual,
+    "<": Less,
+    "<=": LessEqual,
+    ">": Greater,
+    ">=": GreaterEqual,
+}
+
+TERM_OPS = {
+    "+": BinaryAdd,
+    "-": BinarySub,
+}
+
+FACTOR_OPS = {
+    "*": BinaryMul,
+    "/": BinaryDiv,
+}
+
+UNARY_OPS = {
+    "-": UnaryMinus,
+}
+
+
+def build_keyword_trie(keywords: Iterable[CommandTypes]) -> dict:
+    """
+    Build a character trie of the command keywords, the key "" of a trie node
+    holds the command type of the keyword ending there.
+    """
+    trie = {}
+    for command_type in keywords:
+        node = trie
+        for c in command_type.name:
+            node = node.setdefault(c, {})
+        node[""] = command_type
+    return trie
+
+
+KEYWORD_TRIE = build_keyword_trie(t for t in CommandTypes if t.valid_prefix)
+
+
+def match_keyword(
+    command: str, trie: dict = KEYWORD_TRIE
+) -> tuple[Optional[CommandTypes], int]:
+    """
+    Find the longest keyword at the start of "command" in a single scan,
+    returns the command type and the length of the keyword.
+    """
+    node = trie
+    match = (None, 0)
+    for i, c in enumerate(command):
+        node = node.get(c)
+        if node is None:
+            break
+        if "" in node:
+            match = (node[""], i + 1)
+    return match
+
+
+def tokenize(string: str) -> list[str]:
+    """
+    Split a line into tokens, the last token is always "" (end of line).
+    """
+    tokens = TOKEN_PATTERN.findall(string)
+    tokens.append("")
+    return tokens
 
 
 class CodyBasicParser:
-    def peek(self):
-        if self.is_eol():
-            return ""
-        return self.string[self.pos]
+    def __init__(self, cache: Optional["ProgramCache"] = None):
+        # parse_file keeps parsed programs in the cache, if given
+        self.cache = cache
 
-    def rest(self):
-        return self.string[self.pos :]
+    def peek(self) -> str:
+        return self.tokens[self.pos]
+
+    def rest(self) -> str:
+        # position of the current token in the line, tokens are only
+        # separated by whitespace
+        start = 0
+        for token in self.tokens[: self.pos + 1]:
+            start = self.string.index(token, start) + len(token)
+        return self.string[start - len(self.peek()) :]
 
     def advance(self):
         assert not self.is_eol()
         self.pos += 1
 
-    def is_eol(self):
-        return len(self.string) <= self.pos
-
-    def expect(self, s: str, skip_ws=True):
-        for c in s:
-            assert self.peek() == c
-            self.advance()
-        if skip_ws:
-            self.skip_whitespace()
+    def is_eol(self) -> bool:
+        return not self.tokens[self.pos]
 
-    def skip_whitespace(self):
-        while self.peek().isspace():
-            self.advance()
+    def expect(self, s: str):
+        assert self.tokens[self.pos] == s
+        self.pos += 1
 
     def parse(self, string=None, list=False, rel_op=False, ignore_tail=False):
         if string is not None:
             self.pos = 0
             self.string = string
-            self.skip_whitespace()
+            self.tokens = tokenize(string)
         else:
             assert self.pos is not None and self.string is not None
         if list:
@@ -146,8 +578,7 @@ class CodyBasicParser:
         if self.peek():
             nodes.append(self.parse_expr(rel_op=rel_op))
             while self.peek() == ",":
-                self.advance()
-                self.skip_whitespace()
+                self.pos += 1
                 node = self.parse_expr(rel_op=rel_op)
                 nodes.append(node)
         return nodes
@@ -159,78 +590,36 @@ class CodyBasicParser:
             return self.parse_term()
 
     def parse_rel_op(self):
-        ops = {
-            "=": ASTTypes.Equal,
-            "<>": ASTTypes.NotEqual,
-            "<": ASTTypes.Less,
-            "<=": ASTTypes.LessEqual,
-            ">": ASTTypes.Greater,
-            ">=": ASTTypes.GreaterEqual,
-        }
         left = self.parse_term()
         # no looping: only one rel_op allowed
-        if op_type := self.find_op(ops):
-            self.skip_whitespace()
-            right = self.parse_term()
-            node = ASTNode(op_type)
-            node.left = left
-            node.right = right
-            left = node
+        if op := self.find_op(REL_OPS):
+            left = op(left, self.parse_term())
         return left
 
     def parse_term(self):
-        ops = {
-            "+": ASTTypes.BinaryAdd,
-            "-": ASTTypes.BinarySub,
-        }
         left = self.parse_factor()
-        while op_type := self.find_op(ops):
-            self.skip_whitespace()
-            right = self.parse_factor()
-            node = ASTNode(op_type)
-            node.left = left
-            node.right = right
-            left = node
+        while op := self.find_op(TERM_OPS):
+            left = op(left, self.parse_factor())
         return left
 
     def parse_factor(self):
-        ops = {
-            "*": ASTTypes.BinaryMul,
-            "/": ASTTypes.BinaryDiv,
-        }
-
         left = self.parse_unary()
-        while op_type := self.find_op(ops):
-            self.skip_whitespace()
-            right = self.parse_unary()
-            node = ASTNode(op_type)
-            node.left = left
-            node.right = right
-            left = node
+        while op := self.find_op(FACTOR_OPS):
+            left = op(left, self.parse_unary())
         return left
 
     def parse_unary(self):
-        ops = {
-            "-": ASTTypes.UnaryMinus,
-        }
-
-        op_type = self.find_op(ops)
-        if not op_type:
+        op = self.find_op(UNARY_OPS)
+        if not op:
             return self.parse_primary()
-
-        self.skip_whitespace()
-        expr = self.parse_unary()
-        node = ASTNode(op_type)
-        node.expr = expr
-        return node
+        return op(self.parse_unary())
 
     def parse_primary(self):
-        c = self.peek()
-        if c == '"':
+        c = self.peek()[:1]
+        if c == '"' and len(self.peek()) > 1:
             return self.parse_string_literal()
         elif c == "(":
-            self.advance()
-            self.skip_whitespace()
+            self.pos += 1
             node = self.parse_expr()
             self.expect(")")
             return node
@@ -238,77 +627,49 @@ class CodyBasicParser:
             return self.parse_integer_literal()
         elif c.isalpha():
             return self.parse_variable_or_builtin()
+        elif c == '"':
+            raise Exception("parse error: unterminated string literal")
         else:
             raise Exception("parse error")
 
     def parse_integer_literal(self):
-        literal = self.peek()
-        while True:
-            self.advance()
-            if self.peek().isdigit():
-                literal += self.peek()
-            else:
-                break
-        node = ASTNode(ASTTypes.IntegerLiteral)
-        node.value = twos_complement(literal, convert=True)
-        self.skip_whitespace()
+        node = IntegerLiteral(twos_complement(int(self.tokens[self.pos])))
+        self.pos += 1
         return node
 
     def parse_string_literal(self):
-        self.expect('"', skip_ws=False)
-        literal = ""
-        while True:
-            c = self.peek()
-            self.advance()
-            if c == '"':
-                break
-            else:
-                literal += c
-        node = ASTNode(ASTTypes.StringLiteral)
-        node.literal = check_string(literal)
-        self.skip_whitespace()
+        node = StringLiteral(check_string(self.tokens[self.pos][1:-1]))
+        self.pos += 1
         return node
 
     def parse_variable_or_builtin(self):
-        assert self.peek().isalpha()
-        name = ""
-
-        # var name
-        while (c := self.peek()).isalpha():
-            name += c
-            self.advance()
-        # string suffix
-        if c == "$":
-            name += c
-            self.advance()
-        self.skip_whitespace()
+        assert self.peek()[:1].isalpha()
+        name = self.peek()
+        self.pos += 1
 
         if name in builtin_vars:
             param_mode = "none"
-            node = ASTNode(ASTTypes.BuiltInVariable)
+            node = BuiltInVariable(name)
         elif name in builtin_functions:
             param_mode = "any"
-            node = ASTNode(ASTTypes.BuiltInCall)
+            node = BuiltInCall(name)
         elif len(name) == 1:
             # book page 252:
             # "Number Variables are represented by a letter between A and Z"
             param_mode = "array"
-            node = ASTNode(ASTTypes.IntegerVariable)
+            node = IntegerVariable(name)
         elif len(name) == 2 and name[1] == "$":
             # book page 253:
             # "Cody BASIC also has 26 string variables A$ through Z$"
             param_mode = "none"  # no arrays for string vars
-            node = ASTNode(ASTTypes.StringVariable)
-            name = name[0]
+            node = StringVariable(name[0])
         else:
             raise NotImplementedError(f"unknown built-in {name}")
-        node.name = name
 
         # check if variable/builtin can have parameters
         if param_mode != "none":
             if self.peek() == "(":
-                self.advance()
-                self.skip_whitespace()
+                self.pos += 1
                 if self.peek() == ")":
                     expressions = []
                 else:
@@ -317,14 +678,11 @@ class CodyBasicParser:
 
                 if param_mode == "array":
                     assert len(expressions) == 1
-                    subnode = node
-                    node = ASTNode(ASTTypes.ArrayExpression)
-                    node.subnode = subnode
-                    node.index = expressions[0]
+                    node = ArrayExpression(node, expressions[0])
                 else:
                     # built-in functions can take any number of parameters
                     assert param_mode == "any"
-                    node.expressions = expressions
+                    node = BuiltInCall(name, expressions)
             elif param_mode == "any":
                 # builtin functions require parentheses
                 raise ValueError(
@@ -335,29 +693,15 @@ class CodyBasicParser:
 
         return node
 
-    def find_op(self, ops: dict[str, ASTTypes]) -> Optional[ASTTypes]:
+    def find_op(self, ops: dict[str, type[ASTNode]]) -> Optional[type[ASTNode]]:
         """
-        Find the longest matching key in "ops" and return its value.
+        If the current token is an operator in "ops", consume it and return
+        its node class. The tokenizer already picked the longest operator.
         """
-        initial_pos = self.pos
-        valid_tokens = list(ops.keys())
-        last_valid_token = None
-        op = ""
-        while True:
-            next_char = self.peek()
-            if not next_char:
-                break  # eol
-            op += next_char
-            self.advance()
-
-            valid_tokens = [t for t in valid_tokens if t.startswith(op)]
-            if not valid_tokens:
-                break
-            elif op in ops:
-                last_valid_token = op
-
-        self.pos = initial_pos + (len(last_valid_token) if last_valid_token else 0)
-        return ops[last_valid_token] if last_valid_token else None
+        op = ops.get(self.tokens[self.pos])
+        if op is not None:
+            self.pos += 1
+        return op
 
     def parse_command(self, command: str, line_number: bool = True) -> Command:
         source = command
@@ -366,9 +710,8 @@ class CodyBasicParser:
         # (1) split line number if present
         i = 0
         if line_number:
-            for i, c in enumerate(command):
-                if not c.isdigit():
-                    break
+            while i < len(command) and command[i].isdigit():
+                i += 1
         if i > 0:
             line_number = int(command[:i])
             assert 0 <= line_number < 65535
@@ -377,10 +720,9 @@ class CodyBasicParser:
             line_number = None
 
         # (2) parse command type
-        for command_type in CommandTypes:
-            if command_type.valid_prefix and command.startswith(command_type.name):
-                other = command[len(command_type.name) :].strip()
-                break
+        command_type, length = match_keyword(command)
+        if command_type is not None:
+            other = command[length:].strip()
         else:  # special parsing case for empty string and assignments
             if not command:
                 command_type = CommandTypes.EMPTY
@@ -392,106 +734,139 @@ class CodyBasicParser:
             else:
                 raise NotImplementedError("error! unknown command: " + source)
         # TODO: dont save source in command but instead save tokens or implement a pretty printer
-        c = Command(command_type, line_number, source)
+        c = COMMAND_CLASSES[command_type](line_number, source)
 
         # (3) parse other parts
-        if c.command_type == CommandTypes.REM:
-            pass  # ignore line
-        elif c.command_type in (
-            CommandTypes.EMPTY,
-            CommandTypes.NEXT,
-            CommandTypes.RETURN,
-            CommandTypes.END,
-            CommandTypes.CLOSE,
-            CommandTypes.RESTORE,
-            CommandTypes.NEW,
-            CommandTypes.RUN,
-        ):
-            if other:
-                raise Exception(
-                    f"expected end of line after command {c.command_type.name}, but was '{other}'"
-                )
-        elif c.command_type == CommandTypes.ASSIGNMENT:
-            c.lvalue = self.parse(other, ignore_tail=True)
-            assert c.lvalue.ast_type in (
-                ASTTypes.IntegerVariable,
-                ASTTypes.StringVariable,
-                ASTTypes.ArrayExpression,
-            )
-            self.expect("=")
-            c.rvalue = self.parse()
-        elif c.command_type in (CommandTypes.GOTO, CommandTypes.GOSUB):
-            c.expression = self.parse(other)
-        elif c.command_type == CommandTypes.PRINT:
-            c.expressions = self.parse(other, list=True, ignore_tail=True)
-            if self.peek() == ";":  # page 249, semicolon = no new line
-                self.advance()
-                c.no_new_line = True
-            else:
-                c.no_new_line = False
-            if self.peek():
-                raise Exception("expected end of line")
-        elif c.command_type in (
-            CommandTypes.INPUT,
-            CommandTypes.READ,
-        ):
-            c.expressions = self.parse(other, list=True)
-            assert len(c.expressions) >= 1
-        elif c.command_type == CommandTypes.DATA:
-            c.expressions = self.parse(other, list=True)
-            assert len(c.expressions) >= 1
-            for expr in c.expressions:
-                assert expr.ast_type == ASTTypes.IntegerLiteral or (
-                    expr.ast_type == ASTTypes.UnaryMinus
-                    and expr.expr.ast_type == ASTTypes.IntegerLiteral
-                )
-        elif c.command_type == CommandTypes.IF:
-            c.condition = self.parse(other, rel_op=True, ignore_tail=True)
-            assert c.condition.ast_type in (
-                ASTTypes.Equal,
-                ASTTypes.NotEqual,
-                ASTTypes.Less,
-                ASTTypes.LessEqual,
-                ASTTypes.Greater,
-                ASTTypes.GreaterEqual,
-            )
-            # TODO: check that for string comparisons the left side of the rel op must be a var
-            self.expect("THEN")
-            assert not self.is_eol()
-            c.command = self.parse_command(self.rest(), line_number=False)
-            c.command.line_number = c.line_number  # make sure that jumps work
-        elif c.command_type == CommandTypes.FOR:
-            c.loop_variable = self.parse(other, ignore_tail=True)
-            assert c.loop_variable.ast_type in (
-                ASTTypes.IntegerVariable,
-                ASTTypes.StringVariable,
-                ASTTypes.ArrayExpression,
-            )
-            self.expect("=")
-            c.initial = self.parse(ignore_tail=True)
-            self.expect("TO")
-            c.limit = self.parse()
-        elif c.command_type == CommandTypes.OPEN:
-            c.uart, c.bit_rate = self.parse(other, list=True)
-        elif c.command_type == CommandTypes.POKE:
-            c.address, c.expression = self.parse(other, list=True)
-        elif c.command_type == CommandTypes.SYS:
-            c.address = self.parse(other)
-        elif c.command_type == CommandTypes.LIST:
-            exprs = self.parse(other, list=True)
-            assert len(exprs) <= 2
-            c.start = exprs[0] if len(exprs) >= 1 else None
-            c.end = exprs[1] if len(exprs) >= 2 else None
-        elif c.command_type == CommandTypes.LOAD:
-            c.uart, c.mode = self.parse(other, list=True)
-        elif c.command_type == CommandTypes.SAVE:
-            c.uart = self.parse(other)
-        else:
+        argument_parser = self.ARGUMENT_PARSERS.get(command_type)
+        if argument_parser is None:
             raise NotImplementedError(
                 f"command type {c.command_type.name} not implemented"
             )
+        argument_parser(self, c, other)
         return c
 
+    def parse_no_arguments(self, c: Command, other: str):
+        if other:
+            raise Exception(
+                f"expected end of line after command {c.command_type.name}, but was '{other}'"
+            )
+
+    def parse_rem(self, c: Command, other: str):
+        pass  # ignore line
+
+    def parse_assignment(self, c: Command, other: str):
+        c.lvalue = self.parse(other, ignore_tail=True)
+        assert c.lvalue.ast_type in (
+            ASTTypes.IntegerVariable,
+            ASTTypes.StringVariable,
+            ASTTypes.ArrayExpression,
+        )
+        self.expect("=")
+        c.rvalue = self.parse()
+
+    def parse_jump(self, c: Command, other: str):
+        c.expression = self.parse(other)
+
+    def parse_print(self, c: Command, other: str):
+        c.expressions = self.parse(other, list=True, ignore_tail=True)
+        if self.peek() == ";":  # page 249, semicolon = no new line
+            self.advance()
+            c.no_new_line = True
+        else:
+            c.no_new_line = False
+        if self.peek():
+            raise Exception("expected end of line")
+
+    def parse_targets(self, c: Command, other: str):
+        c.expressions = self.parse(other, list=True)
+        assert len(c.expressions) >= 1
+
+    def parse_data(self, c: Command, other: str):
+        c.expressions = self.parse(other, list=True)
+        assert len(c.expressions) >= 1
+        for expr in c.expressions:
+            assert expr.ast_type == ASTTypes.IntegerLiteral or (
+                expr.ast_type == ASTTypes.UnaryMinus
+                and expr.expr.ast_type == ASTTypes.IntegerLiteral
+            )
+
+    def parse_if(self, c: Command, other: str):
+        c.condition = self.parse(other, rel_op=True, ignore_tail=True)
+        assert c.condition.ast_type in (
+            ASTTypes.Equal,
+            ASTTypes.NotEqual,
+            ASTTypes.Less,
+            ASTTypes.LessEqual,
+            ASTTypes.Greater,
+            ASTTypes.GreaterEqual,
+        )
+        # TODO: check that for string comparisons the left side of the rel op must be a var
+        self.expect("THEN")
+        assert not self.is_eol()
+        c.command = self.parse_command(self.rest(), line_number=False)
+        c.command.line_number = c.line_number  # make sure that jumps work
+
+    def parse_for(self, c: Command, other: str):
+        c.loop_variable = self.parse(other, ignore_tail=True)
+        assert c.loop_variable.ast_type in (
+            ASTTypes.IntegerVariable,
+            ASTTypes.StringVariable,
+            ASTTypes.ArrayExpression,
+        )
+        self.expect("=")
+        c.initial = self.parse(ignore_tail=True)
+        self.expect("TO")
+        c.limit = self.parse()
+
+    def parse_open(self, c: Command, other: str):
+        c.uart, c.bit_rate = self.parse(other, list=True)
+
+    def parse_poke(self, c: Command, other: str):
+        c.address, c.expression = self.parse(other, list=True)
+
+    def parse_sys(self, c: Command, other: str):
+        c.address = self.parse(other)
+
+    def parse_list_command(self, c: Command, other: str):
+        exprs = self.parse(other, list=True)
+        assert len(exprs) <= 2
+        c.start = exprs[0] if len(exprs) >= 1 else None
+        c.end = exprs[1] if len(exprs) >= 2 else None
+
+    def parse_load(self, c: Command, other: str):
+        c.uart, c.mode = self.parse(other, list=True)
+
+    def parse_save(self, c: Command, other: str):
+        c.uart = self.parse(other)
+
+    # command type -> method that parses the rest of the line after the keyword
+    ARGUMENT_PARSERS = {
+        CommandTypes.REM: parse_rem,
+        CommandTypes.EMPTY: parse_no_arguments,
+        CommandTypes.NEXT: parse_no_arguments,
+        CommandTypes.RETURN: parse_no_arguments,
+        CommandTypes.END: parse_no_arguments,
+        CommandTypes.CLOSE: parse_no_arguments,
+        CommandTypes.RESTORE: parse_no_arguments,
+        CommandTypes.NEW: parse_no_arguments,
+        CommandTypes.RUN: parse_no_arguments,
+        CommandTypes.ASSIGNMENT: parse_assignment,
+        CommandTypes.GOTO: parse_jump,
+        CommandTypes.GOSUB: parse_jump,
+        CommandTypes.PRINT: parse_print,
+        CommandTypes.INPUT: parse_targets,
+        CommandTypes.READ: parse_targets,
+        CommandTypes.DATA: parse_data,
+        CommandTypes.IF: parse_if,
+        CommandTypes.FOR: parse_for,
+        CommandTypes.OPEN: parse_open,
+        CommandTypes.POKE: parse_poke,
+        CommandTypes.SYS: parse_sys,
+        CommandTypes.LIST: parse_list_command,
+        CommandTypes.LOAD: parse_load,
+        CommandTypes.SAVE: parse_save,
+    }
+
     def parse_lines(self, lines: Iterable[str]) -> list[Command]:
         parsed = []
         for line in lines:
@@ -504,8 +879,15 @@ class CodyBasicParser:
 
     def parse_file(self, filename: str) -> list[Command]:
         with open(filename) as f:
-            lines = f.readlines()
-        return self.parse_lines(lines)
+            source = f.read()
+        # only newlines end lines, e.g. "\x0c" is a character of the charset
+        if self.cache is None:
+            return self.parse_lines(source.split("\n"))
+        parsed = self.cache.get(source)
+        if parsed is None:
+            parsed = self.parse_lines(source.split("\n"))
+            self.cache.put(source, parsed)
+        return parsed
 
     def parse_string(self, code: str) -> list[Command]:
         lines = code.splitlines()
@@ -0,0 +1,506 @@
+from cody_parser import ASTTypes, ASTNode, CommandTypes, Command
+from cody_parser import command_expressions
+from cody_interpreter import Interpreter, IO
+from cody_util import to_unsigned, twos_complement, check_string, check_length
+from cody_variables import variable_slot, get_element, set_element
+from cody_builtins import builtin_rnd, builtin_sub, builtin_chr, builtin_val
+from cody_builtins import builtin_asc
+from types import TracebackType
+from typing import Callable, Optional
+import math
+
+
+class TranspileError(Exception):
+    """
+    Raised for programs (or parts of programs) that cannot be translated to
+    Python, e.g. computed GOTO targets. Such programs run in the interpreter.
+    """
+
+
+# a translated program: runs the program starting at the given index
+Program = Callable[[Interpreter, int], None]
+
+COMPARISON_OPS = {
+    ASTTypes.Equal: "==",
+    ASTTypes.NotEqual: "!=",
+    ASTTypes.Less: "<",
+    ASTTypes.LessEqual: "<=",
+    ASTTypes.Greater: ">",
+    ASTTypes.GreaterEqual: ">=",
+}
+
+INTEGER_OPS = {
+    ASTTypes.BinarySub: "-",
+    ASTTypes.BinaryMul: "*",
+    ASTTypes.BinaryDiv: "//",  # integer div
+}
+
+# program counter value for "program ended"
+END = -1
+
+# file name of the generated code in tracebacks
+FILENAME = "<cody basic>"
+
+
+def wrap(code: str) -> str:
+    # inlined twos_complement for ints
+    return f"(((({code}) + 32768) & 65535) - 32768)"
+
+
+RUNTIME = {
+    "to_unsigned": to_unsigned,
+    "twos_complement": twos_complement,
+    "check_string": check_string,
+    "check_length": check_length,
+    "get_element": get_element,
+    "set_element": set_element,
+    "isqrt": math.isqrt,
+    "builtin_rnd": builtin_rnd,
+    "builtin_sub": builtin_sub,
+    "builtin_chr": builtin_chr,
+    "builtin_val": builtin_val,
+    "builtin_asc": builtin_asc,
+}
+
+
+class Transpiler:
+    """
+    Translates a whole program into the source code of one Python function.
+
+    Every index that can be jumped to becomes a label of a dispatch loop,
+    the code between two labels is emitted as straight-line code. Integer
+    and string variables are Python locals that are loaded from and written
+    back to the interpreter's variables; variables used as arrays stay in
+    the interpreter.
+    """
+
+    def __init__(self, program: list[Command]):
+        # precondition: the program must be linked (see Interpreter.link)
+        self.program = program
+        self.lines: list[str] = []
+        self.indent = 0
+        self.constants: dict[str, object] = {}
+        self.int_vars: set[str] = set()
+        self.string_vars: set[str] = set()
+        self.array_vars: set[str] = set()
+        self.loop_vars: list[str] = []
+
+    def emit(self, line: str):
+        self.lines.append("    " * self.indent + line)
+
+    def constant(self, name: str, value: object) -> str:
+        self.constants[name] = value
+        return name
+
+    def target_index(self, command: Command) -> int:
+        if command.target_index is None:
+            # computed or missing target
+            raise TranspileError(
+                f"cannot resolve jump target in line {command.line_number}"
+            )
+        return command.target_index
+
+    def successor(self, command: Command) -> int:
+        return command.next_index if command.next_index is not None else END
+
+    def find_labels(self, start: int) -> list[int]:
+        labels = {start}
+        for cmd in self.program:
+            if cmd.command_type == CommandTypes.IF:
+                cmd = cmd.command
+            if cmd.command_type in (CommandTypes.GOTO, CommandTypes.GOSUB):
+                labels.add(self.target_index(cmd))
+            if cmd.command_type in (CommandTypes.GOSUB, CommandTypes.FOR):
+                labels.add(self.successor(cmd))
+        labels.discard(END)
+        return sorted(labels)
+
+    def collect_variables(self, node: ASTNode):
+        if node.ast_type == ASTTypes.IntegerVariable:
+            self.int_vars.add(node.name)
+        elif node.ast_type == ASTTypes.StringVariable:
+            self.string_vars.add(node.name)
+        elif node.ast_type == ASTTypes.ArrayExpression:
+            self.array_vars.add(node.subnode.name)
+        for child in ("left", "right", "expr", "index"):
+            if hasattr(node, child):
+                self.collect_variables(getattr(node, child))
+        for child in getattr(node, "expressions", []):
+            self.collect_variables(child)
+
+    def transpile(self, start: int = 0) -> str:
+        for cmd in self.program:
+            if cmd.command_type == CommandTypes.IF:
+                self.collect_variables(cmd.condition)
+                cmd = cmd.command
+            for node in command_expressions(cmd):
+                self.collect_variables(node)
+            # every NEXT tests all loop variables, also those of FORs later in
+            # the program (a NEXT can be reached before its FOR's line)
+            if cmd.command_type == CommandTypes.FOR:
+                var = cmd.loop_variable
+                if (
+                    var.ast_type == ASTTypes.IntegerVariable
+                    and var.name not in self.loop_vars
+                ):
+                    self.loop_vars.append(var.name)
+        # scalar integer variables that are also used as arrays share their
+        # storage with element 0, so they stay in the interpreter
+        self.int_vars -= self.array_vars
+
+        labels = self.find_labels(start)
+        self.emit("def program(interp, pc):")
+        self.indent += 1
+        self.emit("io = interp.io")
+        self.emit("ints = interp.int_arrays")
+        self.emit("strings = interp.strings")
+        self.emit("calls = []")
+        self.emit("loops = []")
+        for name in sorted(self.array_vars):
+            self.emit(f"a_{name} = ints[{variable_slot(name)}]")
+        for name in sorted(self.int_vars):
+            self.emit(f"v_{name} = ints[{variable_slot(name)}][0]")
+        for name in sorted(self.string_vars):
+            self.emit(f"s_{name} = strings[{variable_slot(name)}]")
+        self.emit("try:")
+        self.indent += 1
+        self.emit("while True:")
+        self.indent += 1
+        self.emit('if getattr(io, "cancel", None):')
+        self.emit("    io.cancel = False")
+        self.emit("    raise KeyboardInterrupt")
+        self.emit_dispatch(labels, 0, len(labels))
+        self.indent -= 2
+        self.emit("finally:")
+        self.indent += 1
+        for name in sorted(self.int_vars):
+            self.emit(f"ints[{variable_slot(name)}][0] = v_{name}")
+        for name in sorted(self.string_vars):
+            self.emit(f"strings[{variable_slot(name)}] = s_{name}")
+        if not self.int_vars and not self.string_vars:
+            self.emit("pass")
+        return "\n".join(self.lines) + "\n"
+
+    def emit_dispatch(self, labels: list[int], lo: int, hi: int):
+        # binary search over the labels, so dispatch is O(log labels)
+        if hi - lo == 1:
+            end = labels[hi] if hi < len(labels) else len(self.program)
+            self.emit_block(labels[lo], end)
+            return
+        mid = (lo + hi) // 2
+        self.emit(f"if pc < {labels[mid]}:")
+        self.indent += 1
+        self.emit_dispatch(labels, lo, mid)
+        self.indent -= 1
+        self.emit("else:")
+        self.indent += 1
+        self.emit_dispatch(labels, mid, hi)
+        self.indent -= 1
+
+    def emit_block(self, start: int, end: int):
+        for i in range(start, end):
+            cmd = self.program[i]
+            self.emit(f"# {cmd.source}")
+            self.emit_command(cmd)
+        if end < len(self.program):
+            self.emit(f"pc = {end}")
+            self.emit("continue")
+        else:
+            self.emit("return")
+
+    def emit_jump(self, index: int):
+        if index == END:
+            self.emit("return")
+        else:
+            self.emit(f"pc = {index}")
+            self.emit("continue")
+
+    def emit_command(self, command: Command):
+        t = command.command_type
+        if t in (CommandTypes.REM, CommandTypes.EMPTY, CommandTypes.DATA):
+            pass
+        elif t == CommandTypes.ASSIGNMENT:
+            value, value_type = self.expr(command.rvalue)
+            self.emit_store(command.lvalue, value, value_type)
+        elif t == CommandTypes.PRINT:
+            for expr in command.expressions:
+                value, value_type = self.expr(expr)
+                if value_type == "int":
+                    self.emit(f"io.print(str({value}))")
+                elif value_type == "str":
+                    self.emit(f"io.print({value})")
+                else:
+                    self.emit(value)  # AT and TAB
+            if not command.no_new_line:
+                self.emit("io.println()")
+        elif t == CommandTypes.INPUT:
+            for expr in command.expressions:
+                self.emit_store(expr, 'io.input(f"{io.prompt_char()} ")', "input")
+        elif t == CommandTypes.OPEN:
+            uart = self.int_expr(command.uart)
+            bit_rate = self.int_expr(command.bit_rate)
+            self.emit(f"io.open_uart({uart}, {bit_rate})")
+        elif t == CommandTypes.CLOSE:
+            self.emit("io.close_uart()")
+        elif t == CommandTypes.POKE:
+            address = self.int_expr(command.address)
+            value = self.int_expr(command.expression)
+            self.emit(f"io.poke(to_unsigned({address}), to_unsigned({value}, bits=8))")
+        elif t == CommandTypes.SYS:
+            self.emit(f"io.sys(to_unsigned({self.int_expr(command.address)}))")
+        elif t == CommandTypes.IF:
+            condition, condition_type = self.expr(command.condition)
+            assert condition_type == "bool"
+            self.emit(f"if {condition}:")
+            self.indent += 1
+            size = len(self.lines)
+            self.emit_command(command.command)
+            if len(self.lines) == size:
+                self.emit("pass")
+            self.indent -= 1
+        elif t == CommandTypes.GOTO:
+            self.emit_jump(self.target_index(command))
+        elif t == CommandTypes.GOSUB:
+            self.emit(f"calls.append({self.successor(command)})")
+            self.emit_jump(self.target_index(command))
+        elif t == CommandTypes.RETURN:
+            self.emit("pc = calls.pop()")
+            self.emit("if pc == -1:")
+            self.emit("    return")
+            self.emit("continue")
+        elif t == CommandTypes.FOR:
+            var = command.loop_variable
+            if (
+                var.ast_type != ASTTypes.IntegerVariable
+                or var.name not in self.int_vars
+            ):
+                raise TranspileError("only scalar integer loop variables supported")
+            self.emit(f"initial = v_{var.name} = {self.int_expr(command.initial)}")
+            self.emit(f"limit = {self.int_expr(command.limit)}")
+            self.emit("assert initial <= limit")
+            loop_id = self.loop_vars.index(var.name)
+            self.emit(f"loops.append(({loop_id}, limit, {self.successor(command)}))")
+        elif t == CommandTypes.NEXT:
+            self.emit("loop_id, limit, body = loops[-1]")
+            for loop_id, name in enumerate(self.loop_vars):
+                self.emit(f"if loop_id == {loop_id}:")
+                self.emit(f"    if v_{name} >= limit:")
+                self.emit("        loops.pop()")
+                self.emit("    else:")
+                self.emit(f"        v_{name} += 1")
+                self.emit("        if body == -1:")
+                self.emit("            return")
+                self.emit("        pc = body")
+                self.emit("        continue")
+            if not self.loop_vars:
+                self.emit("raise AssertionError")
+        elif t == CommandTypes.END:
+            self.emit("return")
+        elif t == CommandTypes.READ:
+            for expr in command.expressions:
+                if expr.ast_type == ASTTypes.StringVariable:
+                    raise TranspileError("only integer variables can be READ")
+                self.emit_store(expr, "interp.read_next_data_value()", "int")
+        elif t == CommandTypes.RESTORE:
+            self.emit("interp.data_cursor = 0")
+        else:
+            # LIST, LOAD, ... are not allowed in programs
+            raise TranspileError(f"command type {t.name} not supported")
+
+    def emit_store(self, lvalue: ASTNode, value: str, value_type: str):
+        if lvalue.ast_type == ASTTypes.StringVariable:
+            if value_type == "input":
+                value = f"check_string({value})"
+            elif value_type != "str":
+                raise TranspileError("type mismatch in assignment")
+            self.emit(f"s_{lvalue.name} = {value}")
+            return
+
+        if value_type == "input":
+            value = f"twos_complement({value}, convert=True)"
+        elif value_type != "int":
+            raise TranspileError("type mismatch in assignment")
+        if lvalue.ast_type == ASTTypes.IntegerVariable and lvalue.name in self.int_vars:
+            self.emit(f"v_{lvalue.name} = {value}")
+        elif lvalue.ast_type == ASTTypes.IntegerVariable:
+            self.emit(f"a_{lvalue.name}[0] = {value}")
+        else:
+            index = self.int_expr(lvalue.index)
+            self.emit(f"set_element(a_{lvalue.subnode.name}, {index}, {value})")
+
+    def int_expr(self, node: ASTNode) -> str:
+        code, code_type = self.expr(node)
+        if code_type != "int":
+            raise TranspileError("expected integer expression")
+        return code
+
+    def str_expr(self, node: ASTNode) -> str:
+        code, code_type = self.expr(node)
+        if code_type != "str":
+            raise TranspileError("expected string expression")
+        return code
+
+    def expr(self, node: ASTNode) -> tuple[str, str]:
+        """
+        Translate an expression, returns the Python code and its type
+        ("int", "str", "bool" or "none").
+        """
+        t = node.ast_type
+        if t in COMPARISON_OPS:
+            left, left_type = self.expr(node.left)
+            right, right_type = self.expr(node.right)
+            if left_type not in ("int", "str") or left_type != right_type:
+                raise TranspileError("type mismatch in comparison")
+            return f"({left} {COMPARISON_OPS[t]} {right})", "bool"
+        elif t == ASTTypes.BinaryAdd:
+            left, left_type = self.expr(node.left)
+            right, right_type = self.expr(node.right)
+            if left_type == right_type == "int":
+                return wrap(f"{left} + {right}"), "int"
+            elif left_type == right_type == "str":
+                return f"check_length({left} + {right})", "str"
+            elif {left_type, right_type} == {"int", "str"}:
+                return f"check_length(str({left}) + str({right}))", "str"
+            raise TranspileError("type mismatch in addition")
+        elif t in INTEGER_OPS:
+            left = self.int_expr(node.left)
+            right = self.int_expr(node.right)
+            return wrap(f"{left} {INTEGER_OPS[t]} {right}"), "int"
+        elif t == ASTTypes.UnaryMinus:
+            return wrap(f"-{self.int_expr(node.expr)}"), "int"
+        elif t == ASTTypes.StringLiteral:
+            return repr(check_string(node.literal)), "str"
+        elif t == ASTTypes.IntegerLiteral:
+            return f"({twos_complement(node.value)})", "int"
+        elif t == ASTTypes.IntegerVariable:
+            if node.name in self.int_vars:
+                return f"v_{node.name}", "int"
+            return f"a_{node.name}[0]", "int"
+        elif t == ASTTypes.StringVariable:
+            return f"s_{node.name}", "str"
+        elif t == ASTTypes.ArrayExpression:
+            index = self.int_expr(node.index)
+            return f"get_element(a_{node.subnode.name}, {index})", "int"
+        elif t == ASTTypes.BuiltInVariable:
+            if node.name == "TI":
+                return "twos_complement(io.get_time(), convert=True)", "int"
+            raise TranspileError(f"built-in variable {node.name} not supported")
+        elif t == ASTTypes.BuiltInCall:
+            return self.builtin(node.name, node.expressions)
+        else:
+            raise TranspileError(f"ast type {t.name} not supported")
+
+    def builtin(self, name: str, args: list[ASTNode]) -> tuple[str, str]:
+        n = len(args)
+        if name == "ABS" and n == 1:
+            return wrap(f"abs({self.int_expr(args[0])})"), "int"
+        elif name == "SQR" and n == 1:
+            return wrap(f"isqrt({self.int_expr(args[0])})"), "int"
+        elif name == "MOD" and n == 2:
+            left, right = self.int_expr(args[0]), self.int_expr(args[1])
+            return wrap(f"{left} % {right}"), "int"
+        elif name == "RND" and n <= 1:
+            return f"builtin_rnd({', '.join(['io', *map(self.int_expr, args)])})", "int"
+        elif name == "NOT" and n == 1:
+            # bitwise operations on 16 bit values stay in range
+            return f"(~{self.int_expr(args[0])})", "int"
+        elif name in ("AND", "OR", "XOR") and n == 2:
+            op = {"AND": "&", "OR": "|", "XOR": "^"}[name]
+            left, right = self.int_expr(args[0]), self.int_expr(args[1])
+            return f"({left} {op} {right})", "int"
+        elif name == "SUB$" and n == 3:
+            s = self.str_expr(args[0])
+            start, length = self.int_expr(args[1]), self.int_expr(args[2])
+            return f"builtin_sub(io, {s}, {start}, {length})", "str"
+        elif name == "CHR$":
+            return f"builtin_chr({', '.join(['io', *map(self.int_expr, args)])})", "str"
+        elif name == "STR$" and n == 1:
+            return f"str({self.int_expr(args[0])})", "str"
+        elif name == "VAL" and n == 1:
+            return f"builtin_val(io, {self.str_expr(args[0])})", "int"
+        elif name == "LEN" and n == 1:
+            return f"len({self.str_expr(args[0])})", "int"
+        elif name == "ASC" and n == 1:
+            return f"builtin_asc(io, {self.str_expr(args[0])})", "int"
+        elif name == "PEEK" and n == 1:
+            address = self.int_expr(args[0])
+            return f"to_unsigned(io.peek(to_unsigned({address})), bits=8)", "int"
+        elif name == "AT" and n == 2:
+            col, row = self.int_expr(args[0]), self.int_expr(args[1])
+            return f"io.print_at({col}, {row})", "none"
+        elif name == "TAB" and n == 1:
+            return f"io.print_tab({self.int_expr(args[0])})", "none"
+        else:
+            raise TranspileError(f"built-in function {name}/{n} not supported")
+
+
+def transpile(program: list[Command], start: int = 0) -> Program:
+    """
+    Translate a linked program into a Python function, raises TranspileError
+    if the program cannot be translated.
+    """
+    transpiler = Transpiler(program)
+    source = transpiler.transpile(start)
+    namespace = dict(RUNTIME, **transpiler.constants)
+    exec(compile(source, FILENAME, "exec"), namespace)
+    program = namespace["program"]
+    program.source_lines = source.splitlines()
+    return program
+
+
+def failed_line(program: Program, tb: Optional[TracebackType]) -> Optional[str]:
+    """
+    Return the source of the BASIC line that raised an exception in the
+    translated program, using the comments in the generated code.
+    """
+    while tb is not None:
+        if tb.tb_frame.f_code.co_filename == FILENAME:
+            for line in reversed(program.source_lines[: tb.tb_lineno]):
+                if line.lstrip().startswith("# "):
+                    return line.lstrip()[2:]
+        tb = tb.tb_next
+    return None
+
+
+class TranspilingInterpreter(Interpreter):
+    """
+    Interpreter that runs whole programs as translated Python code and falls
+    back to interpreting them if the program cannot be translated.
+    """
+
+    def __init__(self, io: Optional[IO] = None, **kwargs):
+        super().__init__(io, **kwargs)
+        self.translated: dict[int, Optional[Program]] = {}
+
+    def link(self):
+        super().link()
+        self.translated.clear()  # program has changed
+
+    def translate(self, start: int) -> Optional[Program]:
+        if start not in self.translated:
+            try:
+                program = transpile(self.program, start)
+            except TranspileError:
+                program = None
+            self.translated[start] = program
+        return self.translated[start]
+
+    def _run_loop(self, next_index: Optional[int]):
+        if next_index is None:
+            return super()._run_loop(next_index)
+        assert self.repl
+        if not self.linked:
+            self.link()
+        program = self.translate(next_index)
+        if program is None:
+            return super()._run_loop(next_index)
+        self.running = True
+        try:
+            program(self, next_index)
+        except Exception as e:
+            source = failed_line(program, e.__traceback__)
+            if source is not None:
+                e.add_note(f"in line {source}")
+            raise
+        finally:
+            self.running = False
@@ -0,0 +1,103 @@
+from cody_parser import ASTTypes, ASTNode
+from cody_util import check_string
+from typing import Optional
+
+# static types of expressions, the names match the run time types
+INT = "int"
+STR = "str"
+BOOL = "bool"  # comparisons, only used as IF condition
+NONE = "none"  # AT and TAB, only used in PRINT
+
+COMPARISONS = {
+    ASTTypes.Equal,
+    ASTTypes.NotEqual,
+    ASTTypes.Less,
+    ASTTypes.LessEqual,
+    ASTTypes.Greater,
+    ASTTypes.GreaterEqual,
+}
+
+INTEGER_OPS = {
+    ASTTypes.BinarySub,
+    ASTTypes.BinaryMul,
+    ASTTypes.BinaryDiv,
+}
+
+# name -> (argument types, result type), the last argument type repeats
+BUILTIN_TYPES: dict[str, tuple[tuple[str, ...], str]] = {
+    "ABS": ((INT,), INT),
+    "SQR": ((INT,), INT),
+    "MOD": ((INT,), INT),
+    "RND": ((INT,), INT),
+    "NOT": ((INT,), INT),
+    "AND": ((INT,), INT),
+    "OR": ((INT,), INT),
+    "XOR": ((INT,), INT),
+    "SUB$": ((STR, INT), STR),
+    "CHR$": ((INT,), STR),
+    "STR$": ((INT,), STR),
+    "VAL": ((STR,), INT),
+    "LEN": ((STR,), INT),
+    "ASC": ((STR,), INT),
+    "PEEK": ((INT,), INT),
+    "AT": ((INT,), NONE),
+    "TAB": ((INT,), NONE),
+}
+
+
+def infer_type(node: ASTNode) -> Optional[str]:
+    """
+    Return the type of the value of an expression or None if it is not
+    known before run time, i.e. if evaluating it fails with a type error.
+    Range errors (e.g. CHR$(300)) are not type errors. The type is cached
+    on the node as node.static_type.
+    """
+    try:
+        return node.static_type
+    except AttributeError:
+        node.static_type = _infer_type(node)
+        return node.static_type
+
+
+def _infer_type(node: ASTNode) -> Optional[str]:
+    t = node.ast_type
+    if t in COMPARISONS:
+        left, right = infer_type(node.left), infer_type(node.right)
+        return BOOL if left in (INT, STR) and left == right else None
+    elif t == ASTTypes.BinaryAdd:
+        left, right = infer_type(node.left), infer_type(node.right)
+        if left == right == INT:
+            return INT
+        elif left in (INT, STR) and right in (INT, STR):
+            return STR  # concatenation, integers are converted
+        return None
+    elif t in INTEGER_OPS:
+        left, right = infer_type(node.left), infer_type(node.right)
+        return INT if left == right == INT else None
+    elif t == ASTTypes.UnaryMinus:
+        return INT if infer_type(node.expr) == INT else None
+    elif t == ASTTypes.IntegerLiteral:
+        return INT if -0x8000 <= node.value < 0x8000 else None
+    elif t == ASTTypes.StringLiteral:
+        try:
+            check_string(node.literal)
+        except ValueError:
+            return None
+        return STR
+    elif t == ASTTypes.IntegerVariable:
+        return INT
+    elif t == ASTTypes.StringVariable:
+        return STR
+    elif t == ASTTypes.ArrayExpression:
+        return INT if infer_type(node.index) == INT else None
+    elif t == ASTTypes.BuiltInVariable:
+        return INT if node.name == "TI" else None
+    elif t == ASTTypes.BuiltInCall:
+        if node.function is None:
+            return None
+        arg_types, result_type = BUILTIN_TYPES[node.name]
+        for i, arg in enumerate(node.expressions):
+            if infer_type(arg) != arg_types[min(i, len(arg_types) - 1)]:
+                return None
+        return result_type
+    return None
@@ -17,6 +17,13 @@ def twos_complement(n, bits: int = 16, convert: bool = False) -> int:
         return u
 
 
+def wrap16(n: int) -> int:
+    """
+    Same as twos_complement(n) for an int n, without the checks and calls.
+    """
+    return ((n + 0x8000) & 0xFFFF) - 0x8000
+
+
 def check_string(
     s,
     convert: bool = False,
@@ -30,6 +37,12 @@ def check_string(
         assert isinstance(s, str)
     if len(s) > 255:
         raise ValueError("string too long")
+    if allowed_chars == "any":
+        try:
+            s.encode("latin-1")  # all codepoints below 256, checked in C
+            return s
+        except UnicodeEncodeError:
+            pass  # find the invalid character below
     for c in s:
         n = ord(c)
         if allowed_chars == "any":
@@ -53,6 +66,18 @@ def check_string(
     return s
 
 
+def check_length(s: str) -> str:
+    """
+    Check a string that is built from valid strings and numbers (e.g. a
+    concatenation), only its length can be invalid. Every string value of
+    the interpreters passed check_string where it entered the program
+    (literals, INPUT, CHR$), so it never needs to be scanned again.
+    """
+    if len(s) > 255:
+        raise ValueError("string too long")
+    return s
+
+
 def is_printable(c: str | int):
     if isinstance(c, str):
         c = ord(c)
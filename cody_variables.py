@@ -0,0 +1,64 @@
+from array import array
+
+# book page 252/253: 26 integer variables A-Z (every one can be used as an
+# array, A is the same as A(0)) and 26 string variables A$-Z$. Lowercase
+# names are accepted too, as variables of their own (slots 26-51).
+VARIABLE_COUNT = 52
+
+
+def variable_slot(name: str) -> int:
+    """
+    Return the storage slot of the variable named "A" to "Z" (0-25) or
+    "a" to "z" (26-51).
+    """
+    if len(name) == 1 and "A" <= name <= "Z":
+        return ord(name) - ord("A")
+    elif len(name) == 1 and "a" <= name <= "z":
+        return ord(name) - ord("a") + 26
+    raise ValueError(f"invalid variable name {name}")
+
+
+def variable_name(slot: int) -> str:
+    return chr(ord("A") + slot) if slot < 26 else chr(ord("a") + slot - 26)
+
+
+def new_int_arrays() -> list[array]:
+    # element 0 always exists, so scalar reads are plain index operations
+    return [array("h", [0]) for _ in range(VARIABLE_COUNT)]
+
+
+def new_strings() -> list[str]:
+    return [""] * VARIABLE_COUNT
+
+
+def clear_int_arrays(int_arrays: list[array]):
+    for values in int_arrays:
+        del values[1:]
+        values[0] = 0
+
+
+def element_index(index: int) -> int:
+    # indices are 16-bit, negative indices are taken as unsigned
+    return index + 0x10000 if index < 0 else index
+
+
+def get_element(values: array, index: int) -> int:
+    """
+    Read an array element, elements that were never written are 0.
+    """
+    if index < 0:
+        index += 0x10000  # see element_index
+    return values[index] if index < len(values) else 0
+
+
+def set_element(values: array, index: int, value: int):
+    """
+    Write an array element, the array grows as needed. "value" must already
+    be a 16-bit signed integer.
+    """
+    if index < 0:
+        index += 0x10000
+    size = len(values)
+    if index >= size:
+        values.frombytes(bytes(values.itemsize * (index + 1 - size)))
+    values[index] = value
@@ -0,0 +1,631 @@
+from cody_parser import ASTTypes, ASTNode, CommandTypes, Command
+from cody_interpreter import Interpreter, IO
+from cody_builtins import find_builtin_function
+from cody_util import to_unsigned, twos_complement, check_string, check_length
+from cody_variables import variable_name, get_element, set_element, element_index
+from array import array
+from types import TracebackType
+from typing import Optional
+import bisect
+
+# opcodes, the comment lists the operands (stored in the code array after the
+# opcode) and the effect on the value stack
+CONST = 0  # constant index; -> value
+LOAD_INT = 1  # variable; -> value
+LOAD_INT_INDEXED = 2  # variable; index -> value
+LOAD_STR = 3  # variable; -> value
+STORE_INT = 4  # variable; value ->
+STORE_INT_INDEXED = 5  # variable; index, value ->
+STORE_STR = 6  # variable; value ->
+ADD = 7  # left, right -> value
+SUB = 8
+MUL = 9
+DIV = 10
+NEG = 11  # value -> value
+EQ = 12  # left, right -> bool
+NE = 13
+LT = 14
+LE = 15
+GT = 16
+GE = 17
+CALL = 18  # built-in function, argument count; args -> value
+TIME = 19  # -> value
+PRINT = 20  # value ->
+PRINTLN = 21
+INPUT_INT = 22  # variable
+INPUT_INT_INDEXED = 23  # variable; index ->
+INPUT_STR = 24  # variable
+READ_INT = 25  # variable
+READ_INT_INDEXED = 26  # variable; index ->
+RESTORE = 27
+OPEN = 28  # uart, bit rate ->
+CLOSE = 29
+POKE = 30  # address, value ->
+SYS = 31  # address ->
+JUMP = 32  # target
+JUMP_IF_FALSE = 33  # target; bool ->
+JUMP_LINE = 34  # line number ->
+GOSUB = 35  # target, return target
+GOSUB_LINE = 36  # return target; line number ->
+RETURN = 37
+FOR_INIT = 38  # variable; index, initial -> index, initial
+FOR = 39  # variable, body target; index, initial, limit ->
+NEXT = 40
+EXEC = 41  # command (executed by the interpreter)
+HALT = 42
+
+# opcode -> (name, number of operands)
+OPCODES = {
+    CONST: ("CONST", 1),
+    LOAD_INT: ("LOAD_INT", 1),
+    LOAD_INT_INDEXED: ("LOAD_INT_INDEXED", 1),
+    LOAD_STR: ("LOAD_STR", 1),
+    STORE_INT: ("STORE_INT", 1),
+    STORE_INT_INDEXED: ("STORE_INT_INDEXED", 1),
+    STORE_STR: ("STORE_STR", 1),
+    ADD: ("ADD", 0),
+    SUB: ("SUB", 0),
+    MUL: ("MUL", 0),
+    DIV: ("DIV", 0),
+    NEG: ("NEG", 0),
+    EQ: ("EQ", 0),
+    NE: ("NE", 0),
+    LT: ("LT", 0),
+    LE: ("LE", 0),
+    GT: ("GT", 0),
+    GE: ("GE", 0),
+    CALL: ("CALL", 2),
+    TIME: ("TIME", 0),
+    PRINT: ("PRINT", 0),
+    PRINTLN: ("PRINTLN", 0),
+    INPUT_INT: ("INPUT_INT", 1),
+    INPUT_INT_INDEXED: ("INPUT_INT_INDEXED", 1),
+    INPUT_STR: ("INPUT_STR", 1),
+    READ_INT: ("READ_INT", 1),
+    READ_INT_INDEXED: ("READ_INT_INDEXED", 1),
+    RESTORE: ("RESTORE", 0),
+    OPEN: ("OPEN", 0),
+    CLOSE: ("CLOSE", 0),
+    POKE: ("POKE", 0),
+    SYS: ("SYS", 0),
+    JUMP: ("JUMP", 1),
+    JUMP_IF_FALSE: ("JUMP_IF_FALSE", 1),
+    JUMP_LINE: ("JUMP_LINE", 0),
+    GOSUB: ("GOSUB", 2),
+    GOSUB_LINE: ("GOSUB_LINE", 1),
+    RETURN: ("RETURN", 0),
+    FOR_INIT: ("FOR_INIT", 1),
+    FOR: ("FOR", 2),
+    NEXT: ("NEXT", 0),
+    EXEC: ("EXEC", 1),
+    HALT: ("HALT", 0),
+}
+
+# opcodes whose first operand is the slot of a variable (see cody_variables)
+VARIABLE_OPERANDS = {
+    LOAD_INT,
+    LOAD_INT_INDEXED,
+    LOAD_STR,
+    STORE_INT,
+    STORE_INT_INDEXED,
+    STORE_STR,
+    INPUT_INT,
+    INPUT_INT_INDEXED,
+    INPUT_STR,
+    READ_INT,
+    READ_INT_INDEXED,
+    FOR_INIT,
+    FOR,
+}
+
+# opcodes whose operands are code offsets, all other operands (except for the
+# argument count of CALL and variables) index the constants
+JUMP_OPERANDS = {
+    JUMP: (0,),
+    JUMP_IF_FALSE: (0,),
+    GOSUB: (0, 1),
+    GOSUB_LINE: (0,),
+    FOR: (1,),
+}
+
+BINARY_OPS = {
+    ASTTypes.BinaryAdd: ADD,
+    ASTTypes.BinarySub: SUB,
+    ASTTypes.BinaryMul: MUL,
+    ASTTypes.BinaryDiv: DIV,
+    ASTTypes.Equal: EQ,
+    ASTTypes.NotEqual: NE,
+    ASTTypes.Less: LT,
+    ASTTypes.LessEqual: LE,
+    ASTTypes.Greater: GT,
+    ASTTypes.GreaterEqual: GE,
+}
+
+
+class Bytecode:
+    """
+    A compiled program: a flat array of opcodes and operands, the constants
+    referenced by the operands and the code offset of every command.
+    """
+
+    def __init__(self, program: list[Command]):
+        self.program = program
+        self.code = array("i")
+        # values, built-in functions and commands
+        self.constants: list[object] = []
+        self._constant_index: dict[tuple[type, object], int] = {}
+        # code offset of each command, the last entry is the final HALT
+        self.starts: list[int] = []
+        # (offset of operand, command index) to patch after code generation
+        self._patches: list[tuple[int, int]] = []
+
+    def constant(self, value: object) -> int:
+        key = (type(value), value)
+        if key not in self._constant_index:
+            self._constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return self._constant_index[key]
+
+    def emit(self, op: int, *operands: int):
+        self.code.append(op)
+        self.code.extend(operands)
+
+    def emit_target(self, index: int):
+        # operand that will be replaced by the code offset of a command
+        self._patches.append((len(self.code), index))
+        self.code.append(-1)
+
+    def compile(self) -> "Bytecode":
+        # precondition: the program must be linked (see Interpreter.link)
+        for cmd in self.program:
+            self.starts.append(len(self.code))
+            patches = len(self._patches)
+            try:
+                self.compile_command(cmd)
+            except NotImplementedError:
+                # commands the VM cannot run (REPL commands, unknown built-ins,
+                # type errors in targets) are left to the interpreter, which
+                # also reports the errors when they are executed, not earlier
+                del self.code[self.starts[-1] :]
+                del self._patches[patches:]
+                self.emit(EXEC, self.constant(cmd))
+        self.starts.append(len(self.code))
+        self.emit(HALT)
+        for offset, index in self._patches:
+            self.code[offset] = self.starts[index]
+        self._patches.clear()
+        return self
+
+    def successor(self, command: Command) -> int:
+        # the final HALT if there is no next command
+        if command.next_index is None:
+            return len(self.program)
+        return command.next_index
+
+    def compile_command(self, command: Command):
+        t = command.command_type
+        if t in (CommandTypes.REM, CommandTypes.EMPTY, CommandTypes.DATA):
+            pass
+        elif t == CommandTypes.ASSIGNMENT:
+            self.compile_store(command.lvalue, command.rvalue)
+        elif t == CommandTypes.PRINT:
+            for expr in command.expressions:
+                self.compile_expr(expr)
+                self.emit(PRINT)
+            if not command.no_new_line:
+                self.emit(PRINTLN)
+        elif t == CommandTypes.INPUT:
+            for expr in command.expressions:
+                self.compile_target(expr, INPUT_INT, INPUT_INT_INDEXED, INPUT_STR)
+        elif t == CommandTypes.READ:
+            for expr in command.expressions:
+                self.compile_target(expr, READ_INT, READ_INT_INDEXED, None)
+        elif t == CommandTypes.RESTORE:
+            self.emit(RESTORE)
+        elif t == CommandTypes.OPEN:
+            self.compile_expr(command.uart)
+            self.compile_expr(command.bit_rate)
+            self.emit(OPEN)
+        elif t == CommandTypes.CLOSE:
+            self.emit(CLOSE)
+        elif t == CommandTypes.POKE:
+            self.compile_expr(command.address)
+            self.compile_expr(command.expression)
+            self.emit(POKE)
+        elif t == CommandTypes.SYS:
+            self.compile_expr(command.address)
+            self.emit(SYS)
+        elif t == CommandTypes.IF:
+            self.compile_expr(command.condition)
+            self.emit(JUMP_IF_FALSE)
+            self.emit_target(self.successor(command))
+            self.compile_command(command.command)
+        elif t == CommandTypes.GOTO:
+            if command.target_index is not None:
+                self.emit(JUMP)
+                self.emit_target(command.target_index)
+            else:
+                self.compile_expr(command.expression)
+                self.emit(JUMP_LINE)
+        elif t == CommandTypes.GOSUB:
+            if command.target_index is not None:
+                self.emit(GOSUB)
+                self.emit_target(command.target_index)
+            else:
+                self.compile_expr(command.expression)
+                self.emit(GOSUB_LINE)
+            self.emit_target(self.successor(command))
+        elif t == CommandTypes.RETURN:
+            self.emit(RETURN)
+        elif t == CommandTypes.FOR:
+            var = command.loop_variable
+            if var.ast_type == ASTTypes.ArrayExpression:
+                slot = var.subnode.slot
+                self.compile_expr(var.index)
+            elif var.ast_type == ASTTypes.IntegerVariable:
+                slot = var.slot
+                self.emit(CONST, self.constant(0))
+            else:
+                raise NotImplementedError("loop variable must be an integer")
+            self.compile_expr(command.initial)
+            self.emit(FOR_INIT, slot)
+            self.compile_expr(command.limit)
+            self.emit(FOR, slot)
+            self.emit_target(self.successor(command))
+        elif t == CommandTypes.NEXT:
+            self.emit(NEXT)
+        elif t == CommandTypes.END:
+            self.emit(HALT)
+        else:
+            raise NotImplementedError(f"command type {t.name} not supported")
+
+    def compile_target(
+        self,
+        node: ASTNode,
+        int_op: int,
+        indexed_op: int,
+        str_op: Optional[int],
+    ):
+        if node.ast_type == ASTTypes.IntegerVariable:
+            self.emit(int_op, node.slot)
+        elif node.ast_type == ASTTypes.ArrayExpression:
+            self.compile_expr(node.index)
+            self.emit(indexed_op, node.subnode.slot)
+        elif node.ast_type == ASTTypes.StringVariable and str_op is not None:
+            self.emit(str_op, node.slot)
+        else:
+            raise NotImplementedError(f"cannot write to node {node.ast_type.name}")
+
+    def compile_store(self, lvalue: ASTNode, rvalue: ASTNode):
+        if lvalue.ast_type == ASTTypes.ArrayExpression:
+            self.compile_expr(lvalue.index)
+            self.compile_expr(rvalue)
+            self.emit(STORE_INT_INDEXED, lvalue.subnode.slot)
+        else:
+            self.compile_expr(rvalue)
+            if lvalue.ast_type == ASTTypes.IntegerVariable:
+                self.emit(STORE_INT, lvalue.slot)
+            else:
+                self.emit(STORE_STR, lvalue.slot)
+
+    def compile_expr(self, node: ASTNode):
+        t = node.ast_type
+        if t in BINARY_OPS:
+            self.compile_expr(node.left)
+            self.compile_expr(node.right)
+            self.emit(BINARY_OPS[t])
+        elif t == ASTTypes.UnaryMinus:
+            self.compile_expr(node.expr)
+            self.emit(NEG)
+        elif t == ASTTypes.IntegerLiteral:
+            self.emit(CONST, self.constant(twos_complement(node.value)))
+        elif t == ASTTypes.StringLiteral:
+            self.emit(CONST, self.constant(check_string(node.literal)))
+        elif t == ASTTypes.IntegerVariable:
+            self.emit(LOAD_INT, node.slot)
+        elif t == ASTTypes.StringVariable:
+            self.emit(LOAD_STR, node.slot)
+        elif t == ASTTypes.ArrayExpression:
+            self.compile_expr(node.index)
+            self.emit(LOAD_INT_INDEXED, node.subnode.slot)
+        elif t == ASTTypes.BuiltInVariable:
+            if node.name != "TI":
+                raise NotImplementedError(f"built-in variable {node.name}")
+            self.emit(TIME)
+        elif t == ASTTypes.BuiltInCall:
+            for arg in node.expressions:
+                self.compile_expr(arg)
+            function = find_builtin_function(node.name, len(node.expressions))
+            self.emit(CALL, self.constant(function), len(node.expressions))
+        else:
+            raise NotImplementedError(f"ast type {t.name} not implemented")
+
+    def command_at(self, pc: int) -> Optional[Command]:
+        # the command whose code contains offset pc
+        index = bisect.bisect_right(self.starts, pc) - 1
+        return self.program[index] if 0 <= index < len(self.program) else None
+
+    def disassemble(self) -> str:
+        lines = []
+        command_starts = {offset: i for i, offset in enumerate(self.starts)}
+        pc = 0
+        while pc < len(self.code):
+            if pc in command_starts and command_starts[pc] < len(self.program):
+                lines.append(f"; {self.program[command_starts[pc]].source}")
+            op = self.code[pc]
+            name, count = OPCODES[op]
+            operands = self.code[pc + 1 : pc + 1 + count]
+            text = []
+            for i, operand in enumerate(operands):
+                if i in JUMP_OPERANDS.get(op, ()):
+                    text.append(f"@{operand}")
+                elif op in VARIABLE_OPERANDS and i == 0:
+                    text.append(repr(variable_name(operand)))
+                elif op == CALL and i == 1:
+                    text.append(str(operand))
+                elif op == CALL:
+                    text.append(self.constants[operand].__name__)
+                elif op == EXEC:
+                    text.append(repr(self.constants[operand].source))
+                else:
+                    text.append(repr(self.constants[operand]))
+            lines.append(f"{pc:6d}  {name:<18}{' '.join(text)}".rstrip())
+            pc += 1 + count
+        return "\n".join(lines)
+
+
+class VirtualMachine(Interpreter):
+    """
+    Interpreter that compiles the loaded program to bytecode (see Bytecode)
+    and runs it in a single dispatch loop. Commands entered in the REPL are
+    still executed by the interpreter.
+    """
+
+    def __init__(self, io: Optional[IO] = None, **kwargs):
+        super().__init__(io, **kwargs)
+        self.bytecode: Optional[Bytecode] = None
+
+    def link(self):
+        super().link()
+        self.bytecode = None  # program has changed
+
+    def compile(self) -> Bytecode:
+        if not self.linked:
+            self.link()
+        if self.bytecode is None:
+            self.bytecode = Bytecode(self.program).compile()
+        return self.bytecode
+
+    def _run_loop(self, next_index: Optional[int]):
+        if next_index is None:
+            return super()._run_loop(next_index)
+        assert self.repl
+        bytecode = self.compile()
+        self.running = True
+        try:
+            self.execute(bytecode, bytecode.starts[next_index])
+        except Exception as e:
+            cmd = self._failed_command(bytecode, e.__traceback__)
+            if cmd is not None:
+                e.add_note(f"in line {cmd.source}")
+            raise
+        finally:
+            self.running = False
+
+    def _failed_command(
+        self, bytecode: Bytecode, tb: Optional[TracebackType]
+    ) -> Optional[Command]:
+        # the program counter of execute is only known to its frame
+        while tb is not None:
+            if tb.tb_frame.f_code is VirtualMachine.execute.__code__:
+                return bytecode.command_at(tb.tb_frame.f_locals["pc"])
+            tb = tb.tb_next
+        return None
+
+    def execute(self, bytecode: Bytecode, pc: int):
+        code = bytecode.code
+        constants = bytecode.constants
+        starts = bytecode.starts
+        io = self.io
+        ints = self.int_arrays
+        strings = self.strings
+        calls = self.call_stack
+        loops = self.loop_stack
+        stack = []
+        push = stack.append
+        pop = stack.pop
+
+        while True:
+            op = code[pc]
+            if op == CONST:
+                push(constants[code[pc + 1]])
+                pc += 2
+            elif op == LOAD_INT:
+                push(ints[code[pc + 1]][0])
+                pc += 2
+            elif op == STORE_INT:
+                value = pop()
+                if type(value) is not int:
+                    value = twos_complement(value)  # fails for strings
+                ints[code[pc + 1]][0] = value  # ints on the stack are wrapped
+                pc += 2
+            elif op == ADD:
+                right = pop()
+                left = pop()
+                if isinstance(left, int) and isinstance(right, int):
+                    push(((left + right + 0x8000) & 0xFFFF) - 0x8000)
+                else:
+                    assert isinstance(left, (int, str))
+                    assert isinstance(right, (int, str))
+                    push(check_length(f"{left}{right}"))
+                pc += 1
+            elif op == SUB or op == MUL or op == DIV:
+                right = pop()
+                left = pop()
+                assert isinstance(left, int) and isinstance(right, int)
+                # inlined wrap16
+                if op == SUB:
+                    push(((left - right + 0x8000) & 0xFFFF) - 0x8000)
+                elif op == MUL:
+                    push(((left * right + 0x8000) & 0xFFFF) - 0x8000)
+                else:
+                    push(((left // right + 0x8000) & 0xFFFF) - 0x8000)  # integer div
+                pc += 1
+            elif EQ <= op <= GE:
+                right = pop()
+                left = pop()
+                assert isinstance(left, (int, str)) and type(left) == type(right)
+                if op == EQ:
+                    push(left == right)
+                elif op == NE:
+                    push(left != right)
+                elif op == LT:
+                    push(left < right)
+                elif op == LE:
+                    push(left <= right)
+                elif op == GT:
+                    push(left > right)
+                else:
+                    push(left >= right)
+                pc += 1
+            elif op == JUMP_IF_FALSE:
+                if pop():
+                    pc += 2
+                else:
+                    pc = code[pc + 1]
+            elif op == NEXT:
+                values, index, limit, body = loops[-1]
+                value = values[index]
+                if value >= limit:
+                    loops.pop()
+                    pc += 1
+                else:
+                    values[index] = value + 1  # no overflow: value < limit
+                    pc = body
+                    self._check_cancel()
+            elif op == LOAD_INT_INDEXED:
+                index = pop()
+                values = ints[code[pc + 1]]
+                if 0 <= index < len(values):
+                    push(values[index])
+                else:
+                    push(get_element(values, index))
+                pc += 2
+            elif op == STORE_INT_INDEXED:
+                value = pop()
+                if type(value) is not int:
+                    value = twos_complement(value)  # fails for strings
+                index = pop()
+                set_element(ints[code[pc + 1]], index, value)
+                pc += 2
+            elif op == LOAD_STR:
+                push(strings[code[pc + 1]])
+                pc += 2
+            elif op == STORE_STR:
+                value = pop()
+                assert isinstance(value, str)  # valid, see check_length
+                strings[code[pc + 1]] = value
+                pc += 2
+            elif op == NEG:
+                value = pop()
+                assert isinstance(value, int)
+                push(((0x8000 - value) & 0xFFFF) - 0x8000)
+                pc += 1
+            elif op == CALL:
+                function = constants[code[pc + 1]]
+                count = code[pc + 2]
+                if count:
+                    args = stack[-count:]
+                    del stack[-count:]
+                    push(function(io, *args))
+                else:
+                    push(function(io))
+                pc += 3
+            elif op == PRINT:
+                value = pop()
+                if value is not None:
+                    io.print(value if isinstance(value, str) else str(value))
+                pc += 1
+            elif op == PRINTLN:
+                io.println()
+                pc += 1
+            elif op == JUMP:
+                pc = code[pc + 1]
+                self._check_cancel()
+            elif op == GOSUB:
+                calls.append(code[pc + 2])
+                pc = code[pc + 1]
+                self._check_cancel()
+            elif op == RETURN:
+                pc = calls.pop()
+                self._check_cancel()
+            elif op == FOR_INIT:
+                initial = pop()
+                index = stack[-1]
+                value = twos_complement(initial)
+                set_element(ints[code[pc + 1]], index, value)
+                push(initial)
+                pc += 2
+            elif op == FOR:
+                limit = pop()
+                initial = pop()
+                index = pop()
+                assert initial <= limit
+                # same frames as Interpreter: FOR_INIT created the element
+                values = ints[code[pc + 1]]
+                loops.append((values, element_index(index), limit, code[pc + 2]))
+                pc += 3
+            elif op == JUMP_LINE or op == GOSUB_LINE:
+                target = pop()
+                assert isinstance(target, int)
+                target = starts[self.find_line_number(to_unsigned(target))]
+                if op == GOSUB_LINE:
+                    calls.append(code[pc + 1])
+                pc = target
+                self._check_cancel()
+            elif op == TIME:
+                push(self.eval_builtin_var("TI"))
+                pc += 1
+            elif op == INPUT_INT or op == INPUT_INT_INDEXED or op == INPUT_STR:
+                index = pop() if op == INPUT_INT_INDEXED else 0
+                value = io.input(f"{io.prompt_char()} ")
+                slot = code[pc + 1]
+                if op == INPUT_STR:
+                    strings[slot] = check_string(value)
+                else:
+                    value = twos_complement(value, convert=True)
+                    set_element(ints[slot], index, value)
+                pc += 2
+            elif op == READ_INT or op == READ_INT_INDEXED:
+                index = pop() if op == READ_INT_INDEXED else 0
+                value = twos_complement(self.read_next_data_value())
+                set_element(ints[code[pc + 1]], index, value)
+                pc += 2
+            elif op == RESTORE:
+                self.data_cursor = 0
+                pc += 1
+            elif op == OPEN:
+                bit_rate = pop()
+                uart = pop()
+                io.open_uart(uart, bit_rate)
+                pc += 1
+            elif op == CLOSE:
+                io.close_uart()
+                pc += 1
+            elif op == POKE:
+                value = to_unsigned(pop(), bits=8)
+                address = to_unsigned(pop())
+                io.poke(address, value)
+                pc += 1
+            elif op == SYS:
+                io.sys(to_unsigned(pop()))
+                pc += 1
+            elif op == EXEC:
+                next_index = self._run_command(constants[code[pc + 1]])
+                if next_index is None:
+                    return
+                pc = starts[next_index]
+            elif op == HALT:
+                return
+            else:
+                raise NotImplementedError(f"opcode {op} not implemented")
@@ -0,0 +1,158 @@
+# python -m pytest -s
+import asyncio
+import pytest
+from cody_parser import CodyBasicParser
+from cody_async import AsyncIO, AsyncInterpreter, session
+
+
+def make_interpreter(code: str, **options) -> AsyncInterpreter:
+    interp = AsyncInterpreter(AsyncIO(), **options)
+    interp.load(CodyBasicParser().parse_string(code))
+    return interp
+
+
+def test_input_fed_later():
+    async def main():
+        interp = make_interpreter("10 INPUT A\n20 INPUT B$\n30 PRINT B$,A*2")
+        running = asyncio.create_task(interp.run_async())
+        await asyncio.sleep(0)
+        assert not running.done()
+        interp.io.feed("21")
+        await asyncio.sleep(0)
+        assert not running.done()
+        interp.io.feed("X")
+        await running
+        return interp.io.take_output()
+
+    assert asyncio.run(main()) == "? ? X42\n"
+
+
+def test_closed_input():
+    async def main():
+        interp = make_interpreter("10 INPUT A")
+        interp.io.close_input()
+        with pytest.raises(EOFError):
+            await interp.run_async()
+        assert not interp.running
+
+    asyncio.run(main())
+
+
+class SlowWriter:
+    # drain() waits like a paused transport
+    def __init__(self):
+        self.data = b""
+        self.draining = asyncio.Event()
+
+    def write(self, data: bytes):
+        self.data += data
+
+    async def drain(self):
+        self.draining.set()
+        await asyncio.sleep(0.01)
+
+
+def test_input_fed_while_flushing():
+    async def main():
+        writer = SlowWriter()
+        interp = AsyncInterpreter(AsyncIO(writer))
+        interp.load(CodyBasicParser().parse_string("10 INPUT A\n20 PRINT A*2"))
+        running = asyncio.create_task(interp.run_async())
+        await writer.draining.wait()
+        interp.io.feed("5")
+        await asyncio.wait_for(running, 1)
+        return writer.data
+
+    assert asyncio.run(main()) == b"? 10\r\n"
+
+
+def test_slices_interleave():
+    async def main():
+        code = "10 FOR I=1 TO 3\n20 PRINT {};\n30 NEXT"
+        interps = [
+            make_interpreter(code.format(n), slice_statements=1) for n in range(2)
+        ]
+        order = []
+
+        async def run(interp):
+            task = asyncio.create_task(interp.run_async())
+            while not task.done():
+                order.append(interp.io.take_output())
+                await asyncio.sleep(0)
+            order.append(interp.io.take_output())
+
+        await asyncio.gather(*(run(interp) for interp in interps))
+        return "".join(order)
+
+    output = asyncio.run(main())
+    assert sorted(output) == sorted("000111")
+    assert output != "000111"
+
+
+def test_many_sessions():
+    code = "10 INPUT N\n20 S=0\n30 FOR I=1 TO N\n40 S=S+I\n50 NEXT\n60 PRINT S"
+
+    async def main():
+        interps = [make_interpreter(code, slice_statements=10) for _ in range(100)]
+        tasks = [asyncio.create_task(interp.run_async()) for interp in interps]
+        await asyncio.sleep(0)
+        for n, interp in enumerate(interps):
+            interp.io.feed(str(n + 1))
+        await asyncio.gather(*tasks)
+        return [interp.io.take_output() for interp in interps]
+
+    outputs = asyncio.run(main())
+    assert outputs == [f"? {(n + 1) * (n + 2) // 2}\n" for n in range(100)]
+
+
+def test_load_from_uart():
+    async def main():
+        interp = make_interpreter("")
+        parser = CodyBasicParser()
+        loading = asyncio.create_task(
+            interp.run_command_async(parser.parse_command("LOAD 1,0"))
+        )
+        interp.io.feed('10 PRINT "LOADED"', uart=1)
+        await asyncio.sleep(0)
+        assert not loading.done()
+        interp.io.feed("", uart=1)
+        await loading
+        await interp.run_async()
+        return interp.io.take_output()
+
+    assert asyncio.run(main()) == "LOADED\n"
+
+
+def run_session(data: bytes) -> str:
+    # send the data to a session server, return all the output
+    async def main():
+        server = await asyncio.start_server(session, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(data)
+            writer.write_eof()
+            output = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return output.decode("latin-1")
+
+    return asyncio.run(main())
+
+
+def test_session():
+    output = run_session(
+        b'10 INPUT A$\r\n20 PRINT "HI ",A$\r\nRUN\r\nBOB\r\nPRINT 1/0\r\n'
+    )
+    assert output.startswith("  *** CODY COMPUTER BASIC V1.0emu ***  \r\n")
+    assert "? HI BOB\r\nREADY.\r\n" in output
+    assert "ZeroDivisionError" in output and output.endswith("ERROR\r\nREADY.\r\n")
+
+
+def test_session_uart():
+    # the client only feeds the keyboard, reading a UART fails at once
+    output = run_session(
+        b"LOAD 1,0\r\nLOAD 3,0\r\n10 OPEN 1,15\r\n20 INPUT A\r\nRUN\r\nPRINT 7\r\n"
+    )
+    assert output.count("ValueError: no input on UART 1") == 2
+    assert "AssertionError" in output
+    assert output.endswith("7\r\nREADY.\r\n")
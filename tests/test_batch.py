@@ -0,0 +1,97 @@
+# python -m pytest -s
+import json
+import os
+from cody_batch import (
+    BatchJob,
+    find_jobs,
+    run_job,
+    run_batch,
+    summary,
+    write_report,
+    STATUS_OK,
+    STATUS_ERROR,
+    STATUS_INPUT,
+    STATUS_TIMEOUT,
+    STATUS_CRASH,
+)
+
+PROGRAMS = {
+    "hello.bas": '10 INPUT N$\n20 PRINT "HELLO ",N$',
+    "error.bas": "10 A=1\n20 A=A/0",
+    "forever.bas": "10 A=A+1\n20 GOTO 10",
+}
+
+
+def write_programs(tmp_path) -> dict[str, str]:
+    for name, code in PROGRAMS.items():
+        (tmp_path / name).write_text(code)
+    return {name: str(tmp_path / name) for name in PROGRAMS}
+
+
+def test_find_jobs(tmp_path):
+    files = write_programs(tmp_path)
+    (tmp_path / "hello.in").write_text("A\n")
+    (tmp_path / "hello.b.in").write_text("B\n")
+    jobs = find_jobs(files["hello.bas"])
+    assert [job.inputs for job in jobs] == [["A"], ["B"]]
+    assert jobs[1].name == files["hello.bas"] + ".b"
+    assert [job.inputs for job in find_jobs(files["error.bas"])] == [[]]
+
+
+def test_run_job(tmp_path):
+    files = write_programs(tmp_path)
+    result = run_job(BatchJob(files["hello.bas"], ["CODY"]))
+    assert (result.status, result.output, result.statements) == (
+        STATUS_OK,
+        ["HELLO CODY"],
+        2,
+    )
+    result = run_job(BatchJob(files["hello.bas"], []))
+    assert result.status == STATUS_INPUT
+    result = run_job(BatchJob(files["error.bas"], []))
+    assert result.status == STATUS_ERROR
+    assert result.error.startswith("ZeroDivisionError")
+    assert "in line 20 A=A/0" in result.error
+    result = run_job(BatchJob(str(tmp_path / "missing.bas"), []))
+    assert result.status == STATUS_ERROR
+
+
+def test_timeout(tmp_path):
+    files = write_programs(tmp_path)
+    result = run_job(BatchJob(files["forever.bas"], []), timeout=0.05)
+    assert result.status == STATUS_TIMEOUT
+    assert result.statements > 0 and result.seconds < 1
+
+
+def test_run_batch(tmp_path):
+    files = write_programs(tmp_path)
+    jobs = [BatchJob(files[name], ["X"]) for name in PROGRAMS]
+    results = run_batch(jobs, workers=2, timeout=0.1)
+    assert [result.status for result in results] == [
+        STATUS_OK,
+        STATUS_ERROR,
+        STATUS_TIMEOUT,
+    ]
+    assert summary(results)["ok"] == 1
+    write_report(results, str(tmp_path / "report.json"))
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert report["summary"]["total"] == 3
+    assert report["results"][0]["output"] == ["HELLO X"]
+
+
+class CrashingJob(BatchJob):
+    # ends the worker process that receives it
+    def __reduce__(self):
+        return (os._exit, (1,))
+
+
+def test_worker_crash(tmp_path):
+    files = write_programs(tmp_path)
+    jobs = [BatchJob(files["hello.bas"], [str(n)]) for n in range(6)]
+    jobs.insert(2, CrashingJob(files["hello.bas"], []))
+    results = run_batch(jobs, workers=2)
+    statuses = [result.status for result in results]
+    assert statuses == [STATUS_OK] * 2 + [STATUS_CRASH] + [STATUS_OK] * 4
+    assert [result.output for result in results[3:]] == [
+        [f"HELLO {n}"] for n in range(2, 6)
+    ]
@@ -0,0 +1,86 @@
+# python -m pytest -s
+import os
+import cody_cache
+from cody_cache import ProgramCache
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+
+CODE = "10 A=1\n20 PRINT A\n"
+
+
+def run_program(program) -> list[str]:
+    interp = Interpreter(TestIO())
+    interp.load(program)
+    interp.run()
+    return interp.io.output_log
+
+
+def test_cache_hit(tmp_path):
+    source = tmp_path / "test.bas"
+    source.write_text(CODE)
+    cache = ProgramCache(str(tmp_path / "cache"))
+    parser = CodyBasicParser(cache)
+
+    first = parser.parse_file(str(source))
+    assert len(cache.entries()) == 1
+    second = parser.parse_file(str(source))
+    assert second is not first
+    assert [c.source for c in second] == [c.source for c in first]
+    assert run_program(second) == ["1"]
+
+
+def test_cache_invalidation(tmp_path):
+    source = tmp_path / "test.bas"
+    source.write_text(CODE)
+    cache = ProgramCache(str(tmp_path / "cache"))
+    parser = CodyBasicParser(cache)
+    parser.parse_file(str(source))
+
+    # changed source
+    source.write_text(CODE.replace("A=1", "A=2"))
+    assert run_program(parser.parse_file(str(source))) == ["2"]
+    assert len(cache.entries()) == 2
+
+    # changed parser
+    key = cache.key(CODE)
+    cache._version = f"{cody_cache.CACHE_FORMAT_VERSION}-other"
+    assert cache.key(CODE) != key
+    assert cache.get(CODE) is None
+
+
+def test_cache_broken_entry(tmp_path):
+    cache = ProgramCache(str(tmp_path))
+    os.makedirs(cache.directory, exist_ok=True)
+    with open(cache.path(CODE), "wb") as f:
+        f.write(b"garbage")
+    assert cache.get(CODE) is None
+    assert cache.entries() == []
+
+
+def test_cache_eviction(tmp_path):
+    parser = CodyBasicParser()
+    cache = ProgramCache(str(tmp_path))
+    sources = [f"10 PRINT {i}" for i in range(3)]
+    for i, code in enumerate(sources):
+        cache.put(code, parser.parse_string(code))
+        os.utime(cache.path(code), (i, i))
+    size = max(size for _, size, _ in cache.entries())
+
+    cache.max_bytes = 2 * size
+    cache.evict()
+    assert cache.get(sources[0]) is None
+    assert cache.get(sources[1]) is not None
+    assert cache.get(sources[2]) is not None
+
+    cache.clear()
+    assert cache.entries() == []
+
+
+def test_parse_file_control_characters(tmp_path):
+    source = tmp_path / "test.bas"
+    source.write_bytes(b'10 PRINT "A\x0cB\x1cC"\n20 PRINT 2\n')
+    for cache in (None, ProgramCache(str(tmp_path / "cache"))):
+        for _ in range(2):  # the second parse is a cache hit
+            program = CodyBasicParser(cache).parse_file(str(source))
+            sources = [c.source for c in program]
+            assert sources == ['10 PRINT "A\x0cB\x1cC"', "20 PRINT 2"]
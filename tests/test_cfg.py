@@ -0,0 +1,74 @@
+# python -m pytest -s
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+from cody_cfg import ControlFlowGraph, NEXT, JUMP, CALL, RETURN, LOOP
+
+CODE = """
+10 GOSUB 100
+20 FOR I=1 TO 3
+30 PRINT I
+40 IF I=2 THEN GOTO 60
+50 A=A+1
+60 NEXT
+70 GOTO 90
+80 PRINT "DEAD"
+90 END
+100 PRINT "SUB"
+110 RETURN
+"""
+
+
+def build(code: str) -> ControlFlowGraph:
+    interp = Interpreter(TestIO())
+    interp.load(CodyBasicParser().parse_string(code))
+    return ControlFlowGraph(interp.program)
+
+
+def lines(cfg: ControlFlowGraph) -> list[list[int]]:
+    return [
+        [cmd.line_number for cmd in cfg.program[block.start : block.end]]
+        for block in cfg.blocks
+    ]
+
+
+def test_blocks_and_edges():
+    cfg = build(CODE)
+    assert lines(cfg) == [
+        [10],
+        [20],
+        [30, 40],
+        [50],
+        [60],
+        [70],
+        [80],
+        [90],
+        [100, 110],
+    ]
+    assert [block.edges for block in cfg.blocks] == [
+        [(CALL, 8)],
+        [(NEXT, 2)],
+        [(JUMP, 4), (NEXT, 3)],
+        [(NEXT, 4)],
+        [(LOOP, 2), (NEXT, 5)],
+        [(JUMP, 7)],
+        [(NEXT, 7)],
+        [],
+        [(RETURN, 1)],
+    ]
+    assert [block.index for block in cfg.blocks if block.loop_header] == [2]
+    assert cfg.unreachable_lines() == [80]
+    assert "block 6 (line 80): 1 command, unreachable" in cfg.dump()
+
+
+def test_computed_jump():
+    cfg = build("10 GOTO A*10+20\n20 END\n30 PRINT 1")
+    assert cfg.blocks[0].computed
+    assert cfg.blocks[0].edges == []
+    assert cfg.unreachable_lines() == []  # every line might be the target
+
+
+def test_thread_jump():
+    cfg = build("10 GOTO 20\n20 GOTO 40\n30 GOTO 30\n40 PRINT 1\n50 GOTO 50")
+    assert cfg.thread_jump(0) == 3
+    assert cfg.thread_jump(2) == 2  # cycle
+    assert cfg.thread_jump(3) == 3
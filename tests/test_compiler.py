@@ -0,0 +1,75 @@
+# python -m pytest -s
+import pytest
+from cody_parser import CodyBasicParser
+from cody_interpreter import Interpreter, TestIO
+from cody_compiler import compile_expression
+
+EXPRESSIONS = [
+    "1",
+    "-5",
+    "32767+1",
+    "-32768-1",
+    "300*300",
+    "16/5",
+    "-(1+2)",
+    "A*B+A(1)",
+    "H*16+V",
+    '"HELLO"',
+    'A$+", "+B$',
+    "ABS(-10)",
+    "MOD(8,5)",
+    "NOT(A)",
+    "XOR(A,B)",
+    "CHR$(67,111,100,121)",
+    "STR$(A)",
+    "VAL(B$)",
+    "LEN(A$)",
+    'ASC("C")',
+    'SUB$(A$,1,2)',
+]
+
+CONDITIONS = [
+    "A=10",
+    "A<>B",
+    "A<B",
+    "A<=B",
+    "A>B",
+    "A>=B",
+    'A$<"I"',
+    'B$=A$+"!"',
+]
+
+
+def make_interpreter() -> Interpreter:
+    parser = CodyBasicParser()
+    interp = Interpreter(TestIO())
+    code = '10 A=10\n20 B=-3\n30 A(1)=7\n40 H=2\n50 V=5\n60 A$="HELLO"\n70 B$="42X"'
+    interp.load(parser.parse_string(code))
+    interp.run()
+    return interp
+
+
+@pytest.mark.parametrize("code", EXPRESSIONS)
+def test_compiled_expression(code):
+    interp = make_interpreter()
+    node = CodyBasicParser().parse(code)
+    expected = interp.eval(node)
+    assert compile_expression(node)(interp) == expected
+    assert node.compiled is compile_expression(node)  # cached
+
+
+@pytest.mark.parametrize("code", CONDITIONS)
+def test_compiled_condition(code):
+    interp = make_interpreter()
+    node = CodyBasicParser().parse(code, rel_op=True)
+    assert compile_expression(node)(interp) is interp.eval(node)
+
+
+@pytest.mark.parametrize("code", ["A*A$", 'A$-"X"', "-A$", "ABS(A$)", "A=A$"])
+def test_compiled_type_errors(code):
+    interp = make_interpreter()
+    node = CodyBasicParser().parse(code, rel_op=True)
+    with pytest.raises(AssertionError):
+        interp.eval(node)
+    with pytest.raises(AssertionError):
+        compile_expression(node)(interp)
@@ -1,20 +1,41 @@
 # python -m pytest -s
 from cody_parser import CodyBasicParser
 from cody_interpreter import Interpreter, TestIO
-from typing import Optional, Iterable
+from cody_interpreter import STOP_BUDGET, STOP_INPUT, STOP_END, STOP_ERROR
+from cody_transpiler import TranspilingInterpreter
+from cody_vm import VirtualMachine
+from typing import Callable, Optional, Iterable
+import pytest
+
+
+BACKENDS = {
+    "tree": lambda io: Interpreter(io),
+    "closures": lambda io: Interpreter(io, compile_expressions=True),
+    "fused": lambda io: Interpreter(io, fuse_statements=True),
+    "unchecked": lambda io: Interpreter(io, elide_checks=True),
+    "transpiled": lambda io: TranspilingInterpreter(io),
+    "vm": lambda io: VirtualMachine(io),
+}
+
+
+@pytest.fixture(params=list(BACKENDS))
+def backend(request) -> Callable[[TestIO], Interpreter]:
+    # the tests of this module run once per execution backend
+    return BACKENDS[request.param]
 
 
 def run_code(
     code: str,
     inputs: Optional[Iterable[str]] = None,
     *,
+    make: Callable[[TestIO], Interpreter],
     uart_inputs: Optional[dict[int, list[str]]] = None,
     print_prompts: bool = False,
     print_inputs: bool = False,
 ) -> Interpreter:
     parser = CodyBasicParser()
     parsed = parser.parse_string(code)
-    interp = Interpreter(
+    interp = make(
         TestIO(
             inputs=inputs,
             uart_inputs=uart_inputs,
@@ -27,37 +48,37 @@ def run_code(
     return interp
 
 
-def test_simple_add():
+def test_simple_add(backend):
     code = "10 PRINT 3+4"  # book page 247
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["7"]
 
 
-def test_hello_world():
+def test_hello_world(backend):
     code = '10 PRINT "HELLO"'
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["HELLO"]
 
 
-def test_no_new_line_print():
+def test_no_new_line_print(backend):
     code = '10 PRINT "WHAT IS YOUR NAME";'  # book page 250
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["WHAT IS YOUR NAME"]
 
 
-def test_expression_list():
+def test_expression_list(backend):
     code = '50 PRINT "CODY"," IS ",14," YEARS OLD."'  # book page 250 (modified)
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["CODY IS 14 YEARS OLD."]
 
 
-def test_array_expression():
+def test_array_expression(backend):
     code = "10 A(0)=10"  # book page 253
-    interp = run_code(code)
-    assert interp.int_arrays["A"][0] == 10
+    interp = run_code(code, make=backend)
+    assert interp.variable("A") == 10
 
 
-def test_io_example():
+def test_io_example(backend):
     code = """
 10 PRINT "WHAT IS YOUR NAME";
 20 INPUT N$
@@ -65,7 +86,7 @@ def test_io_example():
 40 INPUT A
 50 PRINT N$," IS ",A," YEARS OLD."
 """  # book page 250-251
-    interp = run_code(code, ["CODY", "14"], print_inputs=True)
+    interp = run_code(code, ["CODY", "14"], print_inputs=True, make=backend)
     assert interp.io.output_log == [
         "WHAT IS YOUR NAME? CODY",
         "HOW OLD ARE YOU? 14",
@@ -73,64 +94,64 @@ def test_io_example():
     ]
 
 
-def test_variable_example():
+def test_variable_example(backend):
     code = """
 10 A(0)=10
 20 A(1)=20
 30 PRINT A+A(1)*3
 """  # book page 253
-    interp = run_code(code)
-    assert interp.int_arrays["A"][0] == 10
-    assert interp.int_arrays["A"][1] == 20
+    interp = run_code(code, make=backend)
+    assert interp.variable("A") == 10
+    assert interp.variable("A", 1) == 20
     assert interp.io.output_log == ["70"]
 
 
-def test_variable_example2():
+def test_variable_example2(backend):
     code = """
 10 M$ = "HELLO "
 20 N$ = "WORLD!"
 30 PRINT M$,N$
 """  # book page 254
-    interp = run_code(code)
-    assert interp.strings["M"] == "HELLO "
-    assert interp.strings["N"] == "WORLD!"
+    interp = run_code(code, make=backend)
+    assert interp.variable("M$") == "HELLO "
+    assert interp.variable("N$") == "WORLD!"
     assert interp.io.output_log == ["HELLO WORLD!"]
 
 
-def test_if_example1():
+def test_if_example1(backend):
     code = """
 10 INPUT N
 20 IF N<0 THEN PRINT "NEGATIVE"
 30 IF N=0 THEN PRINT "ZERO"
 40 IF N>0 THEN PRINT "POSITIVE"
 """  # book page 255
-    interp = run_code(code, ["3"])
+    interp = run_code(code, ["3"], make=backend)
     assert interp.io.output_log == ["POSITIVE"]
 
 
-def test_if_example2():
+def test_if_example2(backend):
     code = """
 10 INPUT S$
 20 IF S$<"B" THEN PRINT "LESS"
 30 IF S$="B" THEN PRINT "EQUAL"
 40 IF S$>"B" THEN PRINT "GREATER"
 """  # book page 256
-    interp = run_code(code, ["BA"])
+    interp = run_code(code, ["BA"], make=backend)
     assert interp.io.output_log == ["GREATER"]
 
 
-def test_goto_example():
+def test_goto_example(backend):
     code = """
 10 PRINT "A"
 20 GOTO 40
 30 PRINT "B"
 40 PRINT "Z"
 """  # book page 257
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["A", "Z"]
 
 
-def test_gosub_example():
+def test_gosub_example(backend):
     code = """
 10 PRINT "A"
 20 GOSUB 50
@@ -139,21 +160,21 @@ def test_gosub_example():
 50 PRINT "B"
 60 RETURN
 """  # book page 258
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["A", "B", "C"]
 
 
-def test_for_example():
+def test_for_example(backend):
     code = """
 10 FOR I=1 TO 5
 20 PRINT I
 30 NEXT
 """  # book page 259
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["1", "2", "3", "4", "5"]
 
 
-def test_rel_ops():
+def test_rel_ops(backend):
     code = """
 100 IF 1=1 THEN PRINT 10
 110 IF 1<>1 THEN PRINT 11
@@ -174,7 +195,7 @@ def test_rel_ops():
 340 IF 2>1 THEN PRINT 34
 350 IF 2>=1 THEN PRINT 35
 """
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == [
         "10",
         "13",
@@ -188,7 +209,7 @@ def test_rel_ops():
     ]
 
 
-def test_print():
+def test_print(backend):
     code = """
 10 PRINT 1
 20 PRINT 2, 3
@@ -200,77 +221,77 @@ def test_print():
 80 PRINT "B";
 90 PRINT
 """
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["1", "23", "45678", "", "AB"]
 
 
-def test_math_expr():
+def test_math_expr(backend):
     code = """
 10 PRINT 4+5*6-10
 """  # book page 270
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["24"]
 
 
-def test_math_div():
+def test_math_div(backend):
     code = """
 10 PRINT 16/5
 """  # book page 270
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["3"]
 
 
-def test_math_expr_parens():
+def test_math_expr_parens(backend):
     code = """
 10 PRINT 3*((8+2)/2)
 """  # book page 271
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["15"]
 
 
-def test_math_expr_unary_minus_1():
+def test_math_expr_unary_minus_1(backend):
     code = """
 10 PRINT -(1+2)
 """  # book page 271
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["-3"]
 
 
-def test_math_expr_unary_minus_2():
+def test_math_expr_unary_minus_2(backend):
     code = """
 10 A=20
 20 B=2
 30 PRINT -A*B
 """  # book page 272
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["-40"]
 
 
-def test_builtin_function_abs():
+def test_builtin_function_abs(backend):
     code = """
 10 PRINT ABS(-10)
 """  # book page 273
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["10"]
 
 
-def test_builtin_function_sqr():
+def test_builtin_function_sqr(backend):
     code = """
 10 PRINT SQR(10)
 """  # book page 273
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["3"]
 
 
-def test_builtin_function_mod():
+def test_builtin_function_mod(backend):
     code = """
 10 PRINT MOD(8,5)
 """  # book page 273
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["3"]
 
 
-def test_builtin_function_bitwise():
+def test_builtin_function_bitwise(backend):
     code = """
 10 INPUT A
 20 INPUT B
@@ -279,98 +300,98 @@ def test_builtin_function_bitwise():
 50 PRINT "OR ",OR(A,B)
 60 PRINT "XOR ",XOR(A,B)
 """  # book page 275
-    interp = run_code(code, ["1", "0"])
+    interp = run_code(code, ["1", "0"], make=backend)
     assert interp.io.output_log == ["NOT -2", "AND 0", "OR 1", "XOR 1"]
 
 
-def test_string_concat():
+def test_string_concat(backend):
     code = """
 10 A$="HELLO"
 20 B$="WORLD"
 30 C$=A$+", "+B$+"!"
 40 PRINT C$
 """  # book page 277
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["HELLO, WORLD!"]
 
 
-def test_string_comparisons():
+def test_string_comparisons(backend):
     code = """
 10 INPUT A$
 20 INPUT B$
 30 IF B$=A$+"!" THEN PRINT "MATCH"
 """  # book page 278
-    interp = run_code(code, ["HELLO", "HELLO!"])
+    interp = run_code(code, ["HELLO", "HELLO!"], make=backend)
     assert interp.io.output_log == ["MATCH"]
 
 
-def test_builtin_str_function_sub():
+def test_builtin_str_function_sub(backend):
     code = """
 10 A$="POMERANIAN"
 20 PRINT SUB$(A$,0,3)
 """  # book page 279
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["POM"]
 
 
-def test_builtin_str_function_chr():
+def test_builtin_str_function_chr(backend):
     code = """
 10 PRINT CHR$(67,111,100,121)
 """  # book page 279
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["Cody"]
 
 
-def test_builtin_str_function_str():
+def test_builtin_str_function_str(backend):
     code = """
 10 INPUT N
 20 S$=STR$(N)
 30 PRINT S$
 """  # book page 280
-    interp = run_code(code, ["123"])
+    interp = run_code(code, ["123"], make=backend)
     assert interp.io.output_log == ["123"]
 
 
-def test_builtin_function_val():
+def test_builtin_function_val(backend):
     code = """
 10 INPUT S$
 20 N=VAL(S$)
 30 PRINT N*2
 """  # book page 281
-    interp = run_code(code, ["10"])
+    interp = run_code(code, ["10"], make=backend)
     assert interp.io.output_log == ["20"]
 
 
-def test_builtin_function_len():
+def test_builtin_function_len(backend):
     code = """
 10 INPUT S$
 20 PRINT LEN(S$)
 """  # book page 281
-    interp = run_code(code, ["KODACHROME"])
+    interp = run_code(code, ["KODACHROME"], make=backend)
     assert interp.io.output_log == ["10"]
 
 
-def test_builtin_function_asc_1():
+def test_builtin_function_asc_1(backend):
     code = """
 10 INPUT S$
 20 PRINT ASC(S$)
 """  # book page 282
-    interp = run_code(code, ["CARRABELLE"])
+    interp = run_code(code, ["CARRABELLE"], make=backend)
     assert interp.io.output_log == ["67"]
 
 
-def test_builtin_function_asc_2():
+def test_builtin_function_asc_2(backend):
     code = """
 10 INPUT S$
 20 INPUT N
 30 T$=SUB$(S$,N,1)
 40 PRINT ASC(T$)
 """  # book page 283
-    interp = run_code(code, ["FOLKSTON", "2"])
+    interp = run_code(code, ["FOLKSTON", "2"], make=backend)
     assert interp.io.output_log == ["76"]
 
 
-def test_data():
+def test_data(backend):
     code = """
 10 READ I
 20 IF I<0 THEN GOTO 60
@@ -383,5 +404,249 @@ def test_data():
 90 DATA 3,10,12,7,6
 100 DATA 3,15,8,2,-1
 """  # book page 299
-    interp = run_code(code)
+    interp = run_code(code, make=backend)
     assert interp.io.output_log == ["TOTAL 66", "COUNT 9", "AVERAGE 7"]
+
+
+def test_find_line_number(backend):
+    parser = CodyBasicParser()
+    interp = backend(TestIO())
+    interp.load(parser.parse_lines(["10 REM A", "20 REM B", "30 REM C"]))
+    assert interp.find_line_number(20) == 1
+    assert interp.find_line_number(20, mode="next") == 2
+    assert interp.find_line_number(20, mode="after") == 2
+    assert interp.find_line_number(20, mode="exact_or_next") == 1
+    assert interp.find_line_number(25, mode="exact_or_next") == 2
+    assert interp.find_line_number(30, mode="next") is None
+    assert interp.find_line_number(30, mode="next", default=3) == 3
+    with pytest.raises(IndexError):
+        interp.find_line_number(25)
+
+
+def test_edit_program(backend):
+    parser = CodyBasicParser()
+    interp = backend(TestIO())
+    for line in ["20 PRINT 2", "10 PRINT 1", "30 PRINT 3", "20 PRINT 4", "30"]:
+        interp.run_command(parser.parse_command(line))
+    assert [cmd.source for cmd in interp.program] == ["10 PRINT 1", "20 PRINT 4"]
+    assert interp.line_numbers == [10, 20]
+    interp.run()
+    assert interp.io.output_log == ["1", "4"]
+
+
+def test_goto_high_line_number(backend):
+    code = """
+10 GOTO 40000
+20 PRINT "A"
+40000 PRINT "B"
+"""
+    interp = run_code(code, make=backend)
+    assert interp.io.output_log == ["B"]
+
+
+def test_link(backend):
+    code = """
+10 GOSUB 40
+20 GOTO A+50
+30 END
+40 IF 1=1 THEN RETURN
+50 PRINT "A"
+"""
+    interp = run_code(code, make=backend)
+    assert interp.io.output_log == ["A"]
+    assert [cmd.next_index for cmd in interp.program] == [1, 2, 3, 4, None]
+    assert interp.program[0].target_index == 3
+    assert interp.program[1].target_index is None  # computed target
+    assert interp.program[3].command.next_index == 4
+
+
+def test_link_after_edit(backend):
+    parser = CodyBasicParser()
+    interp = backend(TestIO())
+    interp.load(parser.parse_string('10 GOTO 30\n20 PRINT "A"\n30 PRINT "B"'))
+    interp.run_command(parser.parse_command('25 PRINT "C"'))
+    assert not interp.linked
+    interp.run_command(parser.parse_command("10 GOTO 25"))
+    interp.run()
+    assert interp.linked
+    assert interp.io.output_log == ["C", "B"]
+
+
+def test_array_elements(backend):
+    code = """
+10 A(100)=5
+20 A(-1)=3
+30 A=A+1
+40 PRINT A(100),",",A(50),",",A(-1),",",A(0)
+"""
+    interp = run_code(code, make=backend)
+    assert interp.io.output_log == ["5,0,3,1"]
+    assert interp.variable("A", 100) == 5
+    assert interp.variable("B", 7) == 0
+    interp.reset()
+    assert interp.variable("A", 100) == 0
+    assert interp.variable("A") == 0
+
+
+def test_lowercase_variables(backend):
+    code = """
+10 a=5
+20 A=1
+30 b$="X"
+40 a(2)=a+A
+50 PRINT a,A,b$,B$,a(2)
+"""
+    interp = run_code(code, make=backend)
+    assert interp.io.output_log == ["51X6"]
+    assert interp.variable("a") == 5
+
+
+def test_error_line(backend):
+    code = """
+10 A=1
+20 PRINT A
+30 B=A/0
+40 PRINT B
+"""
+    with pytest.raises(ZeroDivisionError) as e:
+        run_code(code, make=backend)
+    assert e.value.__notes__ == ["in line 30 B=A/0"]
+
+
+def test_edit_after_error_in_subroutine(backend):
+    parser = CodyBasicParser()
+    interp = backend(TestIO())
+    code = "10 GOSUB 100\n20 PRINT A\n30 END\n100 A=1/0\n110 RETURN"
+    interp.load(parser.parse_string(code))
+    with pytest.raises(ZeroDivisionError):
+        interp.run()
+    # the stopped subroutine must not return into the edited program
+    interp.run_command(parser.parse_command("100 A=2"))
+    assert interp.call_stack == []
+    interp.run()
+    assert interp.io.output_log == ["2"]
+
+
+def test_data_edit(backend):
+    parser = CodyBasicParser()
+    interp = backend(TestIO())
+    code = "10 READ A,B\n20 RESTORE\n30 READ C\n40 PRINT A+B+C\n50 DATA 1\n70 DATA 2"
+    interp.load(parser.parse_string(code))
+    interp.run()
+    for line in ["60 DATA 10,20", "50 DATA -3", "70 REM", "50"]:
+        interp.run_command(parser.parse_command(line))
+        interp.run()
+    assert interp.io.output_log == ["4", "12", "4", "4", "40"]
+    assert interp.data_values == [10, 20]
+    assert interp.data_lines == [60]
+    interp.run_command(parser.parse_command("NEW"))
+    assert interp.data_values == []
+
+
+def test_if_end(backend):
+    interp = run_code('10 IF 1=1 THEN END\n20 PRINT "A"', make=backend)
+    assert interp.io.output_log == []
+
+
+def test_builtin_wrong_arity(backend):
+    with pytest.raises(NotImplementedError):
+        run_code("10 A=ABS(1,2)", make=backend)
+
+
+def test_overflow(backend):
+    code = """
+10 A=32767
+20 C=-32768
+30 A(1)=A+1
+40 PRINT A+1,",",-C,",",C-1,",",A*A,",",C/-1,",",A(1)
+"""
+    interp = run_code(code, make=backend)
+    assert interp.io.output_log == ["-32768,-32768,32767,1,-32768,-32768"]
+
+
+def test_input_invalid_string(backend):
+    with pytest.raises(ValueError, match="codepoint 256"):
+        run_code("10 INPUT A$", ["A\u0100"], make=backend)
+
+
+def test_load_unsorted(backend):
+    parser = CodyBasicParser()
+    interp = backend(TestIO())
+    lines = ["30 READ A", "20 DATA 5", "10 PRINT 1", "40 PRINT A", "10 PRINT 2"]
+    interp.load(parser.parse_lines(lines + ["20 DATA 7", "50 PRINT 3", "50"]))
+    assert interp.line_numbers == [10, 20, 30, 40]
+    assert [cmd.source for cmd in interp.program][:2] == ["10 PRINT 2", "20 DATA 7"]
+    interp.run()
+    assert interp.io.output_log == ["2", "7"]
+
+
+def test_shared_program(backend):
+    parser = CodyBasicParser()
+    shared = parser.parse_lines(["20 IF A=0 THEN GOTO 40", "30 PRINT 3", "40 PRINT 4"])
+    extra = parser.parse_lines(["5 PRINT 0", "10 PRINT 1"])
+    a = backend(TestIO())
+    a.load(shared)
+    b = backend(TestIO())
+    b.load(extra + shared)
+    b.run_command(parser.parse_command("35 PRINT 5"))
+    b.run()
+    a.run()
+    assert b.io.output_log == ["0", "1", "4"]
+    assert a.io.output_log == ["4"]
+    assert a.program == shared and b.program[2] is not shared[0]
+
+
+def test_list_range(backend):
+    parser = CodyBasicParser()
+    interp = backend(TestIO())
+    interp.load(parser.parse_lines([f"{n} REM {n}" for n in range(10, 100, 10)]))
+    for line in ["LIST 25,50", "LIST 80", "LIST 0,10", "LIST 91,99", "LIST 50,40"]:
+        interp.run_command(parser.parse_command(line))
+    assert interp.io.output_log == [
+        *["30 REM 30", "40 REM 40", "50 REM 50"],
+        *["80 REM 80", "90 REM 90"],
+        "10 REM 10",
+    ]
+    assert [cmd.line_number for cmd in interp.lines_in_range(end=20)] == [10, 20]
+
+
+def test_step(backend):
+    parser = CodyBasicParser()
+    interp = backend(TestIO())
+    code = "10 FOR I=1 TO 3\n20 PRINT I\n30 NEXT\n40 INPUT A,B\n50 PRINT A+B\n60 A=1/0"
+    interp.load(parser.parse_string(code))
+    interp.start()
+    result = interp.step(4)
+    assert (result.reason, result.statements) == (STOP_BUDGET, 4)
+    assert interp.io.output_log == ["1", "2"]
+    assert interp.step().reason == STOP_INPUT
+    interp.io.inputs.append("1")
+    assert interp.step().reason == STOP_INPUT  # INPUT needs both lines
+    interp.io.inputs.append("2")
+    result = interp.step()
+    assert (result.reason, result.statements) == (STOP_ERROR, 2)
+    assert isinstance(result.error, ZeroDivisionError)
+    assert result.error.__notes__ == ["in line 60 A=1/0"]
+    assert interp.io.output_log == ["1", "2", "3", "3"]
+    assert not result.resumable and interp.repl
+    interp.run_command(parser.parse_command("60 END"))
+    interp.start()
+    assert interp.step(100).reason == STOP_INPUT
+    interp.io.inputs.extend(["5", "6"])
+    result = interp.step(100)
+    assert (result.reason, result.statements) == (STOP_END, 3)
+    assert interp.io.output_log[-1] == "11"
+
+
+def test_step_input_in_if(backend):
+    interp = backend(TestIO())
+    code = "10 B=1\n20 IF B=1 THEN INPUT A\n30 PRINT A,B"
+    interp.load(CodyBasicParser().parse_string(code))
+    interp.start()
+    assert interp.step().reason == STOP_INPUT
+    interp.int_arrays[1][0] = 0  # the condition is not evaluated again
+    assert interp.step().reason == STOP_INPUT
+    interp.io.inputs.append("7")
+    result = interp.step()
+    assert (result.reason, result.statements) == (STOP_END, 2)
+    assert interp.io.output_log == ["70"]
@@ -0,0 +1,74 @@
+# python -m pytest -s
+import pytest
+from cody_parser import CodyBasicParser, ASTTypes
+from cody_interpreter import Interpreter, TestIO
+from cody_optimizer import optimize_command
+
+
+def optimize(source: str):
+    command = CodyBasicParser().parse_command(source)
+    return optimize_command(command, Interpreter(TestIO()).eval)
+
+
+@pytest.mark.parametrize(
+    "expression, value",
+    [
+        ("-5", -5),
+        ("3*((8+2)/2)", 15),
+        ("32767+1", -32768),  # 16-bit wraparound
+        ("-(-32768)", -32768),
+        ("300*300", 24464),
+        ("-7/2", -4),
+        ("NOT(0)", -1),
+        ("AND(12,10)+OR(12,10)+XOR(12,10)", 28),
+        ("ASC(CHR$(222))", 222),
+        ("LEN(\"AB\"+STR$(12))", 4),
+        ("VAL(\"-12AB\")", -12),
+        ("MOD(8,5)", 3),
+    ],
+)
+def test_fold_integer(expression, value):
+    node = optimize(f"10 A={expression}").rvalue
+    assert node.ast_type == ASTTypes.IntegerLiteral
+    assert node.value == value
+
+
+def test_fold_string():
+    node = optimize('10 A$=CHR$(72,73)+SUB$("ABC",1,2)+1').rvalue
+    assert node.ast_type == ASTTypes.StringLiteral
+    assert node.literal == "HIBC1"
+
+
+def test_fold_subexpressions():
+    command = optimize("10 POKE 53248+4,H*(8+8)+V")
+    assert command.address.value == 53252 - 65536
+    assert command.expression.left.right.value == 16
+    command = optimize("10 IF A(1+1)<2*3 THEN PRINT CHR$(65)")
+    assert command.condition.left.index.value == 2
+    assert command.condition.right.value == 6
+    assert command.command.expressions[0].literal == "A"
+
+
+@pytest.mark.parametrize("expression", ["B*1", "1*B", "B+0", "0+B", "B-0", "B/1"])
+def test_simplify_identities(expression):
+    node = optimize(f"10 A={expression}").rvalue
+    assert node.ast_type == ASTTypes.IntegerVariable and node.name == "B"
+
+
+def test_keep_side_effects_and_errors():
+    # string concatenation with 0, random numbers and run time errors
+    assert optimize("10 A$=B$+0").rvalue.ast_type == ASTTypes.BinaryAdd
+    assert optimize("10 A=RND(1)*1").rvalue.ast_type == ASTTypes.BuiltInCall
+    assert optimize("10 A=1/0").rvalue.ast_type == ASTTypes.BinaryDiv
+    assert optimize("10 A=CHR$(256)").rvalue.ast_type == ASTTypes.BuiltInCall
+    assert optimize("10 IF 1=1 THEN END").condition.ast_type == ASTTypes.Equal
+
+
+def test_list_shows_source():
+    parser = CodyBasicParser()
+    interp = Interpreter(TestIO())
+    interp.load(parser.parse_string("10 A=2*3+0\n20 GOTO 5+5"))
+    assert interp.program[0].rvalue.value == 6
+    assert interp.program[1].target_index == 0  # constant target
+    interp.run_command(parser.parse_command("LIST"))
+    assert interp.io.output_log == ["10 A=2*3+0", "20 GOTO 5+5"]
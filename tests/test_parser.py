@@ -1,7 +1,9 @@
 # python -m pytest -s
 import pytest
 from cody_parser import CodyBasicParser, CommandTypes
-from cody_parser import ASTTypes
+from cody_parser import ASTTypes, tokenize, match_keyword, build_keyword_trie
+from cody_builtins import builtin_sub, builtin_rnd
+from enum import Enum
 
 
 def test_parse_simple_add():
@@ -492,3 +494,78 @@ def test_parse_peek_call_var():
     assert parsed_code[1].condition.left.name == "AND"
     assert parsed_code[1].condition.left.expressions[0].ast_type == ASTTypes.BuiltInCall
     assert parsed_code[1].condition.left.expressions[0].name == "PEEK"
+
+
+def test_tokenize():
+    assert tokenize('IF A$<>"B C" THEN PRINT SUB$(A$,0,3);') == [
+        "IF",
+        "A$",
+        "<>",
+        '"B C"',
+        "THEN",
+        "PRINT",
+        "SUB$",
+        "(",
+        "A$",
+        ",",
+        "0",
+        ",",
+        "3",
+        ")",
+        ";",
+        "",
+    ]
+    assert tokenize("  ") == [""]
+
+
+def test_parse_without_whitespace():
+    parser = CodyBasicParser()
+    command = parser.parse_command('10 IF A$="THEN"THEN FORI=1TO5')
+    assert command.condition.right.literal == "THEN"
+    assert command.command.command_type == CommandTypes.FOR
+    assert command.command.loop_variable.name == "I"
+    assert command.command.limit.value == 5
+
+
+def test_parse_unterminated_string():
+    parser = CodyBasicParser()
+    with pytest.raises(Exception, match="unterminated string literal"):
+        parser.parse_command('10 PRINT "HELLO')
+
+
+def test_match_keyword():
+    assert match_keyword("RESTORE") == (CommandTypes.RESTORE, 7)
+    assert match_keyword("RETURN") == (CommandTypes.RETURN, 6)
+    assert match_keyword('REM "QUOTED"') == (CommandTypes.REM, 3)
+    assert match_keyword("NEXT") == (CommandTypes.NEXT, 4)
+    assert match_keyword("GOSUB 10") == (CommandTypes.GOSUB, 5)
+    assert match_keyword("A=1") == (None, 0)
+    assert match_keyword("") == (None, 0)
+
+
+def test_keyword_trie_longest_match():
+    # the longest keyword wins, independent of the order of the keywords
+    Keywords = Enum("Keywords", ["GO", "GOTO"])
+    for keywords in (list(Keywords), list(reversed(Keywords))):
+        trie = build_keyword_trie(keywords)
+        assert match_keyword("GOTO 10", trie) == (Keywords.GOTO, 4)
+        assert match_keyword("GO 10", trie) == (Keywords.GO, 2)
+        assert match_keyword("GOT", trie) == (Keywords.GO, 2)
+
+
+def test_variable_slots():
+    parser = CodyBasicParser()
+    c = parser.parse_command("10 Z$=SUB$(A$,0,B(3))")
+    assert c.lvalue.slot == 25
+    assert c.rvalue.expressions[0].slot == 0
+    assert c.rvalue.expressions[2].subnode.slot == 1
+    c = parser.parse_command("10 a=z")
+    assert (c.lvalue.slot, c.rvalue.slot) == (26, 51)
+
+
+def test_builtin_binding():
+    parser = CodyBasicParser()
+    c = parser.parse_command("10 PRINT SUB$(A$,0,1),RND(),RND(1),ABS(1,2)")
+    assert c.expressions[0].function is builtin_sub
+    assert c.expressions[1].function is c.expressions[2].function is builtin_rnd
+    assert c.expressions[3].function is None  # wrong number of arguments
@@ -0,0 +1,118 @@
+# python -m pytest -s
+import pytest
+from cody_parser import CodyBasicParser
+from cody_interpreter import TestIO
+from cody_transpiler import Transpiler, TranspileError, TranspilingInterpreter
+
+
+def load_code(code: str, inputs=None) -> TranspilingInterpreter:
+    parser = CodyBasicParser()
+    interp = TranspilingInterpreter(TestIO(inputs=inputs))
+    interp.load(parser.parse_string(code))
+    return interp
+
+
+def test_transpile_source():
+    code = """
+10 FOR I=1 TO 3
+20 GOSUB 100
+30 NEXT
+40 END
+100 PRINT I*2
+110 RETURN
+"""
+    interp = load_code(code)
+    source = Transpiler(interp.program).transpile()
+    assert source.startswith("def program(interp, pc):")
+    assert "# 100 PRINT I*2" in source
+    interp.run()
+    assert interp.io.output_log == ["2", "4", "6"]
+    assert interp.translated[0] is not None
+    assert interp.variable("I") == 3
+
+
+def test_transpile_next_before_for():
+    code = """
+10 GOTO 100
+20 PRINT I
+30 NEXT
+40 PRINT "DONE"
+50 END
+100 FOR I=1 TO 3
+110 GOTO 20
+"""
+    interp = load_code(code)
+    interp.run()
+    assert interp.io.output_log == ["1", "2", "3", "DONE"]
+    assert interp.translated[0] is not None
+    code = "1 FOR J=1 TO 1\n2 NEXT\n" + code
+    interp = load_code(code)
+    interp.run()
+    assert interp.io.output_log == ["1", "2", "3", "DONE"]
+
+
+def test_transpile_wraparound():
+    code = """
+10 A=32767
+20 B=A+1
+30 C=-32768-1
+40 D=300*300
+50 PRINT A,",",B,",",C,",",D
+"""
+    interp = load_code(code)
+    interp.run()
+    assert interp.io.output_log == ["32767,-32768,32767,24464"]
+    assert interp.translated[0] is not None
+
+
+def test_transpile_arrays_and_strings():
+    code = """
+10 FOR I=0 TO 4
+20 A(I)=I*I
+30 NEXT
+40 A$="X"
+50 FOR I=1 TO 3
+60 A$=A$+STR$(A(I))
+70 NEXT
+80 PRINT A$,A
+"""
+    interp = load_code(code)
+    interp.run()
+    assert interp.io.output_log == ["X1490"]
+    assert interp.variable("A", 4) == 16
+    assert interp.variable("A$") == "X149"
+
+
+def test_transpile_fallback_computed_goto():
+    code = """
+10 N=30
+20 GOTO N
+30 PRINT "DONE"
+"""
+    interp = load_code(code)
+    with pytest.raises(TranspileError):
+        Transpiler(interp.program).transpile()
+    interp.run()
+    assert interp.translated[0] is None
+    assert interp.io.output_log == ["DONE"]
+
+
+def test_transpile_same_errors():
+    interp = load_code("10 A=1/0")
+    with pytest.raises(ZeroDivisionError):
+        interp.run()
+    interp = load_code("10 RETURN")
+    with pytest.raises(IndexError):
+        interp.run()
+    interp = load_code("10 INPUT A", ["X"])
+    with pytest.raises(ValueError):
+        interp.run()
+
+
+def test_transpile_invalidated_by_edit():
+    parser = CodyBasicParser()
+    interp = load_code('10 PRINT "A"')
+    interp.run()
+    interp.run_command(parser.parse_command('10 PRINT "B"'))
+    interp.run()
+    assert interp.io.output_log == ["A", "B"]
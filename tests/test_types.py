@@ -0,0 +1,60 @@
+# python -m pytest -s
+import pytest
+from cody_parser import CodyBasicParser, IntegerLiteral
+from cody_interpreter import Interpreter, TestIO
+from cody_types import infer_type, INT, STR, BOOL, NONE
+
+
+def expression_type(expression: str):
+    command = CodyBasicParser().parse_command(f"PRINT {expression}")
+    return infer_type(command.expressions[0])
+
+
+@pytest.mark.parametrize(
+    "expression, static_type",
+    [
+        ("1+A*B(2)/-C", INT),
+        ('"A"+B$', STR),
+        ('1+"A"', STR),
+        ("A(I)+TI", INT),
+        ('SUB$(A$,1,LEN("AB"))', STR),
+        ("CHR$(65,66,A)", STR),
+        ("RND()+RND(1)", INT),
+        ("AT(1,2)", NONE),
+        ("-A$", None),
+        ('A-"1"', None),
+        ('A("1")', None),
+        ("ABS(1,2)", None),
+        ("LEN(A)", None),
+        ('SUB$(A$,"1",2)', None),
+        ("A+AT(1,2)", None),
+    ],
+)
+def test_infer_type(expression, static_type):
+    assert expression_type(expression) == static_type
+
+
+def test_infer_comparison():
+    command = CodyBasicParser().parse_command('IF A$<"B" THEN A=1')
+    assert infer_type(command.condition) == BOOL
+    command = CodyBasicParser().parse_command('IF A<"B" THEN A=1')
+    assert infer_type(command.condition) is None
+
+
+def test_infer_literal_range():
+    assert infer_type(IntegerLiteral(-32768)) == INT
+    assert infer_type(IntegerLiteral(32768)) is None
+
+
+def test_unchecked_type_errors():
+    parser = CodyBasicParser()
+    for code in ["10 A=B$-1", '10 A$="A"\n20 IF A$<1 THEN END', "10 A=LEN(1)"]:
+        interp = Interpreter(TestIO(), elide_checks=True)
+        interp.load(parser.parse_string(code))
+        with pytest.raises(AssertionError):
+            interp.run()
+    interp = Interpreter(TestIO(), elide_checks=True)
+    code = '10 A$="AAAAAAAAAAAAAAAAA"\n20 A$=A$+A$\n30 GOTO 20'
+    interp.load(parser.parse_string(code))
+    with pytest.raises(ValueError, match="string too long"):
+        interp.run()
@@ -1,4 +1,5 @@
-from cody_util import twos_complement
+import pytest
+from cody_util import twos_complement, wrap16, check_string, check_length
 
 
 def test_twos_complement_pos():
@@ -24,3 +25,24 @@ def test_twos_complement_neg():
     assert twos_complement(-32769) == 32767
     assert twos_complement(-65536) == 0
     assert twos_complement(-65537) == -1
+
+
+def test_wrap16():
+    for n in range(-70000, 140000, 7):
+        assert wrap16(n) == twos_complement(n)
+    for n in (32767, 32768, 65535, 65536, -32768, -32769, -65536, -65537):
+        assert wrap16(n) == twos_complement(n)
+
+
+def test_check_string():
+    assert check_string("A\xdeB") == "A\xdeB"
+    assert check_string(-12, convert=True) == "-12"
+    with pytest.raises(ValueError, match="codepoint 256"):
+        check_string("AB\u0100")
+    with pytest.raises(ValueError, match="codepoint 65"):
+        check_string("\xdeA", allowed_chars="petscii")
+    with pytest.raises(ValueError, match="too long"):
+        check_string("A" * 256)
+    assert check_length("\xde" * 255) == "\xde" * 255
+    with pytest.raises(ValueError, match="too long"):
+        check_length("A" * 256)
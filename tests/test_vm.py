@@ -0,0 +1,75 @@
+# python -m pytest -s
+import pytest
+from cody_parser import CodyBasicParser
+from cody_interpreter import TestIO
+from cody_vm import VirtualMachine, EXEC
+
+
+def load_code(code: str, inputs=None) -> VirtualMachine:
+    parser = CodyBasicParser()
+    vm = VirtualMachine(TestIO(inputs=inputs))
+    vm.load(parser.parse_string(code))
+    return vm
+
+
+def test_disassemble():
+    vm = load_code("10 A=A+1\n20 IF A<3 THEN GOTO 10\n30 PRINT A")
+    assert vm.compile().disassemble().splitlines() == [
+        "; 10 A=A+1",
+        "     0  LOAD_INT          'A'",
+        "     2  CONST             1",
+        "     4  ADD",
+        "     5  STORE_INT         'A'",
+        "; 20 IF A<3 THEN GOTO 10",
+        "     7  LOAD_INT          'A'",
+        "     9  CONST             3",
+        "    11  LT",
+        "    12  JUMP_IF_FALSE     @16",
+        "    14  JUMP              @0",
+        "; 30 PRINT A",
+        "    16  LOAD_INT          'A'",
+        "    18  PRINT",
+        "    19  PRINTLN",
+        "    20  HALT",
+    ]
+    vm.run()
+    assert vm.io.output_log == ["3"]
+
+
+def test_computed_jumps():
+    code = """
+10 T=100
+20 GOSUB T
+30 GOTO T+100
+100 PRINT "SUB"
+110 RETURN
+200 PRINT "END"
+"""
+    vm = load_code(code)
+    vm.run()
+    assert vm.io.output_log == ["SUB", "END"]
+
+
+def test_for_array_variable():
+    vm = load_code("10 FOR A(2)=1 TO 3\n20 PRINT A(2)\n30 NEXT")
+    vm.run()
+    assert vm.io.output_log == ["1", "2", "3"]
+
+
+def test_exec_fallback():
+    vm = load_code("10 READ A$\n20 DATA 1")
+    bytecode = vm.compile()
+    assert bytecode.code[0] == EXEC
+    with pytest.raises(AssertionError):
+        vm.run()
+
+
+def test_recompile_after_edit():
+    parser = CodyBasicParser()
+    vm = load_code('10 PRINT "A"')
+    vm.run()
+    bytecode = vm.bytecode
+    vm.run_command(parser.parse_command('20 PRINT "B"'))
+    vm.run()
+    assert vm.bytecode is not bytecode
+    assert vm.io.output_log == ["A", "A", "B"]